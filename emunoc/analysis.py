@@ -0,0 +1,183 @@
+"""
+COPYRIGHT(c) 2022
+INSTITUTE FOR COMMUNICATION TECHNOLOGIES AND EMBEDDED SYSTEMS
+RWTH AACHEN
+GERMANY
+
+This confidential and proprietary software may be used, copied,
+modified, merged, published or distributed according to the
+permissions and/or limitations granted by an authorizing license
+agreement.
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+Author: 1. Tan Yee Yang (tan@ice.rwth-aachen.de)
+        2. Jan Moritz Joseph (joseph@ice.rwth-aachen.de)
+
+Latency and throughput of ejected traffic.
+
+Injected packets come from the trace (the time flit of each batch is the
+injection cycle), ejected packets from the axis_ps_eject stream
+    | cycle | header | header | ... | 0 (tlast) | cycle | ...
+(performance windows of emunoc.perf are skipped) and are joined by packet id, src, dst and length.
+
+    python3 -m emunoc.analysis in out/recv_flit.txt --dim 4 4 1
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from emunoc.burst import split_bursts
+from emunoc.config import load_config
+from emunoc.flit_codec import FlitCodec
+from emunoc.perf import split_perf
+from emunoc.trace_file import load_trace, read_flit_text, split_batches
+
+KEYS = ["id", "src", "dst", "len"]
+
+
+def split_windows(ej_time_data):
+    """ axis_ps_eject stream -> (cycle per header, header) arrays """
+    ej_time_data, _ = split_perf(ej_time_data)
+    prev = np.concatenate([[0], ej_time_data[:-1]])
+    is_cyc = prev == 0
+    is_hdr = ~is_cyc & (ej_time_data != 0)
+    window = np.cumsum(is_cyc) - 1
+    return ej_time_data[is_cyc][window[is_hdr]], ej_time_data[is_hdr]
+
+
+def packets(codec: FlitCodec, hdrs, cycles, column):
+    """ headers and their cycles -> DataFrame id/src/dst/len/<column> """
+    info = codec.unpack_hdr(hdrs)
+    df = pd.DataFrame({key: info[key].astype(np.int64) for key in KEYS})
+    # the NoC keeps only the lower id bits when the xyz address is wider
+    df["id"] &= 2**codec.hw_id_width - 1
+    df[column] = np.asarray(cycles, dtype=np.int64)
+    return df
+
+
+def injected_packets(codec: FlitCodec, trace, burst=False):
+    """ trace (TraceFile/TextTrace) -> DataFrame id/src/dst/len/inj_cycle """
+    split = split_bursts if burst else split_batches
+    cycles, hdrs = split(trace.flit_data, trace.pkt_len)
+    return packets(codec, hdrs, cycles, "inj_cycle")
+
+
+def ejected_packets(codec: FlitCodec, recv_flits):
+    """ axis_ps_eject stream -> DataFrame id/src/dst/len/ej_cycle """
+    cycles, hdrs = split_windows(recv_flits)
+    return packets(codec, hdrs, cycles, "ej_cycle")
+
+
+def join_latency(inj, ej):
+    """
+    Per-packet latency. Packets with equal keys (wrapped ids) are matched
+    in injection/ejection order. Lost packets keep a NaN ej_cycle.
+    """
+    inj = inj.assign(nth=inj.groupby(KEYS).cumcount())
+    ej = ej.sort_values("ej_cycle", kind="stable")
+    ej = ej.assign(nth=ej.groupby(KEYS).cumcount())
+    df = inj.merge(ej, on=KEYS + ["nth"], how="left").drop(columns="nth")
+    df["latency"] = df["ej_cycle"] - df["inj_cycle"]
+    return df
+
+
+def pair_stats(df):
+    """ latency statistics per src -> dst pair """
+    recv = df.dropna(subset=["latency"])
+    return recv.groupby(["src", "dst"])["latency"].agg(
+        count="count",
+        mean="mean",
+        p50=lambda x: x.quantile(0.50),
+        p95=lambda x: x.quantile(0.95),
+        p99=lambda x: x.quantile(0.99),
+        max="max",
+    )
+
+
+def node_throughput(df, num_pe, cycles=None):
+    """ accepted flits/cycle per destination node """
+    recv = df.dropna(subset=["latency"])
+    if cycles is None:
+        cycles = _cycles(df)
+    flits = recv.groupby("dst")["len"].sum().reindex(range(num_pe), fill_value=0)
+    return (flits / cycles).rename("accepted")
+
+
+def _cycles(df):
+    last = df["ej_cycle"].max()
+    if np.isnan(last):
+        last = df["inj_cycle"].max()
+    return max(int(last - df["inj_cycle"].min()), 1)
+
+
+def summary(df, num_pe, cycles=None):
+    """
+    offered load and accepted throughput over the same window, by default
+    from the first injection to the last ejection; cycles: the duration
+    the traffic was generated for instead (e.g. traffic.py's cycles)
+    """
+    recv = df.dropna(subset=["latency"])
+    if cycles is None:
+        cycles = _cycles(df)
+    return {
+        "packets": len(df),
+        "received": len(recv),
+        "lost": len(df) - len(recv),
+        "cycles": cycles,
+        "offered": df["len"].sum() / num_pe / cycles,
+        "accepted": recv["len"].sum() / num_pe / cycles,
+        "latency_mean": recv["latency"].mean(),
+        "latency_p50": recv["latency"].quantile(0.50),
+        "latency_p99": recv["latency"].quantile(0.99),
+        "latency_max": recv["latency"].max(),
+    }
+
+
+def analyze(codec: FlitCodec, inj_path, recv_path, burst=False):
+    inj = injected_packets(codec, load_trace(inj_path), burst)
+    ej = ejected_packets(codec, read_flit_text(recv_path))
+    return join_latency(inj, ej)
+
+
+def load_curve(codec: FlitCodec, runs, burst=False, cycles=None):
+    """
+    runs: iterable of (inj_path, recv_path) or (inj_path, recv_path, burst)
+    -> one summary row per run; burst is the default framing of the traces,
+    cycles the generated duration of every run (see summary)
+    """
+    rows = []
+    for run in runs:
+        inj_path, recv_path = run[:2]
+        run_burst = run[2] if len(run) > 2 else burst
+        df = analyze(codec, inj_path, recv_path, run_burst)
+        rows.append(summary(df, codec.num_pe, cycles))
+    return pd.DataFrame(rows).sort_values("offered").reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    cfg = load_config()
+    parser = argparse.ArgumentParser(description="Latency/throughput of an EmuNoC run")
+    parser.add_argument("inj", help="injected trace, text directory or binary file")
+    parser.add_argument("recv", help="axis_ps_eject output, e.g. out/recv_flit.txt")
+    parser.add_argument("--dim", type=int, nargs=3,
+                        default=[cfg.max_x_dim, cfg.max_y_dim, cfg.max_z_dim],
+                        metavar=("X", "Y", "Z"))
+    parser.add_argument("--flit-pkt-width", type=int, default=cfg.flit_pkt_width)
+    parser.add_argument("--burst", action="store_true", help="trace in burst framing")
+    parser.add_argument("--csv", help="write the per-packet table")
+    args = parser.parse_args()
+
+    codec = FlitCodec(*args.dim, args.flit_pkt_width)
+    df = analyze(codec, args.inj, args.recv, args.burst)
+
+    for key, val in summary(df, codec.num_pe).items():
+        print("{:<14}{}".format(key, val))
+    print(pair_stats(df).to_string())
+    print(node_throughput(df, codec.num_pe).to_string())
+
+    if args.csv:
+        df.to_csv(args.csv, index=False)
@@ -0,0 +1,396 @@
+"""
+COPYRIGHT(c) 2022
+INSTITUTE FOR COMMUNICATION TECHNOLOGIES AND EMBEDDED SYSTEMS
+RWTH AACHEN
+GERMANY
+
+This confidential and proprietary software may be used, copied,
+modified, merged, published or distributed according to the
+permissions and/or limitations granted by an authorizing license
+agreement.
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+Author: 1. Tan Yee Yang (tan@ice.rwth-aachen.de)
+        2. Jan Moritz Joseph (joseph@ice.rwth-aachen.de)
+
+Simulation throughput benchmarks of the testbenches.
+
+A fixed matrix of testbenches, mesh sizes and offered loads is run case
+after case (parallel runs would distort the timing), every case in its
+own directory under <root>:
+    noc_tb, noc_deadlock_tb,    uniform traffic (emunoc.traffic) for every
+    top_axis_validation_tb      load and mesh size
+    m_axis_ni_tb, s_axis_ni_tb  their generate_test_data.py, once per mesh
+Mesh sizes other than the one of NOC_3D_PACKAGE are rendered into the
+build (emunoc.ghdl.BuildCache). Every case records
+    compile_s      ghdl -i/-m, close to 0 on a cache hit
+    elab_s         elaboration only (--no-run)
+    run_s          elaboration and simulation
+    sim_cycles     from the sim_monitor report, else the stop time
+Testbenches with a sim_monitor stop by themselves; their stop time is
+only a guard (GUARD_FACTOR x cycles + DRAIN_CYCLES) and a run reaching
+it without a "done" report is failed.
+    cycles_per_s   sim_cycles / (run_s - elab_s)
+    peak_rss_mb    peak resident memory of the simulation
+    wave_bytes     size of the .ghw file, 0 with --no-wave
+Every run (time, commit, host and the rows) is appended to
+<root>/history.json and compared with <root>/baseline.json, or the
+previous run without one. A metric worse than the tolerance, or a case
+failing that passed before, is a regression and the exit code is 1.
+
+    python3 -m emunoc.bench run -o bench --dim 4 4 1 --dim 8 8 1 --load 0.05 0.2
+    python3 -m emunoc.bench baseline -o bench
+    python3 -m emunoc.bench history -o bench
+"""
+
+import os
+import sys
+import json
+import time
+import shlex
+import shutil
+import argparse
+import platform
+import subprocess
+from datetime import datetime
+
+import pandas as pd
+
+from emunoc.config import load_config
+from emunoc.flit_codec import FlitCodec
+from emunoc.ghdl import (REPO_DIR, NOC_PACKAGE_FILE, BuildCache, noc_package_text,
+                         parse_monitor, run_logged)
+from emunoc.trace_writer import TraceWriter
+from emunoc.traffic import TrafficGenerator, run_to_inf
+
+# data paths as in the testbenches, relative to the case directory;
+# routers: traffic_rec writes out/<router>/, monitor: stops by itself
+TESTBENCHES = {
+    "noc_tb": {
+        "data_dir": None, "generate": None,
+        "inj": "testdata/axis_validation/in", "out": "testdata/noc_tb/out",
+        "routers": True, "monitor": True,
+    },
+    "noc_deadlock_tb": {
+        "data_dir": None, "generate": None,
+        "inj": "testdata/noc_deadlock_tb/in", "out": "testdata/noc_deadlock_tb/out",
+        "routers": True, "monitor": False,
+    },
+    "top_axis_validation_tb": {
+        "data_dir": None, "generate": None,
+        "inj": "testdata/top_axis_validation_tb/in", "out": "testdata/top_axis_validation_tb/out",
+        "routers": False, "monitor": True,
+    },
+    "m_axis_ni_tb": {
+        "data_dir": "testdata/m_axis_ni_tb", "generate": "generate_test_data.py",
+        "inj": "testdata/m_axis_ni_tb/in", "out": "testdata/m_axis_ni_tb/out",
+        "routers": False, "monitor": False,
+    },
+    "s_axis_ni_tb": {
+        "data_dir": "testdata/s_axis_ni_tb", "generate": "generate_test_data.py",
+        "inj": "testdata/s_axis_ni_tb/in", "out": "testdata/s_axis_ni_tb/out",
+        "routers": False, "monitor": False,
+    },
+}
+
+LOADS = [0.05, 0.2]
+CYCLES = 2000
+CLK_PERIOD_NS = 1
+SEED = 1
+# stop time guard of the sim_monitor testbenches, in clk cycles
+GUARD_FACTOR = 10
+DRAIN_CYCLES = 10000
+
+CACHE_DIR = ".ghdl_cache"
+HISTORY_FILE = "history.json"
+BASELINE_FILE = "baseline.json"
+
+# +1: higher is better
+METRICS = {"cycles_per_s": 1, "elab_s": -1, "peak_rss_mb": -1, "wave_bytes": -1}
+TOLERANCE = 0.1
+
+# ----------------------------------------------
+# Cases
+
+
+def bench_cases(tests, dims, loads=LOADS, cycles=CYCLES, seed=SEED):
+    """
+    one case per testbench, mesh size and load (the NI testbenches have
+    fixed stimuli and run once per mesh size)
+    """
+    cases = []
+    for test_name in tests:
+        spec = TESTBENCHES[test_name]
+        for dim in dims:
+            for load in [None] if spec["generate"] else loads:
+                name = "{}-{}".format(test_name, "x".join(map(str, dim)))
+                if load is not None:
+                    name += "-load{:g}".format(load)
+                cases.append({
+                    "name": name,
+                    "test_name": test_name,
+                    "dims": tuple(dim),
+                    "load": load,
+                    "cycles": cycles,
+                    "seed": seed,
+                    # the sim_monitor ends the run once the traffic is drained,
+                    # the stop time only guards against runs that never end
+                    "stop_time": "{}ns".format(
+                        (cycles * GUARD_FACTOR + DRAIN_CYCLES if spec["monitor"] else cycles)
+                        * CLK_PERIOD_NS),
+                })
+    return cases
+
+
+def prepare_case(case, root, repo=REPO_DIR):
+    """ create the case directory with its data directories, returns its path """
+    spec = TESTBENCHES[case["test_name"]]
+    case_dir = os.path.abspath(os.path.join(root, case["name"]))
+    if os.path.exists(case_dir):
+        shutil.rmtree(case_dir)
+    os.makedirs(case_dir)
+
+    if spec["data_dir"]:
+        shutil.copytree(os.path.join(repo, spec["data_dir"]),
+                        os.path.join(case_dir, spec["data_dir"]),
+                        ignore=shutil.ignore_patterns("in", "out", "__pycache__"))
+    for sub in [spec["inj"], spec["out"]]:
+        os.makedirs(os.path.join(case_dir, sub), exist_ok=True)
+    if spec["routers"]:
+        for router in range(case["dims"][0] * case["dims"][1] * case["dims"][2]):
+            os.makedirs(os.path.join(case_dir, spec["out"], str(router)), exist_ok=True)
+    return case_dir
+
+
+def generate_traffic(case, path, flit_pkt_width):
+    """ uniform traffic at the case load, drained by a run to inf batch """
+    codec = FlitCodec(*case["dims"], flit_pkt_width)
+    traffic = TrafficGenerator(codec, "uniform", case["load"], (1, codec.max_pkt_len),
+                               seed=case["seed"])
+    geometry = {"max_x_dim": case["dims"][0], "max_y_dim": case["dims"][1],
+                "max_z_dim": case["dims"][2], "flit_pkt_width": flit_pkt_width}
+    with TraceWriter(path, "txt", geometry) as td:
+        td.extend(traffic.batches(case["cycles"]))
+        td.add(run_to_inf())
+
+
+# ----------------------------------------------
+# Execution
+
+
+def run_measured(cmd, cwd, log, env=None):
+    """ run one command logged, returns (returncode, wall s, peak RSS in MB) """
+    with open(log, "a") as handle:
+        handle.write("$ " + shlex.join(cmd) + "\n")
+        handle.flush()
+        start = time.perf_counter()
+        try:
+            proc = subprocess.Popen(cmd, cwd=cwd, stdout=handle,
+                                    stderr=subprocess.STDOUT, env=env)
+        except OSError as err:
+            handle.write(str(err) + "\n")
+            return 127, 0.0, 0.0
+        # wait4 gives the resource usage of this child only
+        _, status, usage = os.wait4(proc.pid, 0)
+        sec = time.perf_counter() - start
+        proc.returncode = os.waitstatus_to_exitcode(status)
+    return proc.returncode, sec, usage.ru_maxrss / 1024
+
+
+def run_case(case, root, cache: BuildCache, repo=REPO_DIR, wave=True):
+    """ generate, build, elaborate and run one case, returns its row """
+    cfg = load_config()
+    spec = TESTBENCHES[case["test_name"]]
+    test_name = case["test_name"]
+    case_dir = prepare_case(case, root, repo)
+
+    def log(step):
+        return os.path.join(case_dir, step + ".log")
+
+    row = {"name": case["name"], "test_name": test_name,
+           "dims": "x".join(map(str, case["dims"])), "load": case["load"], "status": "ok"}
+
+    def step(name, ret):
+        if ret:
+            row["status"] = "{} failed ({})".format(name, ret)
+        return ret == 0
+
+    # the scripts import emunoc and load_config() from the repository
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [repo, env.get("PYTHONPATH")]))
+    noc_constants = None
+    if case["dims"] != (cfg.max_x_dim, cfg.max_y_dim, cfg.max_z_dim):
+        noc_constants = dict(zip(["max_x_dim", "max_y_dim", "max_z_dim"], case["dims"]))
+        noc_package = os.path.join(case_dir, NOC_PACKAGE_FILE)
+        with open(noc_package, "w") as handle:
+            handle.write(noc_package_text(noc_constants, repo))
+        env["EMUNOC_NOC_PACKAGE"] = noc_package
+
+    if spec["generate"]:
+        data_dir = os.path.join(case_dir, spec["data_dir"])
+        ok = step("generate", run_logged([[sys.executable, spec["generate"]]],
+                                         data_dir, log("generate"), env))
+    else:
+        generate_traffic(case, os.path.join(case_dir, spec["inj"]), cfg.flit_pkt_width)
+        ok = True
+
+    if ok:
+        start = time.perf_counter()
+        build_dir, hit, ret = cache.build(test_name, None, log("compile"), noc_constants)
+        row["cache"] = "hit" if hit else "miss"
+        row["compile_s"] = round(time.perf_counter() - start, 3)
+        ok = step("compile", ret)
+    if ok:
+        elab_cmd = cache.run_cmd(build_dir, test_name, None) + ["--no-run"]
+        ret, row["elab_s"], _ = run_measured(elab_cmd, case_dir, log("elab"), env)
+        ok = step("elab", ret)
+    if ok:
+        run_cmd = cache.run_cmd(build_dir, test_name, case["stop_time"], wave)
+        ret, run_s, rss = run_measured(run_cmd, case_dir, log("run"), env)
+        step("run", ret)
+        with open(log("run"), "r") as handle:
+            monitor = parse_monitor(handle.read())
+        if spec["monitor"] and row["status"] == "ok" and not monitor:
+            row["status"] = "run hit the stop time guard"
+        elif spec["monitor"] and row["status"] == "ok" and monitor["status"] != "done":
+            row["status"] = "run {}".format(monitor["status"])
+        cycles = monitor["cycles"] if monitor else case["cycles"]
+        wave_file = os.path.join(case_dir, test_name + ".ghw")
+
+        row["run_s"] = round(run_s, 3)
+        row["sim_cycles"] = cycles
+        row["cycles_per_s"] = round(cycles / max(run_s - row["elab_s"], 1e-6), 1)
+        row["peak_rss_mb"] = round(rss, 1)
+        row["wave_bytes"] = os.path.getsize(wave_file) if os.path.exists(wave_file) else 0
+    row["elab_s"] = round(row.get("elab_s", 0.0), 3)
+    row["dir"] = case_dir
+    return row
+
+
+def run_bench(cases, root="bench", repo=REPO_DIR, wave=True):
+    """ run the cases one by one, returns the rows """
+    os.makedirs(root, exist_ok=True)
+    cache = BuildCache(os.path.join(root, CACHE_DIR), repo)
+    rows = []
+    for case in cases:
+        row = run_case(case, root, cache, repo, wave)
+        print(row["name"], row["status"], row.get("cycles_per_s", "-"), "cycles/s", flush=True)
+        rows.append(row)
+    return rows
+
+
+# ----------------------------------------------
+# History
+
+
+def git_commit(repo=REPO_DIR):
+    try:
+        proc = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=repo,
+                              capture_output=True, text=True)
+    except OSError:
+        return None
+    return proc.stdout.strip() or None
+
+
+def load_runs(path):
+    """ list of runs of a history file, a single run (baseline) as list of one """
+    if not os.path.exists(path):
+        return []
+    with open(path, "r") as handle:
+        data = json.load(handle)
+    return data if isinstance(data, list) else [data]
+
+
+def append_history(root, rows, repo=REPO_DIR):
+    """ append a run to <root>/history.json, returns it """
+    run = {"time": datetime.now().isoformat(timespec="seconds"), "commit": git_commit(repo),
+           "host": platform.node(), "rows": rows}
+    path = os.path.join(root, HISTORY_FILE)
+    runs = load_runs(path) + [run]
+    with open(path, "w") as handle:
+        json.dump(runs, handle, indent=4)
+    return run
+
+
+def compare(rows, baseline_rows, tolerance=TOLERANCE):
+    """ regressions against the baseline rows, matched by case name """
+    base = {row["name"]: row for row in baseline_rows}
+    ret = []
+    for row in rows:
+        ref = base.get(row["name"])
+        if ref is None or ref.get("status") != "ok":
+            continue
+        if row["status"] != "ok":
+            ret.append({"name": row["name"], "metric": "status", "baseline": "ok",
+                        "current": row["status"], "change": None})
+            continue
+        for metric, sign in METRICS.items():
+            old, new = ref.get(metric), row.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if sign * change < -tolerance:
+                ret.append({"name": row["name"], "metric": metric, "baseline": old,
+                            "current": new, "change": round(change, 3)})
+    return pd.DataFrame(ret, columns=["name", "metric", "baseline", "current", "change"])
+
+
+def history_table(runs, metric="cycles_per_s"):
+    """ metric per case (rows) and run (columns) """
+    data = {"{} {}".format(run["time"], run.get("commit") or ""):
+            {row["name"]: row.get(metric) for row in run["rows"]} for run in runs}
+    return pd.DataFrame(data)
+
+
+if __name__ == "__main__":
+    cfg = load_config()
+    parser = argparse.ArgumentParser(description="Simulation throughput benchmarks")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_run = sub.add_parser("run", help="run the benchmark matrix")
+    p_run.add_argument("--tests", nargs="+", choices=list(TESTBENCHES), default=list(TESTBENCHES))
+    p_run.add_argument("--dim", type=int, nargs=3, action="append", default=None,
+                       metavar=("X", "Y", "Z"), help="mesh size, repeat")
+    p_run.add_argument("--load", type=float, nargs="+", default=LOADS,
+                       help="offered loads in flits/node/cycle")
+    p_run.add_argument("--cycles", type=int, default=CYCLES, help="traffic cycles per case")
+    p_run.add_argument("--seed", type=int, default=SEED)
+    p_run.add_argument("--no-wave", action="store_true")
+    p_run.add_argument("--baseline", default=None,
+                       help="baseline run, default <root>/baseline.json or the previous run")
+    p_run.add_argument("--tolerance", type=float, default=TOLERANCE)
+
+    p_base = sub.add_parser("baseline", help="make a run of the history the baseline")
+    p_base.add_argument("--run", type=int, default=-1, help="index in the history")
+
+    p_hist = sub.add_parser("history", help="a metric over all runs")
+    p_hist.add_argument("--metric", default="cycles_per_s")
+    for p in [p_run, p_base, p_hist]:
+        p.add_argument("-o", "--root", default="bench")
+    args = parser.parse_args()
+
+    history = load_runs(os.path.join(args.root, HISTORY_FILE))
+    if args.cmd == "baseline":
+        with open(os.path.join(args.root, BASELINE_FILE), "w") as handle:
+            json.dump(history[args.run], handle, indent=4)
+        print("baseline:", history[args.run]["time"], history[args.run]["commit"])
+        sys.exit(0)
+    if args.cmd == "history":
+        print(history_table(history, args.metric).to_string())
+        sys.exit(0)
+
+    dims = args.dim or [[cfg.max_x_dim, cfg.max_y_dim, cfg.max_z_dim]]
+    cases = bench_cases(args.tests, dims, args.load, args.cycles, args.seed)
+    rows = run_bench(cases, args.root, wave=not args.no_wave)
+    append_history(args.root, rows)
+
+    summary = pd.DataFrame(rows).drop(columns="dir")
+    print(summary.to_string())
+    baseline = load_runs(args.baseline or os.path.join(args.root, BASELINE_FILE)) or history[-1:]
+    regressions = compare(rows, baseline[-1]["rows"] if baseline else [], args.tolerance)
+    if len(regressions):
+        print("regressions against", baseline[-1]["time"], baseline[-1]["commit"])
+        print(regressions.to_string())
+    sys.exit(int((summary["status"] != "ok").any() or len(regressions) > 0))
@@ -0,0 +1,106 @@
+"""
+COPYRIGHT(c) 2022
+INSTITUTE FOR COMMUNICATION TECHNOLOGIES AND EMBEDDED SYSTEMS
+RWTH AACHEN
+GERMANY
+
+This confidential and proprietary software may be used, copied,
+modified, merged, published or distributed according to the
+permissions and/or limitations granted by an authorizing license
+agreement.
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+Author: 1. Tan Yee Yang (tan@ice.rwth-aachen.de)
+        2. Jan Moritz Joseph (joseph@ice.rwth-aachen.de)
+
+Burst framing of axis_sp_inject (BURST_MODE => true).
+
+One AXI transfer carries several injection groups:
+    | time | count | count x header | time | count | ... (tlast)
+axis_sp_inject runs the NoC up to every time word and then writes the
+count headers of the group, so a dense trace needs one DMA transfer per
+burst instead of one per injection cycle. A single time word with tlast
+(e.g. run to inf) is the same in both framings.
+
+    python3 -m emunoc.traffic uniform 0.3 10000 -o in --burst 64
+    make run TEST_NAME=top_axis_validation_tb GENERICS="-gBURST_MODE=true"
+"""
+
+import numpy as np
+
+MAX_GROUPS = 64
+
+
+def encode_burst(groups):
+    """ [(time, headers), ...] -> burst words """
+    parts = []
+    for time, hdrs in groups:
+        hdrs = np.asarray(hdrs, dtype=np.uint32).ravel()
+        parts.append(np.array([time, hdrs.size], dtype=np.uint32))
+        parts.append(hdrs)
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=np.uint32)
+
+
+def decode_burst(words):
+    """ burst words -> [(time, headers), ...] """
+    words = np.asarray(words, dtype=np.uint32).ravel()
+    groups = []
+    pos = 0
+    while pos < words.size:
+        if pos + 1 == words.size:
+            groups.append((int(words[pos]), words[:0]))
+            break
+        count = int(words[pos + 1])
+        assert pos + 2 + count <= words.size, "burst group exceeds the transfer"
+        groups.append((int(words[pos]), words[pos + 2:pos + 2 + count]))
+        pos += 2 + count
+    return groups
+
+
+def burst_batches(batches, max_groups=MAX_GROUPS, max_words=None):
+    """
+    legacy batch dicts (time flit, headers per batch) -> burst batch dicts,
+    up to max_groups groups and max_words words per transfer; the time of a
+    burst is the time of its first group
+    """
+    for data in batches:
+        flit_data = np.asarray(data["flit_data"], dtype=np.uint32)
+        pkt_len = np.asarray(data["pkt_len"], dtype=np.int64)
+        if pkt_len.size == 0:
+            continue
+        starts = np.concatenate([[0], np.cumsum(pkt_len)[:-1]])
+
+        # count word after every time flit
+        words = np.insert(flit_data, starts + 1, (pkt_len - 1).astype(np.uint32))
+        size = pkt_len + 1
+        ends = np.cumsum(size)
+
+        first = 0
+        while first < pkt_len.size:
+            last = min(first + max_groups, pkt_len.size)
+            if max_words:
+                base = ends[first] - size[first]
+                fit = np.searchsorted(ends[first:last] - base, max_words, side="right")
+                last = first + max(int(fit), 1)
+            begin = int(ends[first] - size[first])
+            yield {"flit_data": words[begin:int(ends[last - 1])],
+                   "inj_time": [int(data["inj_time"][first])],
+                   "pkt_len": [int(ends[last - 1]) - begin]}
+            first = last
+
+
+def split_bursts(flit_data, pkt_len):
+    """ same as trace_file.split_batches for a burst trace """
+    flit_data = np.asarray(flit_data, dtype=np.uint32)
+    times, hdrs = [], []
+    start = 0
+    for length in np.asarray(pkt_len, dtype=np.int64).tolist():
+        for time, group in decode_burst(flit_data[start:start + length]):
+            times.append(np.full(group.size, time, dtype=np.uint32))
+            hdrs.append(group)
+        start += length
+    if not hdrs:
+        return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.uint32)
+    return np.concatenate(times), np.concatenate(hdrs)
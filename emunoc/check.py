@@ -0,0 +1,154 @@
+"""
+COPYRIGHT(c) 2022
+INSTITUTE FOR COMMUNICATION TECHNOLOGIES AND EMBEDDED SYSTEMS
+RWTH AACHEN
+GERMANY
+
+This confidential and proprietary software may be used, copied,
+modified, merged, published or distributed according to the
+permissions and/or limitations granted by an authorizing license
+agreement.
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+Author: 1. Tan Yee Yang (tan@ice.rwth-aachen.de)
+        2. Jan Moritz Joseph (joseph@ice.rwth-aachen.de)
+
+Delivery checker for the noc_tb/noc_deadlock_tb outputs.
+
+Every flit of a packet carries its header, so a packet is delivered when
+its header is received exactly len times at its destination PE. All
+per-PE/per-VC outputs out/<pe>/recv_data_noc<vc>.txt are loaded as uint32
+arrays and checked in one pass with numpy.unique:
+    lost        injected, never received
+    missing     received less than len flits
+    duplicate   received more than len flits
+    unexpected  received, never injected
+    wrong_dst   received at another PE than its destination
+
+    python3 -m emunoc.check out --inj in --json check.json
+exits with 1 if any of the above is found.
+"""
+
+import os
+import sys
+import json
+import argparse
+
+import numpy as np
+
+from emunoc.config import load_config
+from emunoc.flit_codec import FlitCodec, int_to_bin
+from emunoc.trace_file import load_trace, iter_flit_text, split_batches
+
+ERRORS = ["lost", "missing", "duplicate", "unexpected", "wrong_dst"]
+
+
+def load_ejected(out_dir, num_pe, max_vc_num):
+    """ all recv_data_noc outputs -> (flits, receiving PE per flit) """
+    flits, pes = [], []
+    for pe in range(num_pe):
+        for vc in range(max_vc_num):
+            path = os.path.join(out_dir, str(pe), "recv_data_noc{}.txt".format(vc))
+            if not os.path.exists(path):
+                continue
+            for chunk in iter_flit_text(path):
+                flits.append(chunk)
+                pes.append(np.full(chunk.size, pe, dtype=np.int64))
+    if not flits:
+        return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.int64)
+    return np.concatenate(flits), np.concatenate(pes)
+
+
+def _count(keys, flits):
+    """ occurrences of every key in flits, keys sorted and unique """
+    uniq, counts = np.unique(flits, return_counts=True)
+    ret = np.zeros(keys.size, dtype=np.int64)
+    ret[np.searchsorted(keys, uniq)] = counts
+    return ret
+
+
+def check_delivery(codec: FlitCodec, inj_hdrs, ej_flits, ej_pes):
+    """ returns a JSON-serializable report """
+    inj_hdrs = np.asarray(inj_hdrs, dtype=np.uint32)
+    ej_flits = np.asarray(ej_flits, dtype=np.uint32)
+
+    keys = np.union1d(inj_hdrs, ej_flits)
+    inj_cnt = _count(keys, inj_hdrs)
+    ej_cnt = _count(keys, ej_flits)
+    info = codec.unpack_hdr(keys)
+    expect = inj_cnt * info["len"].astype(np.int64)
+
+    wrong = codec.unpack_hdr(ej_flits)["dst"].astype(np.int64) != ej_pes
+    wrong_keys, wrong_cnt = np.unique(ej_flits[wrong], return_counts=True)
+
+    sets = {
+        "lost": keys[(inj_cnt > 0) & (ej_cnt == 0)],
+        "missing": keys[(ej_cnt > 0) & (ej_cnt < expect)],
+        "duplicate": keys[(inj_cnt > 0) & (ej_cnt > expect)],
+        "unexpected": keys[(inj_cnt == 0) & (ej_cnt > 0)],
+        "wrong_dst": wrong_keys,
+    }
+    received = (inj_cnt > 0) & (ej_cnt == expect)
+    received[np.searchsorted(keys, wrong_keys)] = False
+
+    report = {
+        "injected_packets": int(inj_cnt.sum()),
+        "ejected_flits": int(ej_flits.size),
+        "received_packets": int(inj_cnt[received].sum()),
+        "wrong_dst_flits": int(wrong_cnt.sum()),
+    }
+    for key in ERRORS:
+        report[key + "_count"] = int(sets[key].size)
+    for key in ERRORS:
+        hdrs = sets[key]
+        rows = codec.unpack_hdr(hdrs)
+        cnt = ej_cnt[np.searchsorted(keys, hdrs)]
+        report[key] = [{"flit": int(hdr), "id": int(rows["id"][i]), "src": int(rows["src"][i]),
+                        "dst": int(rows["dst"][i]), "len": int(rows["len"][i]),
+                        "recv": int(cnt[i])} for i, hdr in enumerate(hdrs)]
+    return report
+
+
+def exit_code(report):
+    return int(any(report[key + "_count"] for key in ERRORS))
+
+
+def print_report(report, verbose=False):
+    for key in ERRORS:
+        if verbose and report[key]:
+            print(key + ":")
+            for itr, row in enumerate(report[key]):
+                print(itr, int_to_bin(row["flit"]),
+                      {k: row[k] for k in ["id", "src", "dst", "len"]}, "recv num:", row["recv"])
+    for key in ["injected_packets", "received_packets", "ejected_flits", "wrong_dst_flits"]:
+        print("{:<20}{}".format(key, report[key]))
+    for key in ERRORS:
+        print("{:<20}{}".format(key + "_count", report[key + "_count"]))
+
+
+def check_run(codec: FlitCodec, trace, out_dir, max_vc_num):
+    """ trace: TraceFile/TextTrace of the injected traffic """
+    _, inj_hdrs = split_batches(trace.flit_data, trace.pkt_len)
+    ej_flits, ej_pes = load_ejected(out_dir, codec.num_pe, max_vc_num)
+    return check_delivery(codec, inj_hdrs, ej_flits, ej_pes)
+
+
+if __name__ == "__main__":
+    cfg = load_config()
+    parser = argparse.ArgumentParser(description="Check NoC delivery of a noc_tb run")
+    parser.add_argument("out", help="directory of <pe>/recv_data_noc<vc>.txt")
+    parser.add_argument("--inj", default="in", help="injected trace, text directory or binary")
+    parser.add_argument("--json", default=None, help="write the report")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+
+    trace = load_trace(args.inj)
+    cfg.check_geometry(trace.geometry)
+    report = check_run(cfg.codec(), trace, args.out, cfg.max_vc_num)
+    print_report(report, args.verbose)
+    if args.json:
+        with open(args.json, "w") as handle:
+            json.dump(report, handle, indent=4)
+    sys.exit(exit_code(report))
@@ -0,0 +1,236 @@
+"""
+COPYRIGHT(c) 2022
+INSTITUTE FOR COMMUNICATION TECHNOLOGIES AND EMBEDDED SYSTEMS
+RWTH AACHEN
+GERMANY
+
+This confidential and proprietary software may be used, copied,
+modified, merged, published or distributed according to the
+permissions and/or limitations granted by an authorizing license
+agreement.
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+Author: 1. Tan Yee Yang (tan@ice.rwth-aachen.de)
+        2. Jan Moritz Joseph (joseph@ice.rwth-aachen.de)
+
+NoC geometry shared by all generators and checkers.
+
+The constants are parsed once from the VHDL packages the testbenches are
+compiled with:
+    NOC_3D_PACKAGE     max_x/y/z_dim, max_vc_num, flit_size,
+                       packet_len_width (or max_packet_len)
+    TESTBENCH_PACKAGE  src_pos, dst_pos
+The NOC_3D_PACKAGE file is searched under source/ and testbench/, or given
+by $EMUNOC_NOC_PACKAGE. Constants that are not found keep DEFAULTS, with
+a warning on stderr naming them.
+
+    from emunoc.config import load_config
+    cfg = load_config()
+    codec = cfg.codec()
+"""
+
+import os
+import re
+import sys
+import ast
+import math
+import operator
+from functools import lru_cache
+
+from emunoc.flit_codec import FlitCodec, bit_width, flit_size
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SEARCH_DIRS = ["source", "testbench"]
+TESTBENCH_PACKAGE = os.path.join("testbench", "utils", "TESTBENCH_PACKAGE.vhd")
+
+DEFAULTS = {
+    "max_x_dim": 4,
+    "max_y_dim": 4,
+    "max_z_dim": 1,
+    "max_vc_num": 2,
+    "flit_size": flit_size,
+    "flit_pkt_width": 5,
+    "src_pos": (0, 0, 0),
+    "dst_pos": (0, 0, 1),
+}
+
+# ----------------------------------------------
+# VHDL constants
+
+_CONSTANT = re.compile(r"constant\s+(\w+)\s*:\s*[\w\s()]+?:=\s*([^;]+);", re.IGNORECASE)
+
+_BINOPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.floordiv,
+    ast.Pow: operator.pow,
+    ast.Mod: operator.mod,
+}
+
+_FUNCS = {
+    "bit_width": bit_width,
+    "log2": math.log2,
+    "ceil": math.ceil,
+    "floor": math.floor,
+    "real": float,
+    "integer": int,
+}
+
+
+def _strip_comments(text):
+    return re.sub(r"--[^\n]*", "", text)
+
+
+def _eval(node, env):
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        return node.value
+    if isinstance(node, ast.Name) and node.id in env:
+        return env[node.id]
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINOPS:
+        return _BINOPS[type(node.op)](_eval(node.left, env), _eval(node.right, env))
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        return -_eval(node.operand, env)
+    if isinstance(node, ast.Tuple):
+        return tuple(_eval(x, env) for x in node.elts)
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) \
+            and node.func.id in _FUNCS:
+        return _FUNCS[node.func.id](*[_eval(x, env) for x in node.args])
+    raise ValueError("unsupported expression")
+
+
+def parse_constants(text, env=None):
+    """
+    integer (and integer aggregate) constants of a VHDL package; constants
+    may refer to earlier ones, everything else is skipped
+    """
+    env = dict(env or {})
+    ret = {}
+    for name, expr in _CONSTANT.findall(_strip_comments(text)):
+        expr = re.sub(r"\bmod\b", "%", expr.strip(), flags=re.IGNORECASE)
+        try:
+            val = _eval(ast.parse(expr.lower(), mode="eval").body,
+                        {k.lower(): v for k, v in env.items()})
+        except (SyntaxError, ValueError, TypeError, ZeroDivisionError):
+            continue
+        env[name] = ret[name.lower()] = val
+    return ret
+
+
+def find_package(name, repo=REPO_DIR):
+    """ path of the VHDL file declaring package name, None if missing """
+    pattern = re.compile(r"^\s*package\s+{}\s+is\b".format(name),
+                         re.IGNORECASE | re.MULTILINE)
+    for search_dir in SEARCH_DIRS:
+        for dirpath, _, fnames in os.walk(os.path.join(repo, search_dir)):
+            for fname in sorted(fnames):
+                if not fname.lower().endswith((".vhd", ".vhdl")):
+                    continue
+                path = os.path.join(dirpath, fname)
+                with open(path, "r", errors="replace") as handle:
+                    if pattern.search(handle.read()):
+                        return path
+    return None
+
+
+# ----------------------------------------------
+# Configuration
+
+
+class NocConfig:
+    def __init__(self, constants: dict, sources=None):
+        self.sources = sources or []
+
+        cfg = dict(DEFAULTS)
+        cfg.update({k: v for k, v in constants.items() if k in DEFAULTS})
+        if "packet_len_width" in constants:
+            cfg["flit_pkt_width"] = constants["packet_len_width"]
+        elif "max_packet_len" in constants:
+            cfg["flit_pkt_width"] = bit_width(constants["max_packet_len"])
+
+        assert cfg["flit_size"] == flit_size, \
+            "only {}-bit flits are supported, package has {}".format(
+                flit_size, cfg["flit_size"])
+
+        self.max_x_dim = int(cfg["max_x_dim"])
+        self.max_y_dim = int(cfg["max_y_dim"])
+        self.max_z_dim = int(cfg["max_z_dim"])
+        self.max_vc_num = int(cfg["max_vc_num"])
+        self.flit_size = int(cfg["flit_size"])
+        self.flit_pkt_width = int(cfg["flit_pkt_width"])
+        self.src_pos = tuple(cfg["src_pos"])
+        self.dst_pos = tuple(cfg["dst_pos"])
+
+        self.num_pe = self.max_x_dim * self.max_y_dim * self.max_z_dim
+        # local + 4 planar ports, + up/down in 3D meshes
+        self.port_num = 7 if self.max_z_dim > 1 else 5
+        self.max_pkt_len = 2**self.flit_pkt_width - 1
+        self._codecs = {}
+
+    def codec(self, xyz_id_width=None) -> FlitCodec:
+        """ widths and offsets are derived once per xyz_id_width """
+        if xyz_id_width not in self._codecs:
+            self._codecs[xyz_id_width] = FlitCodec(
+                self.max_x_dim, self.max_y_dim, self.max_z_dim,
+                self.flit_pkt_width, xyz_id_width)
+        return self._codecs[xyz_id_width]
+
+    def geometry(self):
+        """ geometry dict as stored in binary traces """
+        return {"max_x_dim": self.max_x_dim, "max_y_dim": self.max_y_dim,
+                "max_z_dim": self.max_z_dim, "flit_pkt_width": self.flit_pkt_width,
+                "max_vc_num": self.max_vc_num}
+
+    def check_geometry(self, geometry: dict):
+        """ assert a trace geometry matches, zero fields are unknown """
+        for key, val in self.geometry().items():
+            other = int(geometry.get(key, 0) or 0)
+            assert other in [0, val], \
+                "trace has {}={} but the NoC package {}".format(key, other, val)
+
+    def router(self, pos):
+        """ z,y,x position -> router id, same as TESTBENCH_PACKAGE """
+        return pos[0] * self.max_x_dim * self.max_y_dim + pos[1] * self.max_x_dim + pos[2]
+
+    def __repr__(self):
+        return "NocConfig({}x{}x{}, vc={}, flit_pkt_width={})".format(
+            self.max_x_dim, self.max_y_dim, self.max_z_dim, self.max_vc_num,
+            self.flit_pkt_width)
+
+
+@lru_cache(maxsize=None)
+def load_config(noc_package=None, tb_package=None, repo=REPO_DIR) -> NocConfig:
+    """ parse the packages once per process """
+    noc_package = noc_package or os.environ.get("EMUNOC_NOC_PACKAGE") or \
+        find_package("NOC_3D_PACKAGE", repo)
+    tb_package = tb_package or os.path.join(repo, TESTBENCH_PACKAGE)
+
+    constants, sources = {}, []
+    for path in [noc_package, tb_package]:
+        if path and os.path.exists(path):
+            with open(path, "r") as handle:
+                constants.update(parse_constants(handle.read(), constants))
+            sources.append(path)
+
+    cfg = NocConfig(constants, sources)
+    missing = [key for key in DEFAULTS if key not in constants and
+               not (key == "flit_pkt_width" and
+                    ("packet_len_width" in constants or "max_packet_len" in constants))]
+    if missing:
+        where = noc_package if noc_package in sources else "no NOC_3D_PACKAGE found"
+        print("emunoc.config: {}, using the defaults {}".format(
+            where, ", ".join("{}={}".format(key, DEFAULTS[key]) for key in missing)),
+            file=sys.stderr)
+    return cfg
+
+
+if __name__ == "__main__":
+    cfg = load_config()
+    codec = cfg.codec()
+    print(cfg)
+    print("sources:", cfg.sources or "defaults")
+    for key in ["num_pe", "pe_addr_width", "flit_id_width", "dst_offset", "src_offset",
+                "id_offset", "xyz_addr_width", "xyz_id_offset", "hw_id_width"]:
+        print("{:<16}{}".format(key, getattr(codec, key)))
@@ -0,0 +1,256 @@
+"""
+COPYRIGHT(c) 2022
+INSTITUTE FOR COMMUNICATION TECHNOLOGIES AND EMBEDDED SYSTEMS
+RWTH AACHEN
+GERMANY
+
+This confidential and proprietary software may be used, copied,
+modified, merged, published or distributed according to the
+permissions and/or limitations granted by an authorizing license
+agreement.
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+Author: 1. Tan Yee Yang (tan@ice.rwth-aachen.de)
+        2. Jan Moritz Joseph (joseph@ice.rwth-aachen.de)
+
+Vectorized header flit codec.
+
+Header flits are handled as numpy uint32 arrays and packed/unpacked with
+shifts and masks, so whole batches are converted at once.
+
+Compact layout (PE id), written by the host into axis_sp_inject and read
+back from axis_ps_eject:
+    | id | src | dst | len |
+
+XYZ layout, used inside the NoC (axis_sp_inject.conv_hdr and
+axis_ps_eject.iconv_hdr translate between both):
+    | id | z_src | y_src | x_src | z_dst | y_dst | x_dst | len |
+"""
+
+import math
+import numpy as np
+
+# ----------------------------------------------
+# General function
+
+flit_size = 32  # const, only 32-bit flits are supported
+
+
+def bit_width(val: int):
+    if val > 1:
+        return math.ceil(math.log2(val))
+    elif val == 1:
+        return 1
+    else:
+        return 0
+
+
+def int_to_bin(val, length=flit_size):
+    ret = bin(val)[2:].zfill(length)
+    assert length == len(ret), "length={} len(ret)={}".format(length, len(ret))
+    return ret
+
+
+def flits_to_text(flits):
+    """ uint32 array -> newline separated "0101..." lines (no trailing newline) """
+    flits = np.asarray(flits, dtype=np.uint32).ravel()
+    if flits.size == 0:
+        return ""
+    bits = np.unpackbits(flits.astype(">u4").view(np.uint8).reshape(-1, 4), axis=1)
+    chars = np.empty((flits.size, flit_size + 1), dtype=np.uint8)
+    chars[:, :flit_size] = bits + ord("0")
+    chars[:, flit_size] = ord("\n")
+    return chars.tobytes()[:-1].decode("ascii")
+
+
+def flits_to_bin(flits):
+    """ uint32 array -> list of "0101..." strings """
+    text = flits_to_text(flits)
+    return text.split("\n") if text else []
+
+
+def bin_to_flits(lines):
+    """ "0101..." lines (str, bytes or list of them) -> uint32 array """
+    if isinstance(lines, (str, bytes)):
+        lines = lines.split()
+    if len(lines) == 0:
+        return np.zeros(0, dtype=np.uint32)
+
+    arr = np.array(lines, dtype="S{}".format(flit_size))
+    bits = arr.view(np.uint8).reshape(-1, flit_size) - np.uint8(ord("0"))
+    assert bits.max() <= 1, "flit lines must be {} binary characters".format(
+        flit_size)
+    return np.packbits(bits, axis=1).view(">u4").ravel().astype(np.uint32)
+
+
+# ----------------------------------------------
+# Codec
+
+
+class FlitCodec:
+    def __init__(self, max_x_dim, max_y_dim, max_z_dim, flit_pkt_width,
+                 xyz_id_width=None):
+        self.max_x_dim = max_x_dim
+        self.max_y_dim = max_y_dim
+        self.max_z_dim = max_z_dim
+        self.num_pe = max_x_dim * max_y_dim * max_z_dim
+
+        self.flit_pkt_width = flit_pkt_width
+        self.max_pkt_len = 2**flit_pkt_width - 1
+
+        # compact layout
+        self.pe_addr_width = bit_width(self.num_pe)
+        self.flit_id_width = flit_size - flit_pkt_width - 2*self.pe_addr_width
+        assert self.flit_id_width > 0, "no bits left for the packet id"
+
+        self.dst_offset = flit_pkt_width
+        self.src_offset = self.dst_offset + self.pe_addr_width
+        self.id_offset = self.src_offset + self.pe_addr_width
+
+        # xyz layout
+        self.x_addr_width = bit_width(max_x_dim)
+        self.y_addr_width = bit_width(max_y_dim)
+        self.z_addr_width = bit_width(max_z_dim)
+        self.xyz_addr_width = self.x_addr_width + \
+            self.y_addr_width + self.z_addr_width
+
+        self.xyz_dst_offset = flit_pkt_width
+        self.xyz_src_offset = self.xyz_dst_offset + self.xyz_addr_width
+        self.xyz_id_offset = self.xyz_src_offset + self.xyz_addr_width
+        if xyz_id_width is None:
+            xyz_id_width = flit_size - self.xyz_id_offset
+        self.xyz_id_width = xyz_id_width
+        self.xyz_pad_offset = self.xyz_id_offset + xyz_id_width
+        assert self.xyz_pad_offset <= flit_size, "xyz header exceeds flit size"
+
+        # id bits surviving conv_hdr -> iconv_hdr through the NoC
+        self.hw_id_width = min(self.flit_id_width, flit_size - self.xyz_id_offset)
+
+    # ------------------------------------------
+    # PE id <-> coordinates
+
+    def pe_to_xyz(self, pe):
+        pe = np.asarray(pe, dtype=np.int64)
+        layer = self.max_x_dim * self.max_y_dim
+        return pe % layer % self.max_x_dim, pe % layer // self.max_x_dim, pe // layer
+
+    def xyz_to_pe(self, x, y, z):
+        x = np.asarray(x, dtype=np.int64)
+        return x + np.asarray(y) * self.max_x_dim + np.asarray(z) * self.max_x_dim * self.max_y_dim
+
+    # ------------------------------------------
+    # Compact layout
+
+    def pack_hdr(self, pkt_id, src, dst, pkt_len):
+        pkt_id = np.asarray(pkt_id, dtype=np.uint64)
+        src = np.asarray(src, dtype=np.uint64)
+        dst = np.asarray(dst, dtype=np.uint64)
+        pkt_len = np.asarray(pkt_len, dtype=np.uint64)
+
+        assert np.all(pkt_id >> self.flit_id_width == 0), "pkt_id out of range"
+        assert np.all(src >> self.pe_addr_width == 0), "src out of range"
+        assert np.all(dst >> self.pe_addr_width == 0), "dst out of range"
+        assert np.all(pkt_len >> self.flit_pkt_width == 0), "pkt_len out of range"
+
+        hdr = (pkt_id << self.id_offset) | (src << self.src_offset) | \
+            (dst << self.dst_offset) | pkt_len
+        return hdr.astype(np.uint32)
+
+    def unpack_hdr(self, flits):
+        flits = np.asarray(flits, dtype=np.uint32)
+        pe_mask = np.uint32(2**self.pe_addr_width - 1)
+        return {
+            "id": flits >> np.uint32(self.id_offset),
+            "src": (flits >> np.uint32(self.src_offset)) & pe_mask,
+            "dst": (flits >> np.uint32(self.dst_offset)) & pe_mask,
+            "len": flits & np.uint32(self.max_pkt_len),
+        }
+
+    def bin_to_info(self, binaries):
+        """ Single "0101..." header -> dict of ints """
+        assert (len(binaries) == flit_size), len(binaries)
+        info = self.unpack_hdr(np.uint32(int(binaries, 2)))
+        return {key: int(val) for key, val in info.items()}
+
+    # ------------------------------------------
+    # XYZ layout
+
+    def pack_xyz(self, pkt_id, src, dst, pkt_len, pad=0):
+        xs, ys, zs = self.pe_to_xyz(src)
+        xd, yd, zd = self.pe_to_xyz(dst)
+        hdr = np.asarray(pkt_len, dtype=np.uint64)
+        fields = [
+            (xd, self.x_addr_width), (yd, self.y_addr_width), (zd, self.z_addr_width),
+            (xs, self.x_addr_width), (ys, self.y_addr_width), (zs, self.z_addr_width),
+            (pkt_id, self.xyz_id_width), (pad, flit_size - self.xyz_pad_offset),
+        ]
+        offset = self.flit_pkt_width
+        for val, width in fields:
+            val = np.asarray(val, dtype=np.uint64)
+            assert np.all(val >> np.uint64(width) == 0), "field out of range"
+            hdr = hdr | (val << np.uint64(offset))
+            offset += width
+        return hdr.astype(np.uint32)
+
+    def unpack_xyz(self, flits):
+        flits = np.asarray(flits, dtype=np.uint32)
+
+        def field(offset, width):
+            return (flits >> np.uint32(offset)) & np.uint32(2**width - 1)
+
+        offset = self.xyz_dst_offset
+        xd = field(offset, self.x_addr_width)
+        yd = field(offset + self.x_addr_width, self.y_addr_width)
+        zd = field(offset + self.x_addr_width + self.y_addr_width, self.z_addr_width)
+        offset = self.xyz_src_offset
+        xs = field(offset, self.x_addr_width)
+        ys = field(offset + self.x_addr_width, self.y_addr_width)
+        zs = field(offset + self.x_addr_width + self.y_addr_width, self.z_addr_width)
+
+        return {
+            "pad": flits >> np.uint32(self.xyz_pad_offset) if self.xyz_pad_offset < flit_size
+            else np.zeros_like(flits),
+            "id": field(self.xyz_id_offset, self.xyz_id_width),
+            "src": self.xyz_to_pe(xs, ys, zs).astype(np.uint32),
+            "dst": self.xyz_to_pe(xd, yd, zd).astype(np.uint32),
+            "len": flits & np.uint32(self.max_pkt_len),
+        }
+
+    # ------------------------------------------
+    # Hardware conversions, bit exact with the VHDL functions
+
+    def _move_upper(self, flits, ret, offset_var, offset_ret):
+        upper = flits.astype(np.uint64) >> np.uint64(offset_var)
+        upper = (upper << np.uint64(offset_ret)) & np.uint64(2**flit_size - 1)
+        return ret | upper
+
+    def _xyz_addr(self, pe):
+        x, y, z = self.pe_to_xyz(pe)
+        addr = x.astype(np.uint64) & np.uint64(2**self.x_addr_width - 1)
+        addr |= (y.astype(np.uint64) & np.uint64(2**self.y_addr_width - 1)) \
+            << np.uint64(self.x_addr_width)
+        addr |= (z.astype(np.uint64) & np.uint64(2**self.z_addr_width - 1)) \
+            << np.uint64(self.x_addr_width + self.y_addr_width)
+        return addr
+
+    def conv_hdr(self, flits):
+        """ axis_sp_inject.conv_hdr: compact -> xyz """
+        flits = np.asarray(flits, dtype=np.uint32)
+        info = self.unpack_hdr(flits)
+        ret = (info["len"].astype(np.uint64) |
+               (self._xyz_addr(info["dst"]) << np.uint64(self.xyz_dst_offset)) |
+               (self._xyz_addr(info["src"]) << np.uint64(self.xyz_src_offset)))
+        ret = self._move_upper(flits, ret, self.id_offset, self.xyz_id_offset)
+        return ret.astype(np.uint32)
+
+    def iconv_hdr(self, flits):
+        """ axis_ps_eject.iconv_hdr: xyz -> compact """
+        flits = np.asarray(flits, dtype=np.uint32)
+        info = self.unpack_xyz(flits)
+        ret = (info["len"].astype(np.uint64) |
+               (info["dst"].astype(np.uint64) << np.uint64(self.dst_offset)) |
+               (info["src"].astype(np.uint64) << np.uint64(self.src_offset)))
+        ret = self._move_upper(flits, ret, self.xyz_id_offset, self.id_offset)
+        return ret.astype(np.uint32)
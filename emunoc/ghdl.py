@@ -0,0 +1,345 @@
+"""
+COPYRIGHT(c) 2022
+INSTITUTE FOR COMMUNICATION TECHNOLOGIES AND EMBEDDED SYSTEMS
+RWTH AACHEN
+GERMANY
+
+This confidential and proprietary software may be used, copied,
+modified, merged, published or distributed according to the
+permissions and/or limitations granted by an authorizing license
+agreement.
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+Author: 1. Tan Yee Yang (tan@ice.rwth-aachen.de)
+        2. Jan Moritz Joseph (joseph@ice.rwth-aachen.de)
+
+GHDL commands and an incremental build cache.
+
+A build is keyed on the hash of every VHDL source, the rendered
+TESTBENCH_PACKAGE.vhd, the test name and the GHDL flags:
+    <cache>/<key>/
+        TESTBENCH_PACKAGE.vhd
+        ghdlwork/             analyzed library
+        <test_name>           elaborated binary (llvm/gcc backends)
+        build.log
+        done
+Testbench parameters passed as top-level generics (`ghdl -r -gNAME=VALUE`)
+are not part of the key, so one build serves every run of a sweep:
+    python3 -m emunoc.ghdl traffic_corr_tb -g SRC_ROUTER=0 -g DST_ROUTER=15 \
+        --stop-time 10us
+
+Testbenches with a sim_monitor (top_axis_validation_tb, noc_tb) stop by
+themselves once every injected packet is ejected, run them with
+`--stop-time none`; parse_monitor() reads the final cycle from the log:
+    python3 -m emunoc.ghdl top_axis_validation_tb --stop-time none -g IDLE_CYCLES=200
+
+Constants of NOC_3D_PACKAGE (e.g. the mesh size) can be rendered into
+the build as well and are part of the key.
+
+A hit reuses the build as is. A miss with the same sources but another
+package is seeded from the last such build, so `ghdl -m` only reanalyzes
+the package and the units depending on it. Builds are guarded by a file
+lock and can be shared by parallel sweep jobs.
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import fcntl
+import shlex
+import shutil
+import hashlib
+import subprocess
+from contextlib import contextmanager
+
+from emunoc.config import find_package
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# same as Makefile
+GHDL_CMD = "ghdl"
+GHDL_FLAGS = ["--warn-no-vital-generic", "--std=08"]
+VHDL_EX = ".vhd"
+SOURCE_DIRS = ["source", "testbench"]
+PACKAGE_FILE = os.path.join("testbench", "utils", "TESTBENCH_PACKAGE.vhd")
+NOC_PACKAGE = "NOC_3D_PACKAGE"
+NOC_PACKAGE_FILE = NOC_PACKAGE + VHDL_EX
+WORK_DIR = "ghdlwork"
+
+BUILD_DONE = "done"
+BUILD_META = "build.json"
+
+# report of testbench/utils/sim_monitor.vhd
+MONITOR_PATTERN = re.compile(r"sim_monitor: (done|stalled) at cycle (\d+) \(injected (\d+), "
+                             r"ejected (\d+), last ejection at cycle (\d+)\)")
+MONITOR_FIELDS = ["cycles", "injected", "ejected", "last_ejection"]
+
+# ----------------------------------------------
+# Sources
+
+
+def vhdl_value(val):
+    if isinstance(val, (list, tuple)):
+        return "(" + ", ".join(map(str, val)) + ")"
+    return str(val)
+
+
+def render_package(text, constants: dict):
+    """ replace the values of the given constants in a VHDL package """
+    for name, val in constants.items():
+        pattern = r"(constant\s+{}\s*:[^:]*:=\s*)([^;]+)(;)".format(re.escape(name))
+        text, count = re.subn(pattern, lambda m: m.group(1) + vhdl_value(val) + m.group(3),
+                              text, flags=re.IGNORECASE)
+        assert count == 1, "constant {} not found in package".format(name)
+    return text
+
+
+def vhdl_sources(repo=REPO_DIR):
+    """ all VHDL files of the Makefile except the testbench package """
+    files = []
+    for src_dir in SOURCE_DIRS:
+        for dirpath, _, fnames in os.walk(os.path.join(repo, src_dir)):
+            files += [os.path.join(dirpath, x) for x in fnames if x.endswith(VHDL_EX)]
+    package = os.path.join(repo, PACKAGE_FILE)
+    return sorted(x for x in files if os.path.abspath(x) != package)
+
+
+def package_text(constants: dict, repo=REPO_DIR):
+    with open(os.path.join(repo, PACKAGE_FILE), "r") as handle:
+        return render_package(handle.read(), constants)
+
+
+def noc_package_path(repo=REPO_DIR):
+    path = find_package(NOC_PACKAGE, repo)
+    assert path, "{} not found under {}".format(NOC_PACKAGE, repo)
+    return path
+
+
+def noc_package_text(constants: dict, repo=REPO_DIR):
+    """ NOC_3D_PACKAGE with other constants, e.g. the mesh size """
+    with open(noc_package_path(repo), "r") as handle:
+        return render_package(handle.read(), constants)
+
+
+# ----------------------------------------------
+# Commands
+
+
+def ghdl_import(sources, workdir=WORK_DIR):
+    return [GHDL_CMD, "-i", *GHDL_FLAGS, "--workdir=" + workdir, "--work=work", *sources]
+
+
+def ghdl_make(test_name, workdir=WORK_DIR):
+    return [GHDL_CMD, "-m", *GHDL_FLAGS, "--workdir=" + workdir, "--work=work", test_name]
+
+
+def generic_args(generics: dict):
+    """ top-level generics, strings are passed without quotes """
+    return ["-g{}={}".format(key, val) for key, val in (generics or {}).items()]
+
+
+def stop_time_arg(text):
+    """ --stop-time value, "none" or "" runs until the testbench stops """
+    return None if text is None or text.lower() in ("", "none") else text
+
+
+def ghdl_run(test_name, stop_time="1000ns", wave=False, workdir=WORK_DIR, binary=None,
+             generics=None):
+    """
+    run options are the same for `ghdl -r` and an elaborated binary;
+    without stop_time the testbench has to stop itself (sim_monitor)
+    """
+    if binary:
+        cmd = [binary]
+    else:
+        cmd = [GHDL_CMD, "-r", *GHDL_FLAGS, "--workdir=" + workdir, "--work=work", test_name]
+    if wave:
+        cmd.append("--wave={}.ghw".format(test_name))
+    cmd += generic_args(generics) + ["--ieee-asserts=disable"]
+    if stop_time:
+        cmd.append("--stop-time=" + stop_time)
+    return cmd
+
+
+def parse_monitor(text):
+    """
+    last sim_monitor report of a run log as dict (status done/stalled,
+    cycles, injected, ejected, last_ejection), None without one
+    """
+    matches = MONITOR_PATTERN.findall(text)
+    if not matches:
+        return None
+    status, *values = matches[-1]
+    return dict(status=status, **dict(zip(MONITOR_FIELDS, map(int, values))))
+
+
+def run_logged(cmds, cwd, log, env=None):
+    """ run commands until one fails, returns its returncode """
+    ret = 0
+    with open(log, "a") as handle:
+        for cmd in cmds:
+            handle.write("$ " + shlex.join(cmd) + "\n")
+            handle.flush()
+            try:
+                ret = subprocess.run(cmd, cwd=cwd, stdout=handle,
+                                     stderr=subprocess.STDOUT, env=env).returncode
+            except OSError as err:
+                handle.write(str(err) + "\n")
+                ret = 127
+            if ret:
+                break
+    return ret
+
+
+# ----------------------------------------------
+# Build cache
+
+
+def _digest(*parts):
+    sha = hashlib.sha256()
+    for part in parts:
+        sha.update(part if isinstance(part, bytes) else str(part).encode())
+        sha.update(b"\0")
+    return sha.hexdigest()[:16]
+
+
+def file_digest(path):
+    with open(path, "rb") as handle:
+        return _digest(handle.read())
+
+
+@contextmanager
+def file_lock(path):
+    with open(path, "w") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+class BuildCache:
+    def __init__(self, path, repo=REPO_DIR):
+        self.path = os.path.abspath(path)
+        self.repo = repo
+        os.makedirs(self.path, exist_ok=True)
+        self._sources = None
+
+    def sources(self):
+        """ (path, digest) of the static sources, hashed once per cache object """
+        if self._sources is None:
+            self._sources = [(x, file_digest(x)) for x in vhdl_sources(self.repo)]
+        return self._sources
+
+    def keys(self, test_name, package: str):
+        """ (sources key, build key) """
+        src_key = _digest(GHDL_CMD, *GHDL_FLAGS, test_name,
+                          *[y for x in self.sources() for y in x])
+        return src_key, _digest(src_key, package)
+
+    def build(self, test_name, constants: dict = None, log=None, noc_constants: dict = None):
+        """
+        returns (build dir, hit, returncode); noc_constants render
+        NOC_3D_PACKAGE into the build dir as well
+        """
+        package = package_text(constants or {}, self.repo)
+        noc_package = noc_package_text(noc_constants, self.repo) if noc_constants else None
+        src_key, key = self.keys(test_name, package + (noc_package or ""))
+        build_dir = os.path.join(self.path, key)
+        log = log or os.path.join(build_dir, "build.log")
+
+        with file_lock(build_dir + ".lock"):
+            if os.path.exists(os.path.join(build_dir, BUILD_DONE)):
+                return build_dir, True, 0
+
+            if os.path.exists(build_dir):
+                shutil.rmtree(build_dir)
+            seed = self._seed(src_key)
+            if seed:
+                shutil.copytree(seed, build_dir, symlinks=True,
+                                ignore=shutil.ignore_patterns(BUILD_DONE, BUILD_META, "*.log"))
+            os.makedirs(os.path.join(build_dir, WORK_DIR), exist_ok=True)
+
+            pkg_file = os.path.basename(PACKAGE_FILE)
+            with open(os.path.join(build_dir, pkg_file), "w") as handle:
+                handle.write(package)
+            sources = [x for x, _ in self.sources()] + [pkg_file]
+            if noc_package:
+                with open(os.path.join(build_dir, NOC_PACKAGE_FILE), "w") as handle:
+                    handle.write(noc_package)
+                original = os.path.abspath(noc_package_path(self.repo))
+                sources = [x for x in sources if os.path.abspath(x) != original]
+                sources.append(NOC_PACKAGE_FILE)
+
+            # the package paths are relative, so seeded libraries stay valid
+            ret = run_logged([ghdl_import(sources), ghdl_make(test_name)], build_dir, log)
+            if ret:
+                return build_dir, False, ret
+
+            with open(os.path.join(build_dir, BUILD_META), "w") as handle:
+                json.dump({"test_name": test_name, "sources": src_key,
+                           "constants": {k: vhdl_value(v) for k, v in (constants or {}).items()},
+                           "noc_constants": {k: vhdl_value(v)
+                                             for k, v in (noc_constants or {}).items()}},
+                          handle, indent=4)
+            open(os.path.join(build_dir, BUILD_DONE), "w").close()
+            with open(os.path.join(self.path, src_key + ".seed"), "w") as handle:
+                handle.write(key)
+        return build_dir, False, 0
+
+    def _seed(self, src_key):
+        try:
+            with open(os.path.join(self.path, src_key + ".seed"), "r") as handle:
+                seed = os.path.join(self.path, handle.read().strip())
+        except FileNotFoundError:
+            return None
+        if not os.path.exists(os.path.join(seed, BUILD_DONE)):
+            return None
+        return seed
+
+    def run_cmd(self, build_dir, test_name, stop_time="1000ns", wave=False, generics=None):
+        """ command running a cached build from any working directory """
+        binary = os.path.join(build_dir, test_name)
+        if not os.access(binary, os.X_OK):
+            binary = None
+        return ghdl_run(test_name, stop_time, wave,
+                        os.path.join(build_dir, WORK_DIR), binary, generics)
+
+    def clean(self):
+        shutil.rmtree(self.path)
+        os.makedirs(self.path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build (cached) and run a GHDL testbench")
+    parser.add_argument("test_name")
+    parser.add_argument("-g", "--generic", action="append", default=[],
+                        metavar="NAME=VALUE", help="top-level generic, repeat")
+    parser.add_argument("--stop-time", type=stop_time_arg, default="1000ns",
+                        help="'none' runs until the sim_monitor stops")
+    parser.add_argument("--wave", action="store_true")
+    parser.add_argument("--cache", default=".ghdl_cache")
+    args = parser.parse_args()
+
+    generics = dict(x.split("=", 1) for x in args.generic)
+    cache = BuildCache(args.cache)
+    build_dir, hit, ret = cache.build(args.test_name)
+    print("build", build_dir, "hit" if hit else "miss")
+    if ret:
+        sys.exit(ret)
+    cmd = cache.run_cmd(build_dir, args.test_name, args.stop_time, args.wave, generics)
+    print("$", shlex.join(cmd), flush=True)
+    monitor = None
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                          text=True) as proc:
+        for line in proc.stdout:
+            print(line, end="", flush=True)
+            monitor = parse_monitor(line) or monitor
+    if monitor:
+        for key, val in monitor.items():
+            print("{:<14}{}".format(key, val))
+    sys.exit(proc.returncode)
@@ -0,0 +1,121 @@
+"""
+COPYRIGHT(c) 2022
+INSTITUTE FOR COMMUNICATION TECHNOLOGIES AND EMBEDDED SYSTEMS
+RWTH AACHEN
+GERMANY
+
+This confidential and proprietary software may be used, copied,
+modified, merged, published or distributed according to the
+permissions and/or limitations granted by an authorizing license
+agreement.
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+Author: 1. Tan Yee Yang (tan@ice.rwth-aachen.de)
+        2. Jan Moritz Joseph (joseph@ice.rwth-aachen.de)
+
+Emulation efficiency from the clock_halter halt counters.
+
+With HALT_STATS, axis_ps_eject sends a halt window ahead of every
+ejection window
+    | HALT_MARK (all ones but bit 0) | cycle | 4 | run | eject | inj_full | host (tlast) |
+The counters are clk (wall) cycles since reset by what the NoC did:
+    run       clkh enabled
+    eject     halted by ps_halt, axis_ps_eject drains the ejection FIFOs
+    inj_full  at the upper bound, axis_sp_inject waits on a full pe_inject FIFO
+    host      at the upper bound, waiting for the next window of the host
+Efficiency is NoC cycles / wall cycles. clkh runs at half the clk rate,
+so it is at most 0.5 even without any halt.
+
+    python3 -m emunoc.halt_report testdata/top_axis_validation_tb/out/recv_flit.txt --csv halts.csv
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from emunoc.flit_codec import flit_size
+from emunoc.perf import HALT_MARK, split_marked
+from emunoc.trace_file import read_flit_text
+
+REASONS = ["run", "eject", "inj_full", "host"]
+CLK_PER_NOC_CYCLE = 2
+
+
+def windows(words):
+    """
+    axis_ps_eject stream -> per halt window: NoC cycle, wall cycles per
+    reason since the previous window and the efficiency of that interval
+    """
+    _, marked = split_marked(words)
+    rows = []
+    prev_cycle, prev = 0, np.zeros(len(REASONS), dtype=np.int64)
+    for cycle, data in marked[HALT_MARK]:
+        assert data.size == len(REASONS), \
+            "halt window of {} words at cycle {}".format(data.size, cycle)
+        counters = data.astype(np.int64)
+        delta = (counters - prev) % 2**flit_size
+        row = dict(zip(REASONS, delta))
+        row["cycle"] = cycle
+        row["noc_cycles"] = cycle - prev_cycle
+        rows.append(row)
+        prev_cycle, prev = cycle, counters
+
+    df = pd.DataFrame(rows, columns=["cycle", "noc_cycles"] + REASONS)
+    df["wall"] = df[REASONS].sum(axis=1)
+    df["efficiency"] = df["noc_cycles"] / df["wall"].clip(lower=1)
+    return df
+
+
+def breakdown(df):
+    """ wall cycles per reason, share and efficiency without that reason """
+    noc = df["noc_cycles"].sum()
+    wall = max(int(df["wall"].sum()), 1)
+    rows = []
+    for reason in REASONS:
+        cycles = int(df[reason].sum())
+        rows.append({
+            "reason": reason,
+            "cycles": cycles,
+            "share": cycles / wall,
+            # what removing the cause would give, run is the floor
+            "efficiency_without": noc / max(wall - cycles, 1) if reason != "run" else np.nan,
+        })
+    return pd.DataFrame(rows).set_index("reason")
+
+
+def summary(df):
+    noc = int(df["noc_cycles"].sum())
+    wall = int(df["wall"].sum())
+    return {
+        "windows": len(df),
+        "noc_cycles": noc,
+        "wall_cycles": wall,
+        "efficiency": round(noc / max(wall, 1), 4),
+        "max_efficiency": 1 / CLK_PER_NOC_CYCLE,
+        "halted": round(1 - int(df["run"].sum()) / max(wall, 1), 4),
+    }
+
+
+def load(path):
+    """ recv_flit.txt or a .npy word array -> window table """
+    words = np.load(path) if path.endswith(".npy") else read_flit_text(path)
+    return windows(words)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Emulation efficiency by halt reason")
+    parser.add_argument("recv", help="axis_ps_eject output, e.g. out/recv_flit.txt")
+    parser.add_argument("--csv", help="write the per-window table")
+    args = parser.parse_args()
+
+    df = load(args.recv)
+    assert not df.empty, "no halt windows in {}, run with HALT_STATS".format(args.recv)
+    for key, val in summary(df).items():
+        print("{:<16}{}".format(key, val))
+    print(breakdown(df).to_string())
+
+    if args.csv:
+        df.to_csv(args.csv, index=False)
@@ -0,0 +1,353 @@
+"""
+COPYRIGHT(c) 2022
+INSTITUTE FOR COMMUNICATION TECHNOLOGIES AND EMBEDDED SYSTEMS
+RWTH AACHEN
+GERMANY
+
+This confidential and proprietary software may be used, copied,
+modified, merged, published or distributed according to the
+permissions and/or limitations granted by an authorizing license
+agreement.
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+Author: 1. Tan Yee Yang (tan@ice.rwth-aachen.de)
+        2. Jan Moritz Joseph (joseph@ice.rwth-aachen.de)
+
+Asyncio host driver of the hybrid emulation loop.
+
+Every window is one s_axis transfer (ub_count word, header flits) and
+the ejections come back as axis_ps_eject transfers (cycle word, headers,
+0). Three tasks run as a pipeline:
+    encoder   builds the next transfers, up to depth windows ahead
+    writer    sends them, a write returns once the transfer is accepted,
+              i.e. the NoC ran up to its ub_count
+    reader    receives and decodes ejection transfers while the next
+              windows are written
+so encoding and decoding are hidden behind the transport round trips.
+
+A transport has two coroutines, write(words) and read() -> words or None
+at the end of the stream:
+    TlmTransport      emunoc.tlm in process
+    StreamTransport   length-prefixed little-endian words over a socket,
+                      e.g. to `python3 -m emunoc.host serve --unix sock`
+
+    python3 -m emunoc.host run testdata/top_axis_validation_tb/in --tlm
+    python3 -m emunoc.host run trace.bin --unix /tmp/emunoc.sock
+"""
+
+import sys
+import time
+import struct
+import asyncio
+import argparse
+import itertools
+
+import numpy as np
+
+from emunoc import analysis
+from emunoc.burst import encode_burst
+from emunoc.config import load_config
+from emunoc.flit_codec import FlitCodec
+from emunoc.scheduler import RUN_TO_INF, from_trace
+from emunoc.tlm import AxisValidationModel
+from emunoc.trace_file import load_trace
+
+DEPTH = 2
+TIMEOUT = 10.0
+
+# ----------------------------------------------
+# Transports
+
+
+class TlmTransport:
+    """ AxisValidationModel behind the transport interface """
+
+    def __init__(self, tlm: AxisValidationModel):
+        self.tlm = tlm
+        self.frames = asyncio.Queue()
+
+    async def write(self, words):
+        await asyncio.to_thread(self.tlm.send, words)
+        frame = self.tlm.receive()
+        while frame is not None:
+            self.frames.put_nowait(frame)
+            frame = self.tlm.receive()
+
+    async def read(self):
+        return await self.frames.get()
+
+    async def close(self):
+        pass
+
+
+def _pack(words):
+    words = np.asarray(words, dtype="<u4").ravel()
+    return struct.pack("<I", words.size) + words.tobytes()
+
+
+async def _unpack(reader: asyncio.StreamReader):
+    """ next transfer, None at EOF """
+    try:
+        count, = struct.unpack("<I", await reader.readexactly(4))
+        data = await reader.readexactly(4 * count)
+    except asyncio.IncompleteReadError:
+        return None
+    return np.frombuffer(data, dtype="<u4").astype(np.uint32)
+
+
+class StreamTransport:
+    """ uint32 word count, then the words, both little endian """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, unix=None, host="localhost", port=None):
+        if unix:
+            return cls(*await asyncio.open_unix_connection(unix))
+        return cls(*await asyncio.open_connection(host, port))
+
+    async def write(self, words):
+        self.writer.write(_pack(words))
+        await self.writer.drain()
+
+    async def read(self):
+        return await _unpack(self.reader)
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def serve(make_tlm, unix=None, host="localhost", port=None):
+    """
+    socket stand-in for the board: every connection gets a fresh TLM,
+    ejection transfers are written back after each s_axis transfer
+    """
+    async def handle(reader, writer):
+        tlm = make_tlm()
+        while True:
+            words = await _unpack(reader)
+            if words is None:
+                break
+            await asyncio.to_thread(tlm.send, words)
+            frame = tlm.receive()
+            while frame is not None:
+                writer.write(_pack(frame))
+                frame = tlm.receive()
+            await writer.drain()
+        writer.close()
+
+    if unix:
+        server = await asyncio.start_unix_server(handle, unix)
+    else:
+        server = await asyncio.start_server(handle, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+# ----------------------------------------------
+# Driver
+
+
+class HostDriver:
+    def __init__(self, codec: FlitCodec, transport, depth=DEPTH, timeout=TIMEOUT, burst=None):
+        """
+        depth: transfers encoded ahead of the writer (2 = double buffered);
+        timeout: seconds to wait for outstanding packets after the last window;
+        burst: up to burst windows per transfer (axis_sp_inject BURST_MODE)
+        """
+        self.codec = codec
+        self.transport = transport
+        self.depth = depth
+        self.timeout = timeout
+        self.burst = burst
+        self.stats = {}
+
+    @property
+    def in_flight(self):
+        """ packets encoded but not ejected, for adaptive windows """
+        return self.stats.get("encoded", 0) - self.stats.get("ejected", 0)
+
+    def _encode(self, windows):
+        """ windows of one transfer -> (words, cycle per header, headers) """
+        windows = [(ub_count, np.asarray(hdrs, dtype=np.uint32).ravel())
+                   for ub_count, hdrs in windows]
+        if self.burst:
+            words = encode_burst(windows)
+        else:
+            (ub_count, hdrs), = windows
+            words = np.empty(hdrs.size + 1, dtype=np.uint32)
+            words[0] = ub_count
+            words[1:] = hdrs
+        cycles = np.concatenate([np.full(hdrs.size, ub_count, dtype=np.int64)
+                                 for ub_count, hdrs in windows])
+        return words, cycles, np.concatenate([hdrs for _, hdrs in windows])
+
+    def _decode(self, frame):
+        return analysis.split_windows(frame)
+
+    async def run(self, windows, drain=True):
+        """
+        windows: iterable of (ub_count, header flits), e.g. trace_windows()
+        or WindowScheduler.windows(lambda: driver.in_flight); with drain a
+        run to inf transfer follows the last window. Returns (latency table,
+        stats).
+        """
+        stats = self.stats = {"windows": 0, "transfers": 0, "frames": 0, "encoded": 0,
+                              "injected": 0, "ejected": 0, "encode_s": 0.0,
+                              "write_s": 0.0, "decode_s": 0.0}
+        queue = asyncio.Queue(maxsize=self.depth)
+        inj_cycles, inj_hdrs, ej_cycles, ej_hdrs = [], [], [], []
+        written = asyncio.Event()
+        progress = asyncio.Event()
+
+        async def encoder():
+            items = iter(windows)
+            while True:
+                group = list(itertools.islice(items, self.burst or 1))
+                if not group:
+                    break
+                start = time.perf_counter()
+                words, cycles, hdrs = await asyncio.to_thread(self._encode, group)
+                expected = int(np.count_nonzero(self.codec.unpack_hdr(hdrs)["len"]))
+                stats["encode_s"] += time.perf_counter() - start
+                stats["encoded"] += expected
+                stats["windows"] += len(group)
+                inj_cycles.append(cycles)
+                inj_hdrs.append(hdrs)
+                await queue.put((words, expected))
+            if drain:
+                await queue.put((np.array([RUN_TO_INF], dtype=np.uint32), 0))
+            await queue.put(None)
+
+        async def writer():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                words, expected = item
+                start = time.perf_counter()
+                await self.transport.write(words)
+                stats["write_s"] += time.perf_counter() - start
+                stats["transfers"] += 1
+                stats["injected"] += expected
+            written.set()
+            progress.set()
+
+        async def reader():
+            read = asyncio.ensure_future(self.transport.read())
+            while True:
+                if written.is_set() and stats["ejected"] >= stats["injected"]:
+                    break
+                wake = asyncio.ensure_future(progress.wait())
+                done, _ = await asyncio.wait(
+                    {read, wake}, return_when=asyncio.FIRST_COMPLETED,
+                    timeout=self.timeout if written.is_set() else None)
+                wake.cancel()
+                if not done:
+                    break
+                progress.clear()
+                if read not in done:
+                    continue
+                frame = read.result()
+                if frame is None:
+                    read = None
+                    break
+                read = asyncio.ensure_future(self.transport.read())
+
+                start = time.perf_counter()
+                cycles, hdrs = await asyncio.to_thread(self._decode, frame)
+                stats["decode_s"] += time.perf_counter() - start
+                ej_cycles.append(cycles.astype(np.int64))
+                ej_hdrs.append(hdrs)
+                stats["frames"] += 1
+                stats["ejected"] += hdrs.size
+            if read is not None:
+                read.cancel()
+
+        start = time.perf_counter()
+        await asyncio.gather(encoder(), writer(), reader())
+        stats["wall_s"] = time.perf_counter() - start
+
+        def concat(arrays, dtype):
+            return np.concatenate(arrays) if arrays else np.zeros(0, dtype=dtype)
+
+        inj = analysis.packets(self.codec, concat(inj_hdrs, np.uint32),
+                               concat(inj_cycles, np.int64), "inj_cycle")
+        ej = analysis.packets(self.codec, concat(ej_hdrs, np.uint32),
+                              concat(ej_cycles, np.int64), "ej_cycle")
+        return analysis.join_latency(inj[inj["len"] > 0], ej), stats
+
+
+def trace_windows(trace):
+    """ trace batches as (ub_count, headers), without the run to inf batch """
+    for ub_count, flits in trace.batches():
+        if flits.size == 1 and int(flits[0]) == RUN_TO_INF:
+            continue
+        yield ub_count, flits[1:]
+
+
+async def _run(args, cfg):
+    codec = cfg.codec()
+    if args.tlm:
+        transport = TlmTransport(AxisValidationModel(codec, cfg.max_vc_num,
+                                                     burst=bool(args.burst)))
+    else:
+        transport = await StreamTransport.connect(args.unix, args.host, args.port)
+    driver = HostDriver(codec, transport, args.depth, args.timeout, args.burst)
+    trace = load_trace(args.inj)
+    cfg.check_geometry(trace.geometry)
+    if args.tolerance or args.max_window:
+        sched = from_trace(trace, args.tolerance, args.max_window)
+        df, stats = await driver.run(sched.windows(lambda: driver.in_flight))
+        stats.update({k: v for k, v in sched.report().items() if k not in stats})
+    else:
+        df, stats = await driver.run(trace_windows(trace))
+    await transport.close()
+    return df, stats
+
+
+if __name__ == "__main__":
+    cfg = load_config()
+    parser = argparse.ArgumentParser(description="Hybrid emulation host driver")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_run = sub.add_parser("run", help="drive a trace through a transport")
+    p_run.add_argument("inj", help="injected trace, text directory or binary file")
+    p_run.add_argument("--tlm", action="store_true", help="in-process TLM transport")
+    p_run.add_argument("--depth", type=int, default=DEPTH)
+    p_run.add_argument("--burst", type=int, default=None, metavar="WINDOWS",
+                       help="burst framing, the design runs with BURST_MODE")
+    p_run.add_argument("--timeout", type=float, default=TIMEOUT)
+    p_run.add_argument("--tolerance", type=int, default=0,
+                       help="merge injections this many cycles apart (emunoc.scheduler)")
+    p_run.add_argument("--max-window", type=int, default=None,
+                       help="window bound while packets are in flight")
+    p_run.add_argument("--csv", help="write the per-packet table")
+
+    p_serve = sub.add_parser("serve", help="serve the TLM on a socket")
+    p_serve.add_argument("--burst", action="store_true", help="BURST_MODE")
+    for p in [p_run, p_serve]:
+        p.add_argument("--unix", default=None, help="unix socket path")
+        p.add_argument("--host", default="localhost")
+        p.add_argument("--port", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.cmd == "serve":
+        asyncio.run(serve(lambda: AxisValidationModel(cfg.codec(), cfg.max_vc_num,
+                                                      burst=args.burst),
+                          args.unix, args.host, args.port))
+        sys.exit(0)
+
+    df, stats = asyncio.run(_run(args, cfg))
+    for key, val in stats.items():
+        print("{:<18}{}".format(key, round(val, 4) if isinstance(val, float) else val))
+    for key, val in analysis.summary(df, cfg.num_pe).items():
+        print("{:<14}{}".format(key, val))
+    if args.csv:
+        df.to_csv(args.csv, index=False)
+    sys.exit(int(df["ej_cycle"].isna().any()))
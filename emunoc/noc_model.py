@@ -0,0 +1,339 @@
+"""
+COPYRIGHT(c) 2022
+INSTITUTE FOR COMMUNICATION TECHNOLOGIES AND EMBEDDED SYSTEMS
+RWTH AACHEN
+GERMANY
+
+This confidential and proprietary software may be used, copied,
+modified, merged, published or distributed according to the
+permissions and/or limitations granted by an authorizing license
+agreement.
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+Author: 1. Tan Yee Yang (tan@ice.rwth-aachen.de)
+        2. Jan Moritz Joseph (joseph@ice.rwth-aachen.de)
+
+Cycle-approximate reference model of the mesh NoC.
+
+Wormhole routers with XYZ dimension-order routing, max_vc_num virtual
+channels per input port, vc_depth flits per VC and credit flow control:
+    - a flit entering a router can leave it router_delay cycles later
+    - per cycle every input port and every output port moves one flit
+    - input VCs are served round robin per router
+    - a head flit allocates a free downstream VC, the tail frees it
+    - credits are returned one cycle after a flit leaves a buffer
+    - every PE injects and ejects one flit per cycle
+Router state lives in flat per-VC lists indexed by
+(router * num_port + port) * max_vc_num + vc; only routers holding flits
+are visited and idle stretches jump to the next injection.
+
+The model reads the same traces as the testbenches (time flit, headers);
+every packet is len flits long:
+    python3 -m emunoc.noc_model testdata/noc_tb/in --csv predicted.csv
+The returned table has the columns of emunoc.analysis, so summary() and
+pair_stats() work on predictions and hardware results alike.
+"""
+
+import argparse
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from emunoc.config import load_config
+from emunoc.flit_codec import FlitCodec
+from emunoc.trace_file import load_trace, split_batches
+
+# ports: local, +x, -x, +y, -y, +z, -z
+LOCAL = 0
+NUM_PORT = 7
+OPPOSITE = [0, 2, 1, 4, 3, 6, 5]
+
+VC_DEPTH = 4
+ROUTER_DELAY = 2
+LINK_DELAY = 1
+
+
+class MeshModel:
+    def __init__(self, codec: FlitCodec, max_vc_num=2, vc_depth=VC_DEPTH,
+                 router_delay=ROUTER_DELAY, link_delay=LINK_DELAY):
+        self.codec = codec
+        self.num_pe = codec.num_pe
+        self.num_vc = max_vc_num
+        self.vc_depth = vc_depth
+        self.router_delay = router_delay
+        self.link_delay = link_delay
+
+        xs, ys, zs = codec.pe_to_xyz(np.arange(self.num_pe))
+        self.xyz = list(zip(xs.tolist(), ys.tolist(), zs.tolist()))
+
+        # neighbor[router][port] -> router behind the output port, -1 at the edge
+        dims = [codec.max_x_dim, codec.max_y_dim, codec.max_z_dim]
+        self.neighbor = []
+        for x, y, z in self.xyz:
+            row = [-1] * NUM_PORT
+            for axis in range(3):
+                pos = [x, y, z]
+                for port, step in [(1 + 2 * axis, 1), (2 + 2 * axis, -1)]:
+                    pos[axis] += step
+                    if 0 <= pos[axis] < dims[axis]:
+                        row[port] = int(codec.xyz_to_pe(*pos))
+                    pos[axis] -= step
+            self.neighbor.append(row)
+        self.reset()
+
+    def route(self, router, dst):
+        """ XYZ dimension order """
+        x, y, z = self.xyz[router]
+        dx, dy, dz = self.xyz[dst]
+        if dx != x:
+            return 1 if dx > x else 2
+        if dy != y:
+            return 3 if dy > y else 4
+        if dz != z:
+            return 5 if dz > z else 6
+        return LOCAL
+
+    def _vc(self, router, port, vc=0):
+        return (router * NUM_PORT + port) * self.num_vc + vc
+
+    def reset(self):
+        """ empty network at cycle 0 """
+        total_vc = self.num_pe * NUM_PORT * self.num_vc
+        self.cycle = 0
+        self.buf = [deque() for _ in range(total_vc)]   # (pkt, flit, ready cycle)
+        self.credit = [self.vc_depth] * total_vc         # free slots seen upstream
+        self.owned = [False] * total_vc                  # allocated to a packet
+        self.out_vc = [-1] * total_vc                    # downstream vc of the front packet
+        self.out_port = [-1] * total_vc
+        self.credit_ret = {}
+        self.load = [0] * self.num_pe                    # buffered flits per router
+        self.rr = [0] * self.num_pe                      # round robin pointer per router
+
+        # per PE injection queues, packets in injection order
+        self.queues = [deque() for _ in range(self.num_pe)]
+        self.src_flit = [0] * self.num_pe
+        self.src_vc = [-1] * self.num_pe
+
+        # per packet
+        self.inj_cycle, self.pkt_dst, self.pkt_len = [], [], []
+        self.head, self.tail = [], []
+        self.in_flight = 0
+
+    def inject(self, src, dst, pkt_len, cycle=None):
+        """
+        queue a packet at PE src, it enters the router from cycle on (default
+        now); cycles must not decrease per PE. Returns the packet index.
+        """
+        pkt = len(self.pkt_dst)
+        self.inj_cycle.append(self.cycle if cycle is None else int(cycle))
+        self.pkt_dst.append(int(dst))
+        self.pkt_len.append(max(int(pkt_len), 1))
+        self.head.append(-1)
+        self.tail.append(-1)
+        self.queues[int(src)].append(pkt)
+        self.in_flight += 1
+        return pkt
+
+    def queued(self, pe):
+        """ packets of PE pe whose tail has not entered the router """
+        return len(self.queues[pe])
+
+    def advance(self, until=None, stop_on_eject=False):
+        """
+        simulate the cycles up to (excluding) until, or until the network is
+        drained; with stop_on_eject return after the first cycle in which a
+        tail flit is ejected. Returns the packets ejected on the way.
+        """
+        num_vc, delay = self.num_vc, self.router_delay
+        hop_delay = self.link_delay + delay
+        router_vcs = NUM_PORT * num_vc
+        buf, credit, owned = self.buf, self.credit, self.owned
+        out_vc, out_port, credit_ret = self.out_vc, self.out_port, self.credit_ret
+        load, rr, neighbor = self.load, self.rr, self.neighbor
+        queues, src_flit, src_vc = self.queues, self.src_flit, self.src_vc
+        inj_cycle, pkt_dst, pkt_len = self.inj_cycle, self.pkt_dst, self.pkt_len
+        head, tail = self.head, self.tail
+
+        ejected = []
+        t = self.cycle
+        while (until is None and self.in_flight) or (until is not None and t < until):
+            for vc in credit_ret.pop(t, []):
+                credit[vc] += 1
+
+            # injection, one flit per PE and cycle
+            pending = False
+            for pe in range(self.num_pe):
+                queue = queues[pe]
+                if not queue:
+                    continue
+                pkt = queue[0]
+                if inj_cycle[pkt] > t:
+                    continue
+                pending = True
+                flit = src_flit[pe]
+                if flit == 0:
+                    base = self._vc(pe, LOCAL)
+                    for vc in range(base, base + num_vc):
+                        if not owned[vc] and credit[vc] > 0:
+                            owned[vc] = True
+                            src_vc[pe] = vc
+                            break
+                    else:
+                        continue
+                vc = src_vc[pe]
+                if credit[vc] == 0:
+                    continue
+                credit[vc] -= 1
+                buf[vc].append((pkt, flit, t + delay))
+                load[pe] += 1
+                if flit == pkt_len[pkt] - 1:
+                    owned[vc] = False
+                    src_flit[pe] = 0
+                    queue.popleft()
+                else:
+                    src_flit[pe] = flit + 1
+
+            # switch traversal
+            moved = False
+            n_ej = 0
+            for router in range(self.num_pe):
+                if load[router] == 0:
+                    continue
+                base = router * router_vcs
+                in_used = 0
+                out_used = 0
+                start = rr[router]
+                for off in range(router_vcs):
+                    idx = (start + off) % router_vcs
+                    vc = base + idx
+                    queue = buf[vc]
+                    if not queue:
+                        continue
+                    in_bit = 1 << (idx // num_vc)
+                    if in_used & in_bit:
+                        continue
+                    pkt, flit, ready = queue[0]
+                    if ready > t:
+                        continue
+
+                    port = out_port[vc]
+                    if flit == 0 and port < 0:
+                        port = self.route(router, pkt_dst[pkt])
+                        out_port[vc] = port
+                    out_bit = 1 << port
+                    if out_used & out_bit:
+                        continue
+
+                    if port == LOCAL:
+                        nxt = -1
+                    else:
+                        nxt = out_vc[vc]
+                        if nxt < 0:
+                            nbase = self._vc(neighbor[router][port], OPPOSITE[port])
+                            for cand in range(nbase, nbase + num_vc):
+                                if not owned[cand]:
+                                    owned[cand] = True
+                                    out_vc[vc] = nxt = cand
+                                    break
+                            else:
+                                continue
+                        if credit[nxt] == 0:
+                            continue
+
+                    queue.popleft()
+                    load[router] -= 1
+                    credit_ret.setdefault(t + 1, []).append(vc)
+                    in_used |= in_bit
+                    out_used |= out_bit
+                    moved = True
+                    is_tail = flit == pkt_len[pkt] - 1
+
+                    if port == LOCAL:
+                        if flit == 0:
+                            head[pkt] = t
+                        if is_tail:
+                            tail[pkt] = t
+                            ejected.append(pkt)
+                            n_ej += 1
+                    else:
+                        credit[nxt] -= 1
+                        buf[nxt].append((pkt, flit, t + hop_delay))
+                        load[neighbor[router][port]] += 1
+                        if is_tail:
+                            owned[nxt] = False
+                    if is_tail:
+                        out_vc[vc] = -1
+                        out_port[vc] = -1
+                rr[router] = (start + 1) % router_vcs
+
+            t += 1
+            self.in_flight -= n_ej
+            if n_ej and stop_on_eject:
+                break
+            # jump over idle cycles to the next injection
+            if not moved and not pending and not credit_ret and not any(load):
+                waiting = [inj_cycle[q[0]] for q in queues if q]
+                nxt_t = min(waiting) if waiting else until
+                if nxt_t is None:
+                    break
+                t = max(t, nxt_t if until is None else min(nxt_t, until))
+        self.cycle = t
+        return ejected
+
+    def run(self, inj_cycle, src, dst, pkt_len, max_cycles=None):
+        """
+        simulate packets given as arrays from an empty network, returns
+        (head, tail) ejection cycles; packets in flight after max_cycles keep -1
+        """
+        inj_cycle = np.asarray(inj_cycle, dtype=np.int64)
+        self.reset()
+        order = np.lexsort((np.arange(inj_cycle.size), inj_cycle))
+        index = np.empty_like(order)
+        for pkt in order.tolist():
+            index[pkt] = self.inject(src[pkt], dst[pkt], pkt_len[pkt], inj_cycle[pkt])
+        if inj_cycle.size:
+            self.cycle = int(inj_cycle.min())
+        self.advance(None if max_cycles is None else max_cycles + 1)
+        head = np.asarray(self.head, dtype=np.int64)[index]
+        tail = np.asarray(self.tail, dtype=np.int64)[index]
+        return head, tail
+
+
+def predict(codec: FlitCodec, trace, max_vc_num=2, max_cycles=None, **kwargs):
+    """ trace -> DataFrame id/src/dst/len/inj_cycle/head_cycle/ej_cycle/latency """
+    cycles, hdrs = split_batches(trace.flit_data, trace.pkt_len)
+    info = codec.unpack_hdr(hdrs)
+    model = MeshModel(codec, max_vc_num, **kwargs)
+    head, tail = model.run(cycles, info["src"], info["dst"], info["len"], max_cycles)
+
+    df = pd.DataFrame({key: info[key].astype(np.int64) for key in ["id", "src", "dst", "len"]})
+    df["inj_cycle"] = cycles.astype(np.int64)
+    df["head_cycle"] = np.where(head >= 0, head, np.nan)
+    df["ej_cycle"] = np.where(tail >= 0, tail, np.nan)
+    df["latency"] = df["ej_cycle"] - df["inj_cycle"]
+    return df
+
+
+if __name__ == "__main__":
+    cfg = load_config()
+    parser = argparse.ArgumentParser(description="Predict ejection cycles of a trace")
+    parser.add_argument("inj", help="injected trace, text directory or binary file")
+    parser.add_argument("--vc-depth", type=int, default=VC_DEPTH)
+    parser.add_argument("--router-delay", type=int, default=ROUTER_DELAY)
+    parser.add_argument("--max-cycles", type=int, default=None)
+    parser.add_argument("--csv", help="write the per-packet table")
+    args = parser.parse_args()
+
+    trace = load_trace(args.inj)
+    cfg.check_geometry(trace.geometry)
+    df = predict(cfg.codec(), trace, cfg.max_vc_num, args.max_cycles,
+                 vc_depth=args.vc_depth, router_delay=args.router_delay)
+
+    from emunoc.analysis import summary
+    for key, val in summary(df, cfg.num_pe).items():
+        print("{:<14}{}".format(key, val))
+    if args.csv:
+        df.to_csv(args.csv, index=False)
@@ -0,0 +1,164 @@
+"""
+COPYRIGHT(c) 2022
+INSTITUTE FOR COMMUNICATION TECHNOLOGIES AND EMBEDDED SYSTEMS
+RWTH AACHEN
+GERMANY
+
+This confidential and proprietary software may be used, copied,
+modified, merged, published or distributed according to the
+permissions and/or limitations granted by an authorizing license
+agreement.
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+Author: 1. Tan Yee Yang (tan@ice.rwth-aachen.de)
+        2. Jan Moritz Joseph (joseph@ice.rwth-aachen.de)
+
+NoC performance counters from the axis_ps_eject stream.
+
+With PERF_EN, top_axis_validation sends a performance window every
+PERF_PERIOD NoC cycles between the ejection windows
+    | PERF_MARK (all ones) | cycle | n | n counter words (tlast) |
+The NoC is halted while it is read. The words are the noc_perf_counters of
+axis_homo_full_noc, 4 per router (COUNTERS), counting from reset and
+wrapping at flit_size bits. Consecutive windows give the counts of an
+interval per router. The halt windows (HALT_MARK, see emunoc.halt_report)
+are skipped the same way.
+
+    python3 -m emunoc.perf testdata/top_axis_validation_tb/out/recv_flit.txt --csv perf.csv
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from emunoc.config import load_config
+from emunoc.flit_codec import flit_size
+from emunoc.trace_file import read_flit_text
+
+PERF_MARK = 2**flit_size - 1
+HALT_MARK = 2**flit_size - 2
+COUNTERS = ["inj_flits", "ej_flits", "inj_stall", "ej_stall"]
+
+
+def split_marked(words):
+    """
+    axis_ps_eject stream -> (stream without performance and halt windows,
+    {mark: [(cycle, counter words)]})
+    """
+    words = np.asarray(words, dtype=np.uint32)
+    marked = {PERF_MARK: [], HALT_MARK: []}
+    if not np.any(words >= HALT_MARK):
+        return words, marked
+
+    zeros = np.flatnonzero(words == 0)
+    keep = []
+    i = 0
+    while i < words.size:
+        if int(words[i]) in marked:
+            # a mark is only a window start at a cycle word position
+            assert i + 2 < words.size, "truncated window at word {}".format(i)
+            num = int(words[i + 2])
+            data = words[i + 3:i + 3 + num]
+            assert data.size == num, "truncated window at word {}".format(i)
+            marked[int(words[i])].append((int(words[i + 1]), data))
+            i += 3 + num
+        else:
+            end = np.searchsorted(zeros, i + 1)
+            end = zeros[end] + 1 if end < zeros.size else words.size
+            keep.append(words[i:end])
+            i = end
+    stream = np.concatenate(keep) if keep else np.zeros(0, dtype=np.uint32)
+    return stream, marked
+
+
+def split_perf(words):
+    """
+    axis_ps_eject stream -> (stream without performance and halt windows,
+    [(cycle, counters (routers, len(COUNTERS)))])
+    """
+    stream, marked = split_marked(words)
+    snapshots = []
+    for cycle, data in marked[PERF_MARK]:
+        assert data.size % len(COUNTERS) == 0, \
+            "performance window of {} words at cycle {}".format(data.size, cycle)
+        snapshots.append((cycle, data.reshape(-1, len(COUNTERS))))
+    return stream, snapshots
+
+
+def intervals(snapshots):
+    """
+    counts per router and interval between snapshots, the first one starts
+    at reset; wrapped counters are unwrapped
+    """
+    rows = []
+    prev_cycle, prev = 0, None
+    for cycle, counters in snapshots:
+        counters = counters.astype(np.int64)
+        delta = counters if prev is None else (counters - prev) % 2**flit_size
+        df = pd.DataFrame(delta, columns=COUNTERS)
+        df.insert(0, "router", np.arange(len(df)))
+        df.insert(0, "cycles", cycle - prev_cycle)
+        df.insert(0, "cycle", cycle)
+        rows.append(df)
+        prev_cycle, prev = cycle, counters
+    if not rows:
+        return pd.DataFrame(columns=["cycle", "cycles", "router"] + COUNTERS)
+    return pd.concat(rows, ignore_index=True)
+
+
+def router_table(df, dim=None):
+    """ totals and rates per router, x/y/z with dim=(x, y, z) """
+    if df.empty:
+        return pd.DataFrame()
+    total = df.groupby("router")[COUNTERS].sum()
+    cycles = max(int(df["cycle"].max()), 1)
+    total["inj_rate"] = total["inj_flits"] / cycles
+    total["ej_rate"] = total["ej_flits"] / cycles
+    total["inj_stall_frac"] = total["inj_stall"] / cycles
+    total["ej_stall_frac"] = total["ej_stall"] / cycles
+    if dim is not None:
+        router = total.index.to_numpy()
+        total.insert(0, "z", router // (dim[0] * dim[1]))
+        total.insert(0, "y", router // dim[0] % dim[1])
+        total.insert(0, "x", router % dim[0])
+    return total
+
+
+def hotspots(df, top=5):
+    """ routers whose local input is starved of credits most often """
+    table = router_table(df)
+    if table.empty:
+        return table
+    return table.sort_values("inj_stall_frac", ascending=False).head(top)
+
+
+def load(path):
+    """ recv_flit.txt or a .npy word array -> interval table """
+    words = np.load(path) if path.endswith(".npy") else read_flit_text(path)
+    _, snapshots = split_perf(words)
+    return intervals(snapshots)
+
+
+if __name__ == "__main__":
+    cfg = load_config()
+    parser = argparse.ArgumentParser(description="NoC performance counters of an EmuNoC run")
+    parser.add_argument("recv", help="axis_ps_eject output, e.g. out/recv_flit.txt")
+    parser.add_argument("--dim", type=int, nargs=3,
+                        default=[cfg.max_x_dim, cfg.max_y_dim, cfg.max_z_dim],
+                        metavar=("X", "Y", "Z"))
+    parser.add_argument("--top", type=int, default=5, help="hot spots to list")
+    parser.add_argument("--csv", help="write the per-interval table")
+    args = parser.parse_args()
+
+    df = load(args.recv)
+    assert not df.empty, "no performance windows in {}, run with PERF_EN".format(args.recv)
+    print("{} snapshots, last at cycle {}".format(df["cycle"].nunique(), df["cycle"].max()))
+    print(router_table(df, args.dim).to_string())
+    print("hot spots:")
+    print(hotspots(df, args.top).to_string())
+
+    if args.csv:
+        df.to_csv(args.csv, index=False)
@@ -0,0 +1,222 @@
+"""
+COPYRIGHT(c) 2022
+INSTITUTE FOR COMMUNICATION TECHNOLOGIES AND EMBEDDED SYSTEMS
+RWTH AACHEN
+GERMANY
+
+This confidential and proprietary software may be used, copied,
+modified, merged, published or distributed according to the
+permissions and/or limitations granted by an authorizing license
+agreement.
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+Author: 1. Tan Yee Yang (tan@ice.rwth-aachen.de)
+        2. Jan Moritz Joseph (joseph@ice.rwth-aachen.de)
+
+Import of application traces into the EmuNoC trace format.
+
+The input is CSV or JSON lines (optionally compressed) with one message
+per row: cycle, src, dst, size. It is read in chunks of rows and has to
+be sorted by cycle. Every message is
+    - mapped onto the mesh: node % num_pe ("mod") or node * num_pe // nodes
+      ("block", nodes is the node count of the application)
+    - timed: cycle * scale, gaps between messages longer than max_gap
+      squeezed to max_gap
+    - split into packets of one header flit and up to max_pkt_len - 1 data
+      flits (size in bytes or flits)
+Packets of a source are serialized at port_rate flits per cycle (at most
+one, like its network interface); messages mapped onto their own source
+are dropped. Long messages to a shared destination back up in the
+pe_inject FIFOs, which only hold num_pe packets: lower port_rate or
+stretch the time with scale when the TLM reports an overflow.
+
+    python3 -m emunoc.replay app.csv -o testdata/top_axis_validation_tb/in --max-gap 100
+    python3 -m emunoc.replay app.jsonl.gz -o trace.bin --format bin --mapping block --nodes 64
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from emunoc.burst import burst_batches
+from emunoc.config import load_config
+from emunoc.flit_codec import FlitCodec, flit_size
+from emunoc.trace_file import join_batches
+from emunoc.trace_writer import TraceWriter
+from emunoc.traffic import run_to_inf
+
+COLUMNS = ["cycle", "src", "dst", "size"]
+MAPPINGS = ["mod", "block"]
+UNITS = ["bytes", "flits"]
+
+CHUNK_ROWS = 1 << 18
+
+
+def read_chunks(path, fmt=None, columns=COLUMNS, chunk_rows=CHUNK_ROWS):
+    """ DataFrames of chunk_rows messages with the columns cycle/src/dst/size """
+    if fmt is None:
+        name = path[:-3] if path.endswith(".gz") else path
+        fmt = "jsonl" if name.endswith((".jsonl", ".json", ".ndjson")) else "csv"
+    if fmt == "csv":
+        reader = pd.read_csv(path, usecols=columns, chunksize=chunk_rows)
+    else:
+        reader = pd.read_json(path, lines=True, chunksize=chunk_rows)
+    rename = dict(zip(columns, COLUMNS))
+    for chunk in reader:
+        yield chunk[columns].rename(columns=rename)
+
+
+class TraceImporter:
+    def __init__(self, codec: FlitCodec, mapping="mod", nodes=None, unit="bytes",
+                 scale=1.0, max_gap=None, port_rate=1.0, start_id=0):
+        """
+        nodes:     node count of the application, for the block mapping;
+        scale:     trace time unit in cycles;
+        max_gap:   longest gap between two messages kept, None keeps all;
+        port_rate: flits/cycle a source injects while it has packets
+        """
+        assert 0 < port_rate <= 1, "a source injects at most one flit per cycle"
+        assert mapping in MAPPINGS, "unknown mapping {}".format(mapping)
+        assert unit in UNITS, "unknown size unit {}".format(unit)
+        assert mapping != "block" or nodes, "the block mapping needs the node count"
+        self.codec = codec
+        self.num_pe = codec.num_pe
+        self.mapping = mapping
+        self.nodes = nodes
+        self.unit = unit
+        self.scale = scale
+        self.max_gap = max_gap
+        self.port_rate = port_rate
+        self.pkt_id = start_id
+
+        self.last_in = 0        # last cycle read (scaled)
+        self.last_out = 0       # its compressed cycle
+        self.busy = np.zeros(self.num_pe, dtype=np.int64)   # port free from
+        self.stats = {"messages": 0, "dropped": 0, "packets": 0, "flits": 0,
+                      "trace_cycles": 0, "cycles": 0}
+
+    def map_nodes(self, node):
+        node = np.asarray(node, dtype=np.int64)
+        if self.mapping == "mod":
+            return node % self.num_pe
+        assert np.all((node >= 0) & (node < self.nodes)), "node id out of range"
+        return node * self.num_pe // self.nodes
+
+    def compress(self, cycle):
+        """ scaled, gap compressed cycles of sorted messages """
+        cycle = np.floor(np.asarray(cycle, dtype=np.float64) * self.scale).astype(np.int64)
+        assert cycle.size == 0 or cycle[0] >= self.last_in, "trace is not sorted by cycle"
+        assert np.all(np.diff(cycle) >= 0), "trace is not sorted by cycle"
+        if cycle.size == 0:
+            return cycle
+        gap = np.diff(np.concatenate([[self.last_in], cycle]))
+        if self.max_gap is not None:
+            gap = np.minimum(gap, self.max_gap)
+        out = self.last_out + np.cumsum(gap)
+        self.last_in, self.last_out = int(cycle[-1]), int(out[-1])
+        return out
+
+    def packets(self, msgs):
+        """ messages -> packets (cycle, src, dst, len), sources serialized """
+        src = self.map_nodes(msgs["src"].to_numpy())
+        dst = self.map_nodes(msgs["dst"].to_numpy())
+        cycle = self.compress(msgs["cycle"].to_numpy())
+        size = msgs["size"].to_numpy().astype(np.int64)
+        if self.unit == "bytes":
+            size = -(-size // (flit_size // 8))
+
+        keep = src != dst
+        self.stats["messages"] += int(keep.sum())
+        self.stats["dropped"] += int((~keep).sum())
+        src, dst, cycle, size = src[keep], dst[keep], cycle[keep], size[keep]
+
+        # max_pkt_len - 1 data flits per packet, a header-only packet for size 0
+        per_pkt = self.codec.max_pkt_len - 1
+        count = np.maximum(-(-size // per_pkt), 1)
+        msg = np.repeat(np.arange(size.size), count)
+        nth = np.arange(msg.size) - np.repeat(np.cumsum(count) - count, count)
+        pkt_len = np.minimum(size[msg] - nth * per_pkt, per_pkt) + 1
+        pkt_len = np.maximum(pkt_len, 1)
+        src, dst, cycle = src[msg], dst[msg], cycle[msg]
+
+        # port_rate flits per cycle and source, after what earlier chunks left
+        order = np.lexsort([cycle, src])
+        src, dst, cycle, pkt_len = src[order], dst[order], cycle[order], pkt_len[order]
+        cycle = np.maximum(cycle, self.busy[src])
+        slot = np.ceil(pkt_len / self.port_rate).astype(np.int64)
+        sent = pd.Series(slot).groupby(src).cumsum().to_numpy() - slot
+        cycle = sent + pd.Series(cycle - sent).groupby(src).cummax().to_numpy()
+        np.maximum.at(self.busy, src, cycle + slot)
+        return pd.DataFrame({"inj_cycle": cycle, "src": src, "dst": dst, "len": pkt_len})
+
+    def _batches(self, df):
+        """ packets -> multi-batch dict, a batch per cycle """
+        # at most one packet of a source starts per cycle
+        df = df.sort_values(["inj_cycle", "src"], kind="stable")
+        ids = (self.pkt_id + np.arange(len(df))) % 2**self.codec.flit_id_width
+        self.pkt_id += len(df)
+        hdrs = self.codec.pack_hdr(ids, df["src"], df["dst"], df["len"])
+        batch = join_batches(df["inj_cycle"].to_numpy(), hdrs)
+        self.stats["packets"] += len(df)
+        self.stats["flits"] += int(df["len"].sum())
+        self.stats["cycles"] = int(batch["inj_time"][-1]) + 1
+        return batch
+
+    def batches(self, chunks):
+        """
+        yield multi-batch dicts for message chunks; packets are held back
+        until no later message can be injected before them, so every
+        cycle is one batch
+        """
+        pending = None
+        for msgs in chunks:
+            if len(msgs) == 0:
+                continue
+            pkts = self.packets(msgs)
+            pending = pkts if pending is None else pd.concat([pending, pkts], ignore_index=True)
+            ready = pending["inj_cycle"].to_numpy() < self.last_out
+            if ready.any():
+                yield self._batches(pending[ready])
+                pending = pending[~ready]
+        self.stats["trace_cycles"] = self.last_in + 1
+        if pending is not None and len(pending):
+            yield self._batches(pending)
+
+
+if __name__ == "__main__":
+    cfg = load_config()
+    parser = argparse.ArgumentParser(description="Import an application trace (cycle, src, dst, size)")
+    parser.add_argument("trace", help="CSV or JSON lines file, .gz allowed")
+    parser.add_argument("-o", "--output", default="in")
+    parser.add_argument("--format", choices=["txt", "bin"], default="txt")
+    parser.add_argument("--input-format", choices=["csv", "jsonl"], default=None)
+    parser.add_argument("--columns", nargs=4, default=COLUMNS,
+                        metavar=("CYCLE", "SRC", "DST", "SIZE"), help="column names in the trace")
+    parser.add_argument("--mapping", choices=MAPPINGS, default="mod")
+    parser.add_argument("--nodes", type=int, default=None, help="node count of the application")
+    parser.add_argument("--unit", choices=UNITS, default="bytes", help="unit of size")
+    parser.add_argument("--scale", type=float, default=1.0, help="cycles per trace time unit")
+    parser.add_argument("--max-gap", type=int, default=None, help="squeeze longer idle gaps")
+    parser.add_argument("--port-rate", type=float, default=1.0, help="flits/cycle per source")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--no-inf", action="store_true",
+                        help="do not append the run to inf flit")
+    parser.add_argument("--burst", type=int, default=None, metavar="GROUPS",
+                        help="burst framing, up to GROUPS injection cycles per transfer")
+    args = parser.parse_args()
+
+    importer = TraceImporter(cfg.codec(), args.mapping, args.nodes, args.unit,
+                             args.scale, args.max_gap, args.port_rate)
+    chunks = read_chunks(args.trace, args.input_format, args.columns, args.chunk_rows)
+    with TraceWriter(args.output, args.format, cfg.geometry()) as td:
+        batches = importer.batches(chunks)
+        td.extend(burst_batches(batches, args.burst) if args.burst else batches)
+        if not args.no_inf:
+            td.add(run_to_inf())
+
+    for key, val in importer.stats.items():
+        print("{:<14}{}".format(key, val))
+    print("{:<14}{}".format("batches", td.n_batch))
@@ -0,0 +1,142 @@
+"""
+COPYRIGHT(c) 2022
+INSTITUTE FOR COMMUNICATION TECHNOLOGIES AND EMBEDDED SYSTEMS
+RWTH AACHEN
+GERMANY
+
+This confidential and proprietary software may be used, copied,
+modified, merged, published or distributed according to the
+permissions and/or limitations granted by an authorizing license
+agreement.
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+Author: 1. Tan Yee Yang (tan@ice.rwth-aachen.de)
+        2. Jan Moritz Joseph (joseph@ice.rwth-aachen.de)
+
+Adaptive emulation windows for clock_halter.
+
+Every window (ub_count word + headers) costs one host round trip. The next
+ub_count is chosen from the pending injection cycles and the packets in
+flight:
+    - network empty: jump to the next injection cycle
+    - packets in flight: at most max_window cycles ahead, so a closed-loop
+      host sees the ejections in time to react (None: no bound)
+    - injections up to tolerance cycles after the window start are merged
+      into it, i.e. injected up to tolerance cycles early
+Stepping through the trace with fixed windows of step cycles is the
+baseline the saved round trips are counted against:
+    python3 -m emunoc.scheduler trace.bin --tolerance 8 --max-window 256 --step 64
+"""
+
+import heapq
+import argparse
+import itertools
+
+import numpy as np
+
+from emunoc.config import load_config
+from emunoc.flit_codec import flit_size
+from emunoc.trace_file import load_trace
+
+RUN_TO_INF = 2**flit_size - 1
+
+
+class WindowScheduler:
+    def __init__(self, tolerance=0, max_window=None, start=0):
+        self.tolerance = tolerance
+        self.max_window = max_window
+        self.now = start
+        self.pending = []      # heap of (cycle, seq, headers)
+        self._seq = itertools.count()
+        self.first = None
+        self.last = None
+        self.stats = {"windows": 0, "inject_windows": 0, "step_windows": 0,
+                      "injection_cycles": 0, "merged": 0, "packets": 0}
+        self._cycles = set()
+
+    def push(self, cycle, hdrs):
+        """ pending injections of one cycle, any order """
+        cycle = int(cycle)
+        hdrs = np.asarray(hdrs, dtype=np.uint32).ravel()
+        if hdrs.size == 0:
+            return
+        heapq.heappush(self.pending, (cycle, next(self._seq), hdrs))
+        self._cycles.add(cycle)
+        self.first = cycle if self.first is None else min(self.first, cycle)
+        self.last = cycle if self.last is None else max(self.last, cycle)
+
+    def next_window(self, in_flight=0):
+        """ (ub_count, headers) of the next window, None when done """
+        if not self.pending:
+            return None
+        cycle = max(self.pending[0][0], self.now)
+        if in_flight and self.max_window is not None and cycle > self.now + self.max_window:
+            self.now += self.max_window
+            self.stats["windows"] += 1
+            self.stats["step_windows"] += 1
+            return self.now, np.zeros(0, dtype=np.uint32)
+
+        hdrs = []
+        while self.pending and self.pending[0][0] <= cycle + self.tolerance:
+            hdrs.append(heapq.heappop(self.pending)[2])
+        hdrs = np.concatenate(hdrs)
+        self.now = cycle
+        self.stats["windows"] += 1
+        self.stats["inject_windows"] += 1
+        self.stats["packets"] += hdrs.size
+        return cycle, hdrs
+
+    def windows(self, in_flight=lambda: 0):
+        """ generator of windows, in_flight() is asked before every window """
+        while True:
+            window = self.next_window(in_flight())
+            if window is None:
+                return
+            yield window
+
+    def report(self, step=None):
+        """ round trips used and saved against one window per injection cycle and fixed steps """
+        ret = dict(self.stats)
+        ret["injection_cycles"] = len(self._cycles)
+        ret["merged"] = ret["injection_cycles"] - ret["inject_windows"]
+        ret["saved_vs_trace"] = ret["injection_cycles"] - ret["windows"]
+        if step and self.first is not None:
+            ret["fixed_windows"] = -(-(self.last - self.first + 1) // step)
+            ret["saved_vs_fixed"] = ret["fixed_windows"] - ret["windows"]
+        return ret
+
+
+def from_trace(trace, tolerance=0, max_window=None):
+    """ scheduler loaded with every batch of a trace but the run to inf one """
+    sched = WindowScheduler(tolerance, max_window)
+    for cycle, flits in trace.batches():
+        if flits.size == 1 and int(flits[0]) == RUN_TO_INF:
+            continue
+        sched.push(cycle, flits[1:])
+    return sched
+
+
+if __name__ == "__main__":
+    from emunoc.tlm import AxisValidationModel
+
+    cfg = load_config()
+    parser = argparse.ArgumentParser(description="Count round trips of adaptive windows")
+    parser.add_argument("inj", help="injected trace, text directory or binary file")
+    parser.add_argument("--tolerance", type=int, default=0)
+    parser.add_argument("--max-window", type=int, default=None)
+    parser.add_argument("--step", type=int, default=None,
+                        help="fixed window size of the baseline")
+    args = parser.parse_args()
+
+    trace = load_trace(args.inj)
+    cfg.check_geometry(trace.geometry)
+    sched = from_trace(trace, args.tolerance, args.max_window)
+
+    # in flight packets from the TLM
+    tlm = AxisValidationModel(cfg.codec(), cfg.max_vc_num)
+    for ub_count, hdrs in sched.windows(lambda: tlm.in_flight):
+        tlm.send(np.concatenate([[ub_count], hdrs]))
+    for key, val in sched.report(args.step).items():
+        print("{:<18}{}".format(key, val))
@@ -0,0 +1,245 @@
+"""
+COPYRIGHT(c) 2022
+INSTITUTE FOR COMMUNICATION TECHNOLOGIES AND EMBEDDED SYSTEMS
+RWTH AACHEN
+GERMANY
+
+This confidential and proprietary software may be used, copied,
+modified, merged, published or distributed according to the
+permissions and/or limitations granted by an authorizing license
+agreement.
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+Author: 1. Tan Yee Yang (tan@ice.rwth-aachen.de)
+        2. Jan Moritz Joseph (joseph@ice.rwth-aachen.de)
+
+Parallel GHDL simulation sweeps.
+
+Every job runs in its own directory, so any number of simulations can run
+side by side:
+    <root>/<job name>/
+        TESTBENCH_PACKAGE.vhd   generated from testbench/utils
+        ghdlwork/               analyzed library (without the build cache)
+        testdata/<tb>/          copy of the data directory, in/ and out/
+        *.log                   output of every step
+Jobs with equal sources and package share one build in <root>/.ghdl_cache
+(see emunoc.ghdl.BuildCache), generics are passed at run time and need no
+rebuild.
+
+A job is a dict:
+    {
+        "name":      "src_0_0_0-dst_0_3_3",
+        "test_name": "traffic_corr_tb",
+        "package":   {"src_pos": (0, 0, 0), "dst_pos": (0, 3, 3)},  # rebuilds
+        "generics":  {"SRC_ROUTER": 0, "DST_ROUTER": 15},        # runtime
+        "data_dir":  "testdata/pic",
+        "generate":  ["python3", "file2data.py"],    # cwd is the data dir
+        "check":     ["python3", "check_receive.py"],  # optional
+        "stop_time": "1000ns",   # None: until the sim_monitor stops
+        "wave":      False,      # or an emunoc.waves policy/spec
+    }
+The sim_monitor report of a run (final cycle, injected and ejected
+packets) is added to the summary row as sim_*.
+"""
+
+import os
+import sys
+import argparse
+import time
+import shlex
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from emunoc.ghdl import (REPO_DIR, PACKAGE_FILE, WORK_DIR, BuildCache,
+                         package_text, vhdl_sources, ghdl_import, ghdl_make,
+                         ghdl_run, run_logged, parse_monitor, stop_time_arg)
+from emunoc.waves import WavePolicy, run_with_policy
+
+STEPS = ["generate", "compile", "run", "check"]
+CACHE_DIR = ".ghdl_cache"
+
+# ----------------------------------------------
+# Job preparation
+
+
+def prepare(job: dict, root, repo=REPO_DIR):
+    """ create the job directory, returns its path """
+    job_dir = os.path.abspath(os.path.join(root, job["name"]))
+    if os.path.exists(job_dir):
+        shutil.rmtree(job_dir)
+    os.makedirs(os.path.join(job_dir, WORK_DIR))
+
+    with open(os.path.join(job_dir, os.path.basename(PACKAGE_FILE)), "w") as handle:
+        handle.write(package_text(job.get("package", {}), repo))
+
+    data_dir = job.get("data_dir")
+    if data_dir:
+        shutil.copytree(os.path.join(repo, data_dir), os.path.join(job_dir, data_dir),
+                        ignore=shutil.ignore_patterns("in", "out", "__pycache__"))
+        for sub in ["in", "out"]:
+            os.makedirs(os.path.join(job_dir, data_dir, sub), exist_ok=True)
+    return job_dir
+
+
+# ----------------------------------------------
+# Execution
+
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    ret = func(*args, **kwargs)
+    return ret, time.perf_counter() - start
+
+
+def run_job(job: dict, root, repo=REPO_DIR, cache_dir=None):
+    """ run one job, returns a summary row """
+    job_dir = prepare(job, root, repo)
+    data_dir = os.path.join(job_dir, job["data_dir"]) if job.get("data_dir") else job_dir
+    test_name = job["test_name"]
+    stop_time = job.get("stop_time", "1000ns")
+    policy = WavePolicy.from_spec(job.get("wave", False))
+
+    # the copied data scripts import emunoc from the repository
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [repo, env.get("PYTHONPATH")]))
+
+    def log(step):
+        return os.path.join(job_dir, step + ".log")
+
+    row = {"name": job["name"], "test_name": test_name, "status": "ok"}
+    row.update({key: str(val) for key, val in job.get("package", {}).items()})
+    row.update(job.get("generics", {}))
+
+    def step(name, ret, sec):
+        row[name + "_s"] = round(sec, 3)
+        if ret:
+            row["status"] = "{} failed ({})".format(name, ret)
+        return ret == 0
+
+    ok = step("generate", *_timed(run_logged, [job["generate"]] if job.get("generate") else [],
+                                  data_dir, log("generate"), env))
+    if ok and cache_dir:
+        cache = BuildCache(cache_dir, repo)
+        (build_dir, hit, ret), sec = _timed(cache.build, test_name,
+                                            job.get("package", {}), log("compile"))
+        row["cache"] = "hit" if hit else "miss"
+        ok = step("compile", ret, sec)
+        run_cmd = cache.run_cmd(build_dir, test_name, stop_time, False, job.get("generics"))
+    elif ok:
+        sources = vhdl_sources(repo) + [os.path.basename(PACKAGE_FILE)]
+        ok = step("compile", *_timed(run_logged, [ghdl_import(sources), ghdl_make(test_name)],
+                                     job_dir, log("compile"), env))
+        run_cmd = ghdl_run(test_name, stop_time, generics=job.get("generics"))
+    if ok:
+        (ret, row["wave"]), sec = _timed(run_with_policy, run_cmd, test_name, policy,
+                                         job_dir, log("run"), env)
+        ok = step("run", ret, sec)
+        with open(log("run"), "r") as handle:
+            monitor = parse_monitor(handle.read())
+        row.update({"sim_" + key: val for key, val in (monitor or {}).items()})
+    if ok:
+        step("check", *_timed(run_logged, [job["check"]] if job.get("check") else [],
+                              data_dir, log("check"), env))
+
+    row["total_s"] = round(sum(row.get(x + "_s", 0) for x in STEPS), 3)
+    row["dir"] = job_dir
+    return row
+
+
+def run_sweep(jobs, root="sweep", workers=None, repo=REPO_DIR, cache=True):
+    """
+    run all jobs on a process pool, returns the summary table;
+    with cache the jobs share the GHDL builds in <root>/.ghdl_cache
+    """
+    jobs = list(jobs)
+    names = [job["name"] for job in jobs]
+    assert len(set(names)) == len(names), "job names must be unique"
+    os.makedirs(root, exist_ok=True)
+    cache_dir = os.path.abspath(os.path.join(root, CACHE_DIR)) if cache else None
+
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = {pool.submit(run_job, job, root, repo, cache_dir): job for job in jobs}
+        for future in as_completed(futures):
+            row = future.result()
+            print(row["name"], row["status"], row["total_s"], "s", flush=True)
+            rows.append(row)
+
+    summary = pd.DataFrame(rows)
+    summary = summary.set_index("name").loc[names].reset_index()
+    summary.to_csv(os.path.join(root, "summary.csv"), index=False)
+    return summary
+
+
+def _expand(cmd, fmt):
+    if cmd is None:
+        return None
+    return [y for x in cmd for y in shlex.split(x.format(**fmt))]
+
+
+def pair_jobs(positions, test_name, data_dir=None, generate=None, check=None,
+              stop_time="1000ns", limit=None, dims=None, wave=False):
+    """
+    one job per ordered (src_pos, dst_pos) pair, positions are z,y,x tuples;
+    "{src}"/"{dst}" in the commands expand to the space separated positions.
+    With dims (x, y, z) the routers are passed as SRC_ROUTER/DST_ROUTER
+    generics and all jobs share one build, otherwise src_pos/dst_pos are
+    rendered into the package.
+    """
+    def router(pos):
+        return pos[0] * dims[0] * dims[1] + pos[1] * dims[0] + pos[2]
+
+    jobs = []
+    for src in positions:
+        for dst in positions:
+            if src == dst:
+                continue
+            fmt = {"src": " ".join(map(str, src)), "dst": " ".join(map(str, dst))}
+            jobs.append({
+                "name": "src_{}-dst_{}".format("_".join(map(str, src)),
+                                               "_".join(map(str, dst))),
+                "test_name": test_name,
+                "package": {} if dims else {"src_pos": tuple(src), "dst_pos": tuple(dst)},
+                "generics": {"SRC_ROUTER": router(src), "DST_ROUTER": router(dst)}
+                if dims else {},
+                "data_dir": data_dir,
+                "generate": _expand(generate, fmt),
+                "check": _expand(check, fmt),
+                "stop_time": stop_time,
+                "wave": wave,
+            })
+    return jobs[:limit]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a src/dst sweep in parallel")
+    parser.add_argument("test_name")
+    parser.add_argument("--pos", type=int, nargs=3, action="append", required=True,
+                        metavar=("Z", "Y", "X"), help="router position, repeat")
+    parser.add_argument("--data-dir", default=None)
+    parser.add_argument("--generate", default=None,
+                        help="data command, e.g. 'python3 file2data.py {src} {dst}'")
+    parser.add_argument("--check", default=None)
+    parser.add_argument("--stop-time", type=stop_time_arg, default="1000ns",
+                        help="'none' runs until the sim_monitor stops")
+    parser.add_argument("--waves", default="none",
+                        help="emunoc.waves mode or JSON spec, e.g. window")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("-j", "--jobs", type=int, default=None)
+    parser.add_argument("-o", "--root", default="sweep")
+    parser.add_argument("--dim", type=int, nargs=3, default=None, metavar=("X", "Y", "Z"),
+                        help="pass the routers as generics instead of rebuilding")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="compile every job in its own ghdlwork")
+    args = parser.parse_args()
+
+    jobs = pair_jobs([tuple(x) for x in args.pos], args.test_name, args.data_dir,
+                     args.generate and [args.generate], args.check and [args.check],
+                     args.stop_time, args.limit, args.dim, args.waves)
+    summary = run_sweep(jobs, args.root, args.jobs, cache=not args.no_cache)
+    print(summary.to_string())
+    sys.exit(int((summary["status"] != "ok").any()))
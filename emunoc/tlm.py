@@ -0,0 +1,182 @@
+"""
+COPYRIGHT(c) 2022
+INSTITUTE FOR COMMUNICATION TECHNOLOGIES AND EMBEDDED SYSTEMS
+RWTH AACHEN
+GERMANY
+
+This confidential and proprietary software may be used, copied,
+modified, merged, published or distributed according to the
+permissions and/or limitations granted by an authorizing license
+agreement.
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+Author: 1. Tan Yee Yang (tan@ice.rwth-aachen.de)
+        2. Jan Moritz Joseph (joseph@ice.rwth-aachen.de)
+
+Transaction-level model of top_axis_validation.
+
+The AXI-stream protocol of the design behind send/receive, with the NoC
+replaced by emunoc.noc_model:
+    send(words)   one s_axis transfer, tlast on the last word
+                  axis_sp_inject: word 0 is ub_count, clock_halter runs the
+                  NoC until run_count reaches it, then the remaining header
+                  flits are converted (conv_hdr) and written to the pe_inject
+                  FIFO of their src PE
+    receive()     one m_axis transfer of axis_ps_eject, None if there is none:
+                  the NoC halts after every cycle in which packets reach
+                  pe_eject and the cycle word, the headers (iconv_hdr, in
+                  the round robin order of the FIFOs) and 0 with tlast follow
+With burst a transfer carries several (time, headers) groups, see
+emunoc.burst. Header words are bit exact with the RTL. Cycles follow the
+reference model, run_count counts the cycles the NoC was clocked and
+last_eject is the cycle of the last ejection window (run_count ends at
+the run to inf bound of a trace).
+Zero-length packets never leave pe_inject, a transfer overflowing a
+pe_inject FIFO would stall the design and fails an assertion instead.
+
+    tlm = AxisValidationModel(cfg.codec(), cfg.max_vc_num)
+    tlm.send([100, hdr0, hdr1])
+    frame = tlm.receive()
+
+The testbench flow (all batches of a trace, every frame written like
+out/recv_flit.txt):
+    python3 -m emunoc.tlm testdata/top_axis_validation_tb/in -o recv_flit.txt
+"""
+
+import argparse
+from collections import deque
+
+import numpy as np
+
+from emunoc.burst import decode_burst
+from emunoc.config import load_config
+from emunoc.flit_codec import FlitCodec, flits_to_text
+from emunoc.noc_model import MeshModel
+from emunoc.trace_file import load_trace
+
+
+class AxisValidationModel:
+    def __init__(self, codec: FlitCodec, max_vc_num=2, fifo_depth=None, burst=False, **kwargs):
+        """
+        fifo_depth: pe_inject BUFFER_DEPTH, INJ_PE_BUFFER_DEPTH = PE_NUM by default;
+        burst: axis_sp_inject BURST_MODE
+        """
+        self.codec = codec
+        self.burst = burst
+        self.num_pe = codec.num_pe
+        self.fifo_depth = fifo_depth or codec.num_pe
+        self.noc = MeshModel(codec, max_vc_num, **kwargs)
+        self.reset()
+
+    def reset(self):
+        self.noc.reset()
+        self.run_count = 0
+        self.ub_count = 0
+        self.offset = 0         # run_count - NoC cycle, moves when ub_count is set back
+        self.fifo_addr = 0      # axis_ps_eject round robin pointer
+        self.last_eject = 0     # run_count of the last ejection window
+        self.words = []         # ejected word per NoC packet
+        self.frames = deque()
+        self.stats = {"sends": 0, "frames": 0, "injected": 0, "ejected": 0, "dropped": 0}
+
+    @property
+    def in_flight(self):
+        return self.noc.in_flight
+
+    def send(self, words):
+        """ one s_axis transfer: ub_count, then header flits (burst: groups of them) """
+        words = np.asarray(words, dtype=np.uint32).ravel()
+        assert words.size > 0, "empty transfer"
+        self.stats["sends"] += 1
+        groups = decode_burst(words) if self.burst else [(int(words[0]), words[1:])]
+        for ub_count, hdrs in groups:
+            self._run(ub_count)
+            self._inject(hdrs)
+
+    def _inject(self, hdrs):
+        """ axis_sp_inject: headers to the pe_inject FIFOs """
+        if hdrs.size == 0:
+            return
+        xyz = self.codec.conv_hdr(hdrs)
+        src = self.codec.unpack_hdr(hdrs)["src"].astype(np.int64) % self.num_pe
+        info = self.codec.unpack_xyz(xyz)
+        ejected = self.codec.iconv_hdr(xyz)
+
+        fill = np.bincount(src, minlength=self.num_pe)
+        for pe in np.flatnonzero(fill).tolist():
+            assert self.noc.queued(pe) + fill[pe] <= self.fifo_depth, \
+                "pe_inject FIFO {} overflows, the transfer would stall".format(pe)
+
+        for itr in range(hdrs.size):
+            if info["len"][itr] == 0:
+                self.stats["dropped"] += 1
+                continue
+            self.noc.inject(src[itr], info["dst"][itr], info["len"][itr])
+            self.words.append(int(ejected[itr]))
+            self.stats["injected"] += 1
+
+    def _run(self, ub_count):
+        """ clock_halter: run until run_count reaches ub_count """
+        self.ub_count = ub_count
+        if ub_count < self.run_count:
+            self.offset -= self.run_count - ub_count
+            self.run_count = ub_count
+
+        while self.run_count < ub_count:
+            ejected = self.noc.advance(ub_count - self.offset, stop_on_eject=True)
+            self.run_count = self.noc.cycle + self.offset
+            if ejected:
+                self._frame(ejected)
+
+    def _frame(self, ejected):
+        """ axis_ps_eject: cycle word, headers from fifo_addr on, 0 """
+        dst = [self.noc.pkt_dst[pkt] for pkt in ejected]
+        order = sorted(range(len(ejected)),
+                       key=lambda i: (dst[i] - self.fifo_addr) % self.num_pe)
+        frame = [self.run_count] + [self.words[ejected[i]] for i in order] + [0]
+        self.fifo_addr = (dst[order[-1]] + 1) % self.num_pe
+        self.last_eject = self.run_count
+        self.frames.append(np.asarray(frame, dtype=np.uint32))
+        self.stats["frames"] += 1
+        self.stats["ejected"] += len(ejected)
+
+    def receive(self):
+        """ next m_axis transfer, None if nothing was ejected """
+        return self.frames.popleft() if self.frames else None
+
+    def receive_all(self):
+        """ all pending transfers as one stream """
+        frames = list(self.frames)
+        self.frames.clear()
+        if not frames:
+            return np.zeros(0, dtype=np.uint32)
+        return np.concatenate(frames)
+
+    def run_trace(self, trace):
+        """ send every batch of a trace, returns the ejection stream """
+        stream = []
+        for _, flits in trace.batches():
+            self.send(flits)
+            stream.append(self.receive_all())
+        return np.concatenate(stream) if stream else np.zeros(0, dtype=np.uint32)
+
+
+if __name__ == "__main__":
+    cfg = load_config()
+    parser = argparse.ArgumentParser(description="Run a trace on the top_axis_validation TLM")
+    parser.add_argument("inj", help="injected trace, text directory or binary file")
+    parser.add_argument("-o", "--out", default="recv_flit.txt")
+    parser.add_argument("--burst", action="store_true", help="BURST_MODE, burst framed trace")
+    args = parser.parse_args()
+
+    trace = load_trace(args.inj)
+    cfg.check_geometry(trace.geometry)
+    tlm = AxisValidationModel(cfg.codec(), cfg.max_vc_num, burst=args.burst)
+    stream = tlm.run_trace(trace)
+    with open(args.out, "w") as handle:
+        handle.write(flits_to_text(stream))
+    for key, val in tlm.stats.items():
+        print("{:<10}{}".format(key, val))
+    print("{:<10}{}".format("cycles", tlm.last_eject))
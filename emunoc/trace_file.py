@@ -0,0 +1,286 @@
+"""
+COPYRIGHT(c) 2022
+INSTITUTE FOR COMMUNICATION TECHNOLOGIES AND EMBEDDED SYSTEMS
+RWTH AACHEN
+GERMANY
+
+This confidential and proprietary software may be used, copied,
+modified, merged, published or distributed according to the
+permissions and/or limitations granted by an authorizing license
+agreement.
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+Author: 1. Tan Yee Yang (tan@ice.rwth-aachen.de)
+        2. Jan Moritz Joseph (joseph@ice.rwth-aachen.de)
+
+Binary trace container for flit_data, inj_time and pkt_len.
+
+All fields are little-endian:
+    header    64 bytes, see HEADER_FMT
+    flit_data uint32[n_flit]
+    (padding to 8 bytes)
+    inj_time  uint64[n_batch]
+    pkt_len   uint32[n_batch]
+
+The text files read by the GHDL testbenches (textio) are converted to and
+from this format with txt_to_trace/trace_to_txt:
+    python3 -m emunoc.trace_file to-bin in trace.bin --dim 4 4 1
+    python3 -m emunoc.trace_file to-txt trace.bin in
+"""
+
+import os
+import struct
+import argparse
+from itertools import islice
+
+import numpy as np
+
+from emunoc.config import load_config
+from emunoc.flit_codec import flits_to_text, bin_to_flits
+
+# ----------------------------------------------
+# Format
+
+MAGIC = b"EMUNOCTR"
+VERSION = 1
+
+# magic, version, flit_size, max_x_dim, max_y_dim, max_z_dim,
+# flit_pkt_width, max_vc_num, reserved, n_flit, n_batch
+HEADER_FMT = "<8s8I2Q"
+HEADER_SIZE = 64
+
+GEOMETRY_KEYS = ["max_x_dim", "max_y_dim", "max_z_dim",
+                 "flit_pkt_width", "max_vc_num"]
+
+# Text files: same in vhdl
+fname_inj_time = "inj_time.txt"
+fname_pkt_len = "pkt_len.txt"
+fname_flit_data = "flit_data.txt"
+
+CHUNK_LINES = 1 << 20
+
+
+def _align(offset, size=8):
+    return (offset + size - 1) // size * size
+
+
+def layout(n_flit, n_batch):
+    flit_offset = HEADER_SIZE
+    inj_offset = _align(flit_offset + 4 * n_flit)
+    len_offset = inj_offset + 8 * n_batch
+    return flit_offset, inj_offset, len_offset
+
+
+def pack_header(geometry: dict, n_flit, n_batch):
+    hdr = struct.pack(HEADER_FMT, MAGIC, VERSION, 32,
+                      *[int(geometry.get(key, 0)) for key in GEOMETRY_KEYS],
+                      0, n_flit, n_batch)
+    return hdr.ljust(HEADER_SIZE, b"\0")
+
+
+def unpack_header(raw):
+    fields = struct.unpack(HEADER_FMT, raw[:struct.calcsize(HEADER_FMT)])
+    assert fields[0] == MAGIC, "not an EmuNoC trace file"
+    assert fields[1] == VERSION, "unsupported trace version {}".format(
+        fields[1])
+    geometry = dict(zip(GEOMETRY_KEYS, fields[3:8]))
+    geometry["flit_size"] = fields[2]
+    return geometry, fields[9], fields[10]
+
+
+# ----------------------------------------------
+# Reader / writer
+
+
+class TraceFile:
+    """ Zero-copy view of a binary trace, all streams are numpy.memmap """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as handle:
+            self.geometry, self.n_flit, self.n_batch = unpack_header(
+                handle.read(HEADER_SIZE))
+
+        flit_offset, inj_offset, len_offset = layout(
+            self.n_flit, self.n_batch)
+        self.flit_data = self._memmap("<u4", flit_offset, self.n_flit)
+        self.inj_time = self._memmap("<u8", inj_offset, self.n_batch)
+        self.pkt_len = self._memmap("<u4", len_offset, self.n_batch)
+
+    def _memmap(self, dtype, offset, count):
+        if count == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(self.path, dtype=dtype, mode="r",
+                         offset=offset, shape=(count,))
+
+    def batches(self):
+        """ yield (inj_time, flit_data) per AXI transfer """
+        ends = np.cumsum(self.pkt_len, dtype=np.uint64)
+        start = 0
+        for time, end in zip(self.inj_time, ends):
+            yield int(time), self.flit_data[start:int(end)]
+            start = int(end)
+
+
+def split_batches(flit_data, pkt_len):
+    """
+    (time flit per header, header flits): the first flit of every batch is
+    its time flit, the rest are headers
+    """
+    pkt_len = np.asarray(pkt_len, dtype=np.int64)
+    flit_data = np.asarray(flit_data, dtype=np.uint32)
+    starts = np.concatenate([[0], np.cumsum(pkt_len)[:-1]]).astype(np.int64)
+
+    batch = np.repeat(np.arange(pkt_len.size), pkt_len)
+    is_time = np.zeros(flit_data.size, dtype=bool)
+    is_time[starts[pkt_len > 0]] = True
+    return flit_data[starts[batch[~is_time]]], flit_data[~is_time]
+
+
+def join_batches(cycles, hdrs):
+    """
+    header flits sorted by their injection cycle -> multi-batch dict, one
+    batch per cycle: its time flit followed by its headers
+    """
+    times, counts = np.unique(np.asarray(cycles, dtype=np.int64), return_counts=True)
+    first = np.concatenate([[0], np.cumsum(counts + 1)[:-1]])
+    flit_data = np.empty(len(hdrs) + times.size, dtype=np.uint32)
+    is_time = np.zeros(flit_data.size, dtype=bool)
+    is_time[first] = True
+    flit_data[is_time] = times
+    flit_data[~is_time] = hdrs
+    return {"flit_data": flit_data, "inj_time": times, "pkt_len": counts + 1}
+
+
+def write_trace(path, flit_data, inj_time, pkt_len, geometry: dict):
+    flit_data = np.asarray(flit_data, dtype="<u4")
+    inj_time = np.asarray(inj_time, dtype="<u8")
+    pkt_len = np.asarray(pkt_len, dtype="<u4")
+    assert inj_time.size == pkt_len.size, "inj_time and pkt_len differ in length"
+    assert flit_data.size == int(pkt_len.sum(dtype=np.uint64)), \
+        "pkt_len does not cover flit_data"
+
+    _, inj_offset, _ = layout(flit_data.size, inj_time.size)
+    with open(path, "wb") as handle:
+        handle.write(pack_header(geometry, flit_data.size, inj_time.size))
+        handle.write(flit_data.tobytes())
+        handle.write(b"\0" * (inj_offset - handle.tell()))
+        handle.write(inj_time.tobytes())
+        handle.write(pkt_len.tobytes())
+
+
+class TextTrace:
+    """ Text trace directory loaded into arrays, same fields as TraceFile """
+
+    def __init__(self, path, geometry=None):
+        self.path = path
+        self.geometry = geometry or {}
+        self.flit_data = read_flit_text(os.path.join(path, fname_flit_data))
+        self.inj_time = read_int_text(os.path.join(path, fname_inj_time))
+        self.pkt_len = read_int_text(os.path.join(path, fname_pkt_len))
+        self.n_flit = self.flit_data.size
+        self.n_batch = self.pkt_len.size
+
+    batches = TraceFile.batches
+
+
+def load_trace(path, geometry=None):
+    """ Open a binary trace file or a directory of text files """
+    if os.path.isdir(path):
+        return TextTrace(path, geometry)
+    return TraceFile(path)
+
+
+# ----------------------------------------------
+# Text conversion
+
+
+def read_flit_text(path, chunk_lines=CHUNK_LINES):
+    return np.concatenate([np.zeros(0, dtype=np.uint32)] +
+                          list(iter_flit_text(path, chunk_lines)))
+
+
+def iter_flit_text(path, chunk_lines=CHUNK_LINES):
+    with open(path, "rb") as handle:
+        while True:
+            lines = [x for x in islice(handle, chunk_lines) if x.strip()]
+            if not lines:
+                break
+            yield bin_to_flits([x.strip() for x in lines])
+
+
+def read_int_text(path):
+    with open(path, "r") as handle:
+        return np.array(handle.read().split(), dtype=np.uint64)
+
+
+def txt_to_trace(txt_dir, path, geometry: dict, chunk_lines=CHUNK_LINES):
+    """ Stream the text files into a binary trace, memory bound by chunk_lines """
+    inj_time = read_int_text(os.path.join(txt_dir, fname_inj_time))
+    pkt_len = read_int_text(os.path.join(txt_dir, fname_pkt_len))
+    assert inj_time.size == pkt_len.size, "inj_time and pkt_len differ in length"
+
+    n_flit = 0
+    with open(path, "wb") as handle:
+        handle.write(pack_header(geometry, 0, 0))
+        for flits in iter_flit_text(os.path.join(txt_dir, fname_flit_data),
+                                    chunk_lines):
+            handle.write(flits.astype("<u4").tobytes())
+            n_flit += flits.size
+        assert n_flit == int(pkt_len.sum()), "pkt_len does not cover flit_data"
+
+        _, inj_offset, _ = layout(n_flit, inj_time.size)
+        handle.write(b"\0" * (inj_offset - handle.tell()))
+        handle.write(inj_time.astype("<u8").tobytes())
+        handle.write(pkt_len.astype("<u4").tobytes())
+
+        handle.seek(0)
+        handle.write(pack_header(geometry, n_flit, inj_time.size))
+
+
+def trace_to_txt(path, txt_dir, chunk_lines=CHUNK_LINES):
+    """ Write the GHDL textio files of a binary trace """
+    trace = TraceFile(path)
+    os.makedirs(txt_dir, exist_ok=True)
+
+    with open(os.path.join(txt_dir, fname_flit_data), "w") as handle:
+        for start in range(0, trace.n_flit, chunk_lines):
+            if start:
+                handle.write("\n")
+            handle.write(flits_to_text(
+                trace.flit_data[start:start + chunk_lines]))
+    with open(os.path.join(txt_dir, fname_inj_time), "w") as handle:
+        handle.write("\n".join(map(str, trace.inj_time.tolist())))
+    with open(os.path.join(txt_dir, fname_pkt_len), "w") as handle:
+        handle.write("\n".join(map(str, trace.pkt_len.tolist())))
+
+
+if __name__ == "__main__":
+    cfg = load_config()
+    parser = argparse.ArgumentParser(
+        description="Convert EmuNoC traces between text and binary format")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    to_bin = sub.add_parser("to-bin", help="text directory -> binary trace")
+    to_bin.add_argument("txt_dir")
+    to_bin.add_argument("trace")
+    to_bin.add_argument("--dim", type=int, nargs=3,
+                        default=[cfg.max_x_dim, cfg.max_y_dim, cfg.max_z_dim],
+                        metavar=("X", "Y", "Z"))
+    to_bin.add_argument("--flit-pkt-width", type=int, default=cfg.flit_pkt_width)
+    to_bin.add_argument("--vc", type=int, default=cfg.max_vc_num)
+
+    to_txt = sub.add_parser("to-txt", help="binary trace -> text directory")
+    to_txt.add_argument("trace")
+    to_txt.add_argument("txt_dir")
+
+    args = parser.parse_args()
+    if args.cmd == "to-bin":
+        txt_to_trace(args.txt_dir, args.trace, {
+            "max_x_dim": args.dim[0], "max_y_dim": args.dim[1],
+            "max_z_dim": args.dim[2], "flit_pkt_width": args.flit_pkt_width,
+            "max_vc_num": args.vc})
+    else:
+        trace_to_txt(args.trace, args.txt_dir)
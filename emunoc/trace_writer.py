@@ -0,0 +1,176 @@
+"""
+COPYRIGHT(c) 2022
+INSTITUTE FOR COMMUNICATION TECHNOLOGIES AND EMBEDDED SYSTEMS
+RWTH AACHEN
+GERMANY
+
+This confidential and proprietary software may be used, copied,
+modified, merged, published or distributed according to the
+permissions and/or limitations granted by an authorizing license
+agreement.
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+Author: 1. Tan Yee Yang (tan@ice.rwth-aachen.de)
+        2. Jan Moritz Joseph (joseph@ice.rwth-aachen.de)
+
+Streaming replacement of the per-script TestData class.
+
+Every add() is written straight to the output files, so memory does not
+grow with the experiment:
+
+    with TraceWriter("in") as td:
+        td.add({"flit_data": [...], "inj_time": [0], "pkt_len": [n]})
+        td.extend(batch_generator())
+
+flit_data may be a list of "0101..." strings, an uint32 array, or an
+iterable of such chunks (then pkt_len must be given).
+"""
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from emunoc.flit_codec import flits_to_text
+from emunoc.trace_file import (pack_header, layout, fname_flit_data,
+                               fname_inj_time, fname_pkt_len)
+
+BUFFER_SIZE = 1 << 20
+
+
+def _is_chunk(item):
+    return isinstance(item, (str, bytes, int, np.integer))
+
+
+def _iter_chunks(flit_data):
+    """ flit_data in any supported form -> uint32 arrays / str lists """
+    if isinstance(flit_data, np.ndarray):
+        yield flit_data
+        return
+    if isinstance(flit_data, (list, tuple)) and \
+            (len(flit_data) == 0 or _is_chunk(flit_data[0])):
+        yield flit_data
+        return
+    for chunk in flit_data:
+        if _is_chunk(chunk):
+            yield [chunk]
+        else:
+            yield chunk
+
+
+def _chunk_to_array(chunk):
+    if isinstance(chunk, np.ndarray):
+        return chunk.astype(np.uint32, copy=False).ravel()
+    if len(chunk) and isinstance(chunk[0], (str, bytes)):
+        return np.array([int(x, 2) for x in chunk], dtype=np.uint32)
+    return np.asarray(chunk, dtype=np.uint32)
+
+
+def _chunk_to_text(chunk):
+    if isinstance(chunk, np.ndarray):
+        return flits_to_text(chunk)
+    if len(chunk) and isinstance(chunk[0], (str, bytes)):
+        return "\n".join(x.decode() if isinstance(x, bytes) else x
+                         for x in chunk)
+    return flits_to_text(np.asarray(chunk, dtype=np.uint32))
+
+
+class TraceWriter:
+    def __init__(self, path=".", fmt="txt", geometry=None,
+                 buffering=BUFFER_SIZE):
+        """
+        fmt="txt": path is the directory of flit_data/inj_time/pkt_len.txt
+        fmt="bin": path is a binary trace file (see trace_file)
+        """
+        assert fmt in ["txt", "bin"], "unknown trace format {}".format(fmt)
+        self.path = path
+        self.fmt = fmt
+        self.geometry = geometry or {}
+        self.n_flit = 0
+        self.n_batch = 0
+
+        if fmt == "txt":
+            os.makedirs(path, exist_ok=True)
+            self._flit = open(os.path.join(path, fname_flit_data),
+                              "w", buffering=buffering)
+            self._inj = open(os.path.join(path, fname_inj_time),
+                             "w", buffering=buffering)
+            self._len = open(os.path.join(path, fname_pkt_len),
+                             "w", buffering=buffering)
+        else:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._flit = open(path, "wb", buffering=buffering)
+            self._flit.write(pack_header(self.geometry, 0, 0))
+            # the batch streams follow flit_data in the file, spill them
+            # until the flit count is known
+            self._inj = tempfile.TemporaryFile(buffering=buffering)
+            self._len = tempfile.TemporaryFile(buffering=buffering)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _write_flits(self, flit_data):
+        count = 0
+        for chunk in _iter_chunks(flit_data):
+            if len(chunk) == 0:
+                continue
+            if self.fmt == "txt":
+                text = _chunk_to_text(chunk)
+                self._flit.write(("\n" if self.n_flit + count else "") + text)
+                count += text.count("\n") + 1
+            else:
+                flits = _chunk_to_array(chunk)
+                self._flit.write(flits.astype("<u4").tobytes())
+                count += flits.size
+        return count
+
+    def _write_batches(self, inj_time, pkt_len):
+        if self.fmt == "txt":
+            sep = "\n" if self.n_batch else ""
+            self._inj.write(sep + "\n".join(map(str, inj_time)))
+            self._len.write(sep + "\n".join(map(str, pkt_len)))
+        else:
+            self._inj.write(np.asarray(inj_time, dtype="<u8").tobytes())
+            self._len.write(np.asarray(pkt_len, dtype="<u4").tobytes())
+
+    def add(self, data: dict):
+        inj_time = [int(x) for x in data["inj_time"]]
+        pkt_len = [int(x) for x in data["pkt_len"]]
+        assert len(inj_time) == len(pkt_len), \
+            "inj_time and pkt_len differ in length"
+
+        count = self._write_flits(data["flit_data"])
+        assert count == sum(pkt_len), \
+            "pkt_len {} does not cover {} flits".format(sum(pkt_len), count)
+
+        if pkt_len:
+            self._write_batches(inj_time, pkt_len)
+        self.n_flit += count
+        self.n_batch += len(pkt_len)
+
+    def extend(self, batches):
+        for data in batches:
+            self.add(data)
+
+    def close(self):
+        if self._flit.closed:
+            return
+        if self.fmt == "bin":
+            _, inj_offset, _ = layout(self.n_flit, self.n_batch)
+            self._flit.write(b"\0" * (inj_offset - self._flit.tell()))
+            for spill in [self._inj, self._len]:
+                spill.seek(0)
+                shutil.copyfileobj(spill, self._flit, BUFFER_SIZE)
+            self._flit.seek(0)
+            self._flit.write(pack_header(
+                self.geometry, self.n_flit, self.n_batch))
+        self._flit.close()
+        self._inj.close()
+        self._len.close()
@@ -0,0 +1,251 @@
+"""
+COPYRIGHT(c) 2022
+INSTITUTE FOR COMMUNICATION TECHNOLOGIES AND EMBEDDED SYSTEMS
+RWTH AACHEN
+GERMANY
+
+This confidential and proprietary software may be used, copied,
+modified, merged, published or distributed according to the
+permissions and/or limitations granted by an authorizing license
+agreement.
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+Author: 1. Tan Yee Yang (tan@ice.rwth-aachen.de)
+        2. Jan Moritz Joseph (joseph@ice.rwth-aachen.de)
+
+Synthetic traffic patterns for the EmuNoC injection stream.
+
+Packets are drawn per cycle and node with Bernoulli or Poisson injection at
+an offered load given in flits/node/cycle. Self-addressed packets are not
+sent: nodes that a pattern maps to themselves (the diagonal of transpose,
+the palindromes of bit_reversal, ...) stay silent and the other nodes
+inject faster, so the mean over all nodes is still the offered load.
+All packets injected in the same
+cycle form one AXI batch as expected by axis_sp_inject:
+    | time flit | header flit | header flit | ... (tlast)
+
+Example, 10000 cycles of transpose traffic at 0.1 flits/node/cycle:
+    python3 -m emunoc.traffic transpose 0.1 10000 -o in --dim 4 4 1
+"""
+
+import argparse
+
+import numpy as np
+
+from emunoc.burst import burst_batches
+from emunoc.config import load_config
+from emunoc.flit_codec import FlitCodec, flit_size
+from emunoc.trace_file import join_batches
+from emunoc.trace_writer import TraceWriter
+
+PATTERNS = [
+    "uniform",
+    "transpose",
+    "bit_complement",
+    "bit_reversal",
+    "shuffle",
+    "tornado",
+    "neighbor",
+    "hotspot",
+]
+
+INJECTIONS = ["bernoulli", "poisson"]
+
+CHUNK_CYCLES = 4096
+
+
+def run_to_inf():
+    """ last batch of every trace: the all-ones flit runs the NoC forever """
+    return {"flit_data": ["1"*flit_size], "inj_time": [0], "pkt_len": [1]}
+
+
+class TrafficGenerator:
+    def __init__(self, codec: FlitCodec, pattern="uniform", load=0.1,
+                 pkt_len=31, injection="bernoulli", hotspots=None,
+                 hotspot_rate=0.2, seed=None, start_id=0):
+        """
+        load:     offered load in flits/node/cycle, averaged over all nodes;
+                  node_load has the per-source load that achieves it
+        pkt_len:  fixed length or (min, max) for uniformly drawn lengths
+        hotspots: PE ids for the hotspot pattern, default the center node
+        """
+        assert pattern in PATTERNS, "unknown pattern {}".format(pattern)
+        assert injection in INJECTIONS, "unknown injection {}".format(injection)
+
+        self.codec = codec
+        self.num_pe = codec.num_pe
+        self.pattern = pattern
+        self.injection = injection
+        self.rng = np.random.default_rng(seed)
+        self.pkt_id = start_id
+
+        if np.isscalar(pkt_len):
+            pkt_len = (pkt_len, pkt_len)
+        assert 1 <= pkt_len[0] <= pkt_len[1] <= codec.max_pkt_len, \
+            "pkt_len must be within 1..{}".format(codec.max_pkt_len)
+        self.pkt_len = pkt_len
+
+        if hotspots is None:
+            hotspots = [int(codec.xyz_to_pe(codec.max_x_dim // 2,
+                                            codec.max_y_dim // 2,
+                                            codec.max_z_dim // 2))]
+        self.hotspots = np.asarray(hotspots, dtype=np.int64)
+        self.hotspot_rate = hotspot_rate
+
+        if pattern in ["bit_reversal", "shuffle"]:
+            assert self.num_pe & (self.num_pe - 1) == 0, \
+                "{} needs a power of two PE count".format(pattern)
+        if pattern == "transpose":
+            assert codec.max_x_dim == codec.max_y_dim, \
+                "transpose needs a square mesh"
+
+        # packets/cycle per source, raised to make up for self-addressed packets
+        keep = self._keep_fraction()
+        assert keep.sum() > 0, "{} only has self-addressed packets".format(pattern)
+        self.load = load
+        self.rate = load / ((pkt_len[0] + pkt_len[1]) / 2) * self.num_pe / keep.sum()
+        self.rate = np.where(keep > 0, self.rate, 0.0)
+        self.node_load = self.rate * ((pkt_len[0] + pkt_len[1]) / 2)
+        assert injection != "bernoulli" or self.rate.max() <= 1, \
+            "offered load too high for bernoulli injection"
+
+    # ------------------------------------------
+    # Destination patterns
+
+    def destinations(self, src):
+        src = np.asarray(src, dtype=np.int64)
+        codec = self.codec
+        dims = np.array([codec.max_x_dim, codec.max_y_dim, codec.max_z_dim])
+        x, y, z = codec.pe_to_xyz(src)
+        width = codec.pe_addr_width
+
+        if self.pattern == "uniform":
+            return self._uniform(src)
+        elif self.pattern == "transpose":
+            return codec.xyz_to_pe(y, x, z)
+        elif self.pattern == "bit_complement":
+            return codec.xyz_to_pe(dims[0] - 1 - x, dims[1] - 1 - y, dims[2] - 1 - z)
+        elif self.pattern == "bit_reversal":
+            dst = np.zeros_like(src)
+            for bit in range(width):
+                dst |= ((src >> bit) & 1) << (width - 1 - bit)
+            return dst
+        elif self.pattern == "shuffle":
+            return ((src << 1) | (src >> (width - 1))) & (self.num_pe - 1)
+        elif self.pattern == "tornado":
+            shift = np.maximum((dims + 1) // 2 - 1, 0)
+            return codec.xyz_to_pe((x + shift[0]) % dims[0],
+                                   (y + shift[1]) % dims[1],
+                                   (z + shift[2]) % dims[2])
+        elif self.pattern == "neighbor":
+            return codec.xyz_to_pe((x + 1) % dims[0], (y + 1) % dims[1], (z + 1) % dims[2])
+        elif self.pattern == "hotspot":
+            dst = self._uniform(src)
+            hot = self.rng.random(src.size) < self.hotspot_rate
+            dst[hot] = self.rng.choice(self.hotspots, hot.sum())
+            return dst
+
+    def _keep_fraction(self):
+        """ expected share of the packets of every source that are not self-addressed """
+        src = np.arange(self.num_pe)
+        if self.pattern == "uniform":
+            return np.ones(self.num_pe)
+        if self.pattern == "hotspot":
+            hit = (self.hotspots[None, :] == src[:, None]).mean(axis=1)
+            return 1 - self.hotspot_rate * hit
+        return (self.destinations(src) != src).astype(float)
+
+    def _uniform(self, src):
+        dst = self.rng.integers(0, self.num_pe - 1, src.size)
+        return dst + (dst >= src)
+
+    # ------------------------------------------
+    # Packets
+
+    def _lengths(self, count):
+        return self.rng.integers(self.pkt_len[0], self.pkt_len[1] + 1, count)
+
+    def _headers(self, src):
+        """ header flits for the given sources, self-addressed packets dropped """
+        dst = self.destinations(src)
+        keep = dst != src
+        src, dst = src[keep], dst[keep]
+        ids = (self.pkt_id + np.arange(src.size)) % 2**self.codec.flit_id_width
+        self.pkt_id += src.size
+        return keep, self.codec.pack_hdr(ids, src, dst, self._lengths(src.size))
+
+    def _arrivals(self, cycles):
+        """ (cycle, src) of every injected packet in a window, sorted by cycle """
+        if self.injection == "bernoulli":
+            return np.nonzero(self.rng.random((cycles, self.num_pe)) < self.rate)
+        counts = self.rng.poisson(self.rate, (cycles, self.num_pe))
+        cyc, src = np.nonzero(counts)
+        rep = counts[cyc, src]
+        return np.repeat(cyc, rep), np.repeat(src, rep)
+
+    def batch(self, time, count, src=None):
+        """ one AXI batch of count packets injected at time """
+        if src is None:
+            src = self.rng.integers(0, self.num_pe, count)
+        _, hdrs = self._headers(np.asarray(src, dtype=np.int64))
+        flit_data = np.concatenate([[time], hdrs]).astype(np.uint32)
+        return {"flit_data": flit_data, "inj_time": [time], "pkt_len": [flit_data.size]}
+
+    def batches(self, cycles, start=0, chunk_cycles=CHUNK_CYCLES):
+        """
+        yield multi-batch dicts covering [start, start + cycles), one
+        batch per injection cycle, chunk_cycles at a time
+        """
+        for offset in range(0, cycles, chunk_cycles):
+            cyc, src = self._arrivals(min(chunk_cycles, cycles - offset))
+            keep, hdrs = self._headers(src.astype(np.int64))
+            cyc = cyc[keep] + start + offset
+            if cyc.size == 0:
+                continue
+            yield join_batches(cyc, hdrs)
+
+
+if __name__ == "__main__":
+    cfg = load_config()
+    parser = argparse.ArgumentParser(description="Generate synthetic EmuNoC traffic")
+    parser.add_argument("pattern", choices=PATTERNS)
+    parser.add_argument("load", type=float, help="offered load in flits/node/cycle")
+    parser.add_argument("cycles", type=int)
+    parser.add_argument("-o", "--output", default="in")
+    parser.add_argument("--format", choices=["txt", "bin"], default="txt")
+    parser.add_argument("--dim", type=int, nargs=3,
+                        default=[cfg.max_x_dim, cfg.max_y_dim, cfg.max_z_dim],
+                        metavar=("X", "Y", "Z"))
+    parser.add_argument("--flit-pkt-width", type=int, default=cfg.flit_pkt_width)
+    parser.add_argument("--pkt-len", type=int, nargs=2, default=[31, 31],
+                        metavar=("MIN", "MAX"))
+    parser.add_argument("--injection", choices=INJECTIONS, default="bernoulli")
+    parser.add_argument("--hotspot", type=int, nargs="+", default=None)
+    parser.add_argument("--hotspot-rate", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--no-inf", action="store_true",
+                        help="do not append the run to inf flit")
+    parser.add_argument("--burst", type=int, default=None, metavar="GROUPS",
+                        help="burst framing, up to GROUPS injection cycles per transfer")
+    args = parser.parse_args()
+
+    codec = FlitCodec(*args.dim, args.flit_pkt_width)
+    traffic = TrafficGenerator(codec, args.pattern, args.load, tuple(args.pkt_len),
+                               args.injection, args.hotspot, args.hotspot_rate,
+                               args.seed)
+
+    geometry = {"max_x_dim": args.dim[0], "max_y_dim": args.dim[1],
+                "max_z_dim": args.dim[2], "flit_pkt_width": args.flit_pkt_width}
+    with TraceWriter(args.output, args.format, geometry) as td:
+        batches = traffic.batches(args.cycles)
+        td.extend(burst_batches(batches, args.burst) if args.burst else batches)
+        if not args.no_inf:
+            td.add(run_to_inf())
+
+    print("packets:", traffic.pkt_id, "batches:", td.n_batch, "flits:", td.n_flit)
+    active = traffic.node_load > 0
+    print("load: {} flits/node/cycle, {} of {} nodes inject at {:.4g} to {:.4g}".format(
+        traffic.load, active.sum(), traffic.num_pe,
+        traffic.node_load[active].min(), traffic.node_load[active].max()))
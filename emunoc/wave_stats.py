@@ -0,0 +1,369 @@
+"""
+COPYRIGHT(c) 2022
+INSTITUTE FOR COMMUNICATION TECHNOLOGIES AND EMBEDDED SYSTEMS
+RWTH AACHEN
+GERMANY
+
+This confidential and proprietary software may be used, copied,
+modified, merged, published or distributed according to the
+permissions and/or limitations granted by an authorizing license
+agreement.
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+Author: 1. Tan Yee Yang (tan@ice.rwth-aachen.de)
+        2. Jan Moritz Joseph (joseph@ice.rwth-aachen.de)
+
+Streaming waveform statistics: link utilization, FIFO occupancy and
+clock_halter halts from a VCD dump.
+
+The dump is read line by line (also .vcd.gz), memory only grows with the
+number of signals and windows. The signals are picked by name:
+    vc_write_rx/tx      valid per VC, a link is busy in a cycle it is '1'
+    incr_rx/tx_vec      credit per VC, counted the same way
+    counter             ring_fifo fill level (pe_inject/pe_eject/m_axis_ni)
+    halt                clock_halter, halt intervals in simulation time
+A vector of a scope with a generate index (router) has vc_num bits per
+port, otherwise (the local_* vectors of axis_homo_full_noc) vc_num bits
+per router. Cycles are rising edges of the NoC clock (--clock, clkh by
+default), which stops while the NoC is halted; without it the time is
+divided by --clk-period.
+
+Every --window cycles a row of the time series is closed: busy cycles per
+link, mean fill per FIFO and halted time. The series go to a .npz, the
+summaries to CSV. GHW is binary and not read here, dump VCD for the
+analysis (`--vcd=`, emunoc.waves with "format": "vcd").
+
+    python3 -m emunoc.wave_stats top_axis_validation_tb.vcd --window 1000 --npz series.npz --csv stats
+"""
+
+import re
+import gzip
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from emunoc.config import load_config
+from emunoc.waves import read_vcd_header, iter_vcd, to_fs
+
+WINDOW = 1000
+CLOCK = r"(^|/)clkh$"
+
+_VALID = re.compile(r"^(?:[io]_)?(?:local_)?vc_write_(rx|tx)(?:_vec)?$", re.IGNORECASE)
+_CREDIT = re.compile(r"^(?:[io]_)?(?:local_)?incr_(rx|tx)(?:_vec)?$", re.IGNORECASE)
+_COUNTER = re.compile(r"^counter$", re.IGNORECASE)
+_HALT = re.compile(r"^halt$", re.IGNORECASE)
+_INDEX = re.compile(r"\((\d+)\)")
+
+
+def open_dump(path):
+    assert not path.endswith(".ghw"), \
+        "GHW is not supported, run with --vcd=<file> (emunoc.waves format vcd)"
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt")
+    return open(path, "r")
+
+
+def _int(value):
+    """ VCD vector or scalar value -> int, unknown bits are 0 """
+    if value in ("1", "0"):
+        return int(value)
+    return int(re.sub(r"[^01]", "0", value), 2) if value else 0
+
+
+class _Levels:
+    """
+    time weighted sums of levels over cycles, settled lazily: a level is
+    only touched when it changes or a window closes
+    """
+
+    def __init__(self):
+        self.labels = []
+        self.value = []
+        self.since = []
+        self.total = []
+        self.peak = []
+        self.window = []
+        self.rows = []
+        self.nonzero = set()
+
+    def add(self, label):
+        self.labels.append(label)
+        for arr in [self.value, self.since, self.total, self.peak, self.window]:
+            arr.append(0)
+        return len(self.labels) - 1
+
+    def set(self, idx, value, cycle):
+        acc = self.value[idx] * (cycle - self.since[idx])
+        self.total[idx] += acc
+        self.window[idx] += acc
+        self.value[idx] = value
+        self.since[idx] = cycle
+        self.peak[idx] = max(self.peak[idx], value)
+        if value:
+            self.nonzero.add(idx)
+        else:
+            self.nonzero.discard(idx)
+
+    def close(self, cycle):
+        for idx in self.nonzero:
+            acc = self.value[idx] * (cycle - self.since[idx])
+            self.total[idx] += acc
+            self.window[idx] += acc
+            self.since[idx] = cycle
+        self.rows.append(np.asarray(self.window, dtype=np.float64))
+        self.window = [0] * len(self.labels)
+
+    def series(self):
+        if not self.rows:
+            return np.zeros((0, len(self.labels)))
+        return np.vstack(self.rows)
+
+
+class WaveStats:
+    def __init__(self, vc_num=2, window=WINDOW, clock=CLOCK, clk_period="1ns",
+                 include=None, halt_csv=None):
+        """
+        window:   cycles per time series row;
+        clock:    regex on scope/name of the NoC clock;
+        include:  regex on scope/name, other signals are ignored;
+        halt_csv: file for every halt interval (start_fs, end_fs)
+        """
+        self.vc_num = vc_num
+        self.window = window
+        self.clock = re.compile(clock, re.IGNORECASE) if clock else None
+        self.clk_period = to_fs(clk_period)
+        self.include = re.compile(include, re.IGNORECASE) if include else None
+        self.halt_csv = halt_csv
+
+        self.links = _Levels()
+        self.fifos = _Levels()
+        self.link_vars = {}     # id -> (first link, bits)
+        self.fifo_vars = {}     # id -> fifo
+        self.halt_vars = {}     # id -> scope
+        self.clock_id = None
+        self.bits = {}          # last int value of the link vectors
+        self.halts = {}         # scope -> [count, total_fs, max_fs, since or None]
+        self.halt_window = []
+        self.halt_rows = []
+        self.cycle = 0
+        self.time = 0
+
+    # ------------------------------------------
+    # Signals
+
+    def _router_bits(self, scope, size):
+        """ (router, port, vc) of every bit of a valid/credit vector """
+        index = _INDEX.findall(scope)
+        if index:
+            router = int(index[0])
+            return [(router, bit // self.vc_num, bit % self.vc_num) for bit in range(size)]
+        return [(bit // self.vc_num, "local", bit % self.vc_num) for bit in range(size)]
+
+    def map_signals(self, variables):
+        for ident, (scope, name, _, size) in variables.items():
+            name = name.split()[0]     # without the [msb:lsb] range
+            path = scope + "/" + name
+            if self.clock and self.clock_id is None and self.clock.search(path):
+                self.clock_id = ident
+                continue
+            if self.include and not self.include.search(path):
+                continue
+            for kind, pattern in [("valid", _VALID), ("credit", _CREDIT)]:
+                match = pattern.match(name)
+                if match and ident not in self.link_vars:
+                    first = len(self.links.labels)
+                    for router, port, vc in self._router_bits(scope, size):
+                        self.links.add((scope, name, kind, match.group(1).lower(),
+                                        router, port, vc))
+                    self.link_vars[ident] = (first, size)
+                    self.bits[ident] = 0
+            if _COUNTER.match(name) and "fifo" in scope.rsplit("/", 1)[-1].lower():
+                index = _INDEX.findall(scope)
+                self.fifo_vars[ident] = self.fifos.add(
+                    (scope, int(index[0]) if index else None))
+            elif _HALT.match(name) and "halter" in scope.rsplit("/", 1)[-1].lower():
+                self.halt_vars[ident] = scope
+                self.halts[scope] = [0, 0, 0, None]
+
+    # ------------------------------------------
+    # Values
+
+    def _apply(self, ident, value):
+        if ident in self.link_vars:
+            first, size = self.link_vars[ident]
+            new = _int(value)
+            diff = new ^ self.bits[ident]
+            self.bits[ident] = new
+            while diff:
+                bit = (diff & -diff).bit_length() - 1
+                diff &= diff - 1
+                if bit < size:
+                    self.links.set(first + bit, (new >> bit) & 1, self.cycle)
+        elif ident in self.fifo_vars:
+            self.fifos.set(self.fifo_vars[ident], _int(value), self.cycle)
+        elif ident in self.halt_vars:
+            self._halt(self.halt_vars[ident], value == "1")
+
+    def _halt(self, scope, halted):
+        stat = self.halts[scope]
+        if halted and stat[3] is None:
+            stat[3] = self.time
+        elif not halted and stat[3] is not None:
+            length = self.time - stat[3]
+            stat[0] += 1
+            stat[1] += length
+            stat[2] = max(stat[2], length)
+            self.halt_window.append(length)
+            if self._halt_out:
+                self._halt_out.write("{},{},{}\n".format(scope, stat[3], self.time))
+            stat[3] = None
+
+    def _step(self, changes, clock_rose):
+        """ one time step: the edge samples the old values, then the changes apply """
+        if clock_rose:
+            self.cycle += 1
+        elif self.clock_id is None:
+            self.cycle = self.time // self.clk_period
+        while self.cycle >= self._next_close:
+            self._close(self._next_close)
+        for ident, value in changes:
+            self._apply(ident, value)
+
+    def _close(self, cycle):
+        self.links.close(cycle)
+        self.fifos.close(cycle)
+        self.halt_rows.append(sum(self.halt_window))
+        self.halt_window = []
+        self._next_close = cycle + self.window
+
+    # ------------------------------------------
+    # Run
+
+    def run(self, handle):
+        """ read a VCD stream, returns self """
+        _, self.timescale, variables = read_vcd_header(handle)
+        self.map_signals(variables)
+        self._next_close = self.window
+        self._halt_out = open(self.halt_csv, "w") if self.halt_csv else None
+        if self._halt_out:
+            self._halt_out.write("scope,start_fs,end_fs\n")
+
+        clock, changes, rose = "0", [], False
+        for time, ident, value in iter_vcd(handle):
+            if ident is None:
+                if time * self.timescale != self.time:
+                    self._step(changes, rose)
+                    changes, rose = [], False
+                    self.time = time * self.timescale
+                continue
+            if ident == self.clock_id:
+                rose = rose or (clock != "1" and value == "1")
+                clock = value
+            else:
+                changes.append((ident, value))
+        self._step(changes, rose)
+
+        # settle everything up to the last cycle
+        for scope in self.halts:
+            self._halt(scope, False)
+        if self.cycle > self._next_close - self.window or not self.halt_rows:
+            self._close(self.cycle)
+        if self._halt_out:
+            self._halt_out.close()
+        return self
+
+    # ------------------------------------------
+    # Results
+
+    def link_table(self):
+        """ busy cycles and utilization per link bit """
+        cycles = max(self.cycle, 1)
+        df = pd.DataFrame(self.links.labels,
+                          columns=["scope", "signal", "kind", "dir", "router", "port", "vc"])
+        df["cycles"] = self.links.total
+        df["utilization"] = df["cycles"] / cycles
+        return df
+
+    def fifo_table(self):
+        """ mean and peak fill per ring_fifo """
+        cycles = max(self.cycle, 1)
+        df = pd.DataFrame(self.fifos.labels, columns=["scope", "router"])
+        df["mean"] = np.asarray(self.fifos.total, dtype=np.float64) / cycles
+        df["max"] = self.fifos.peak
+        return df
+
+    def halt_table(self):
+        rows = [{"scope": scope, "halts": count, "halted_fs": total, "max_fs": peak,
+                 "mean_fs": total / count if count else 0.0}
+                for scope, (count, total, peak, _) in self.halts.items()]
+        return pd.DataFrame(rows, columns=["scope", "halts", "halted_fs", "max_fs", "mean_fs"])
+
+    def series(self):
+        """ time series arrays, one row per window """
+        rows = len(self.halt_rows)
+        ends = np.minimum((np.arange(rows) + 1) * self.window, max(self.cycle, 1))
+        length = np.diff(np.concatenate([[0], ends])).clip(min=1)
+        return {
+            "window_end": ends,
+            "link_util": (self.links.series() / length[:, None]).astype(np.float32),
+            "fifo_mean": (self.fifos.series() / length[:, None]).astype(np.float32),
+            "halted_fs": np.asarray(self.halt_rows, dtype=np.int64),
+            "link_labels": np.asarray(["{}/{} {} r{} p{} vc{}".format(
+                x[0], x[1], x[2], x[4], x[5], x[6]) for x in self.links.labels]),
+            "fifo_labels": np.asarray([x[0] for x in self.fifos.labels]),
+        }
+
+    def summary(self):
+        links = self.link_table()
+        valid = links[links["kind"] == "valid"]
+        fifos = self.fifo_table()
+        halts = self.halt_table()
+        return {
+            "cycles": self.cycle,
+            "time_fs": self.time,
+            "links": len(valid),
+            "link_util_mean": round(valid["utilization"].mean(), 4) if len(valid) else 0.0,
+            "link_util_max": round(valid["utilization"].max(), 4) if len(valid) else 0.0,
+            "fifos": len(fifos),
+            "fifo_fill_mean": round(fifos["mean"].mean(), 4) if len(fifos) else 0.0,
+            "fifo_fill_max": int(fifos["max"].max()) if len(fifos) else 0,
+            "halts": int(halts["halts"].sum()),
+            "halted_fs": int(halts["halted_fs"].sum()),
+        }
+
+
+def analyze(path, **kwargs):
+    with open_dump(path) as handle:
+        return WaveStats(**kwargs).run(handle)
+
+
+if __name__ == "__main__":
+    cfg = load_config()
+    parser = argparse.ArgumentParser(description="Link utilization, FIFO occupancy and halts of a VCD")
+    parser.add_argument("dump", help="VCD file, .vcd.gz allowed")
+    parser.add_argument("--window", type=int, default=WINDOW, help="cycles per series row")
+    parser.add_argument("--clock", default=CLOCK, help="regex of the NoC clock, none for --clk-period")
+    parser.add_argument("--clk-period", default="1ns", help="cycle time without a clock")
+    parser.add_argument("--vc", type=int, default=cfg.max_vc_num)
+    parser.add_argument("--include", default=None, help="regex on scope/signal")
+    parser.add_argument("--npz", default=None, help="write the time series")
+    parser.add_argument("--csv", default=None, metavar="PREFIX",
+                        help="write PREFIX_links.csv, PREFIX_fifos.csv, PREFIX_halts.csv")
+    parser.add_argument("--halt-intervals", default=None, help="CSV of every halt")
+    args = parser.parse_args()
+
+    clock = None if args.clock == "none" else args.clock
+    stats = analyze(args.dump, vc_num=args.vc, window=args.window, clock=clock,
+                    clk_period=args.clk_period, include=args.include,
+                    halt_csv=args.halt_intervals)
+    for key, val in stats.summary().items():
+        print("{:<16}{}".format(key, val))
+    if args.npz:
+        np.savez_compressed(args.npz, **stats.series())
+    if args.csv:
+        stats.link_table().to_csv(args.csv + "_links.csv", index=False)
+        stats.fifo_table().to_csv(args.csv + "_fifos.csv", index=False)
+        stats.halt_table().to_csv(args.csv + "_halts.csv", index=False)
@@ -0,0 +1,354 @@
+"""
+COPYRIGHT(c) 2022
+INSTITUTE FOR COMMUNICATION TECHNOLOGIES AND EMBEDDED SYSTEMS
+RWTH AACHEN
+GERMANY
+
+This confidential and proprietary software may be used, copied,
+modified, merged, published or distributed according to the
+permissions and/or limitations granted by an authorizing license
+agreement.
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+Author: 1. Tan Yee Yang (tan@ice.rwth-aachen.de)
+        2. Jan Moritz Joseph (joseph@ice.rwth-aachen.de)
+
+Waveform capture policies for GHDL runs.
+
+A policy is given as a mode name or a spec (dict or JSON file):
+    {"mode": "signals", "signals": ["eject", "DUT/inst_axis_homo_full_noc/**"]}
+    {"mode": "window", "before": 500, "after": 100, "signals": ["halter"]}
+modes:
+    none      no waveform, the fast default
+    all       every signal (--wave)
+    signals   only the listed hierarchies, written to a wave option file
+              (--read-wave-opt); paths are relative to the top unit, `*`
+              matches the signals of one instance, `**` everything below
+    window    run without waves, on a failure (assertion failure/error,
+              sim_monitor stall) rerun with a VCD up to `after` cycles past
+              it and keep only the `before`/`after` cycles around it
+The PRESETS names stand for the peripherals of top_axis_validation_tb.
+
+    python3 -m emunoc.waves opt signals.json top_axis_validation_tb -o wave.opt
+    python3 -m emunoc.waves run top_axis_validation_tb --spec window.json --stop-time none
+    python3 -m emunoc.waves trim top.vcd window.vcd --start 1200ns --end 1500ns
+"""
+
+import os
+import re
+import sys
+import json
+import shlex
+import argparse
+import subprocess
+
+from emunoc.ghdl import BuildCache, stop_time_arg
+
+MODES = ["none", "all", "signals", "window"]
+FORMATS = ["ghw", "vcd", "fst"]
+
+# hierarchies of top_axis_validation_tb
+PRESETS = {
+    "halter": "DUT/inst_clock_halter/*",
+    "inject": "DUT/inst_axis_sp_inject/*",
+    "eject": "DUT/inst_axis_ps_eject/*",
+    "noc": "DUT/inst_axis_homo_full_noc/**",
+    "tb": "*",
+}
+
+WAVE_OPT_VERSION = "$ version 1.1"
+
+# @<time><unit>:(assertion failure) / (report error) in the GHDL log
+_FAILURE = re.compile(r"@(\d+)(fs|ps|ns|us|ms|sec)?:\((?:assertion|report) (?:failure|error)\)")
+_TIME = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*(fs|ps|ns|us|ms|sec|s)?\s*$")
+UNITS_FS = {"fs": 1, "ps": 10**3, "ns": 10**6, "us": 10**9, "ms": 10**12, "sec": 10**15,
+            "s": 10**15}
+
+# ----------------------------------------------
+# Times
+
+
+def to_fs(text):
+    """ '1200ns', '1.5 us' or an int (fs) -> fs """
+    if isinstance(text, int):
+        return text
+    match = _TIME.match(str(text))
+    assert match, "cannot parse time {}".format(text)
+    return int(round(float(match.group(1)) * UNITS_FS[match.group(2) or "fs"]))
+
+
+def fs_text(fs):
+    """ fs -> GHDL time literal """
+    return "{}fs".format(int(fs))
+
+
+def failure_time(text):
+    """ time in fs of the first failure or error in a GHDL log, None without one """
+    match = _FAILURE.search(text)
+    if match is None:
+        return None
+    return int(match.group(1)) * UNITS_FS[match.group(2) or "fs"]
+
+
+# ----------------------------------------------
+# Policy
+
+
+class WavePolicy:
+    def __init__(self, mode="none", signals=(), fmt="ghw", before=200, after=50,
+                 clk_period="1ns"):
+        """
+        signals: hierarchies or PRESETS names, empty is everything;
+        before/after: cycles kept around a failure (window);
+        clk_period: cycle of the testbench clock
+        """
+        assert mode in MODES, "unknown wave mode {}".format(mode)
+        assert fmt in FORMATS, "unknown wave format {}".format(fmt)
+        assert mode != "signals" or signals, "the signals mode needs signals"
+        self.mode = mode
+        self.signals = [PRESETS.get(x, x) for x in signals]
+        self.fmt = "vcd" if mode == "window" else fmt
+        self.before = before
+        self.after = after
+        self.clk_period = to_fs(clk_period)
+
+    @classmethod
+    def from_spec(cls, spec):
+        """ mode name, dict or path of a JSON spec """
+        if spec is None or isinstance(spec, bool):
+            return cls("all" if spec else "none")
+        if isinstance(spec, str):
+            if spec in MODES:
+                return cls(spec)
+            with open(spec, "r") as handle:
+                spec = json.load(handle)
+        spec = dict(spec)
+        if "format" in spec:
+            spec["fmt"] = spec.pop("format")
+        return cls(**spec)
+
+    def opt_text(self, top):
+        """ GHDL wave option file selecting the signals below top """
+        lines = [WAVE_OPT_VERSION]
+        for path in self.signals:
+            lines.append("/" + top + "/" + path.strip("/"))
+        return "\n".join(lines) + "\n"
+
+    def wave_file(self, top):
+        return "{}.{}".format(top, self.fmt)
+
+    def run_args(self, top, cwd="."):
+        """ run options, writes the wave option file into cwd if needed """
+        if self.mode == "none":
+            return []
+        args = []
+        if self.signals:
+            opt = top + ".opt"
+            with open(os.path.join(cwd, opt), "w") as handle:
+                handle.write(self.opt_text(top))
+            args.append("--read-wave-opt=" + opt)
+        return args + ["--{}={}".format(self.fmt if self.fmt != "ghw" else "wave",
+                                        self.wave_file(top))]
+
+
+def _with_stop_time(cmd, stop_fs):
+    cmd = [x for x in cmd if not x.startswith("--stop-time=")]
+    return cmd + ["--stop-time=" + fs_text(stop_fs)]
+
+
+def run_with_policy(cmd, top, policy: WavePolicy, cwd, log, env=None):
+    """
+    run a GHDL run command (without wave options) under a policy, the
+    output is appended to log; returns (returncode, wave file or None)
+    """
+    def run(args):
+        with open(log, "a") as handle:
+            handle.write("$ " + shlex.join(args) + "\n")
+            handle.flush()
+            return subprocess.run(args, cwd=cwd, stdout=handle, stderr=subprocess.STDOUT,
+                                  env=env).returncode
+
+    if policy.mode != "window":
+        ret = run(cmd + policy.run_args(top, cwd))
+        wave = policy.wave_file(top) if policy.mode != "none" else None
+        return ret, wave
+
+    offset = os.path.getsize(log) if os.path.exists(log) else 0
+    ret = run(cmd)
+    fail = None
+    with open(log, "r", errors="replace") as handle:
+        handle.seek(offset)
+        for line in handle:
+            fail = failure_time(line)
+            if fail is not None:
+                break
+    if fail is None:
+        return ret, None
+
+    # rerun up to the window end, failures no longer stop the simulation
+    start = max(fail - int(policy.before * policy.clk_period), 0)
+    end = fail + int(policy.after * policy.clk_period)
+    run(_with_stop_time(cmd, end) + ["--assert-level=none"] + policy.run_args(top, cwd))
+    full = os.path.join(cwd, policy.wave_file(top))
+    window = os.path.join(cwd, "{}.window.vcd".format(top))
+    if not os.path.exists(full):
+        return ret, None
+    with open(full, "r") as src, open(window, "w") as dst:
+        trim_vcd(src, dst, start, end)
+    os.remove(full)
+    return ret, os.path.basename(window)
+
+
+# ----------------------------------------------
+# VCD
+
+
+def read_vcd_header(handle):
+    """
+    header lines up to $enddefinitions, the timescale in fs and the
+    variables {id: (scope path, name, type, size)}
+    """
+    lines, scope, variables = [], [], {}
+    timescale, in_timescale = 1, False
+    for line in handle:
+        lines.append(line)
+        tokens = line.split()
+        if not tokens:
+            continue
+        if tokens[0] == "$timescale" or in_timescale:
+            text = " ".join(x for x in tokens if x not in ("$timescale", "$end"))
+            if text:
+                timescale = to_fs(text)
+            in_timescale = "$end" not in tokens
+        elif tokens[0] == "$scope":
+            scope.append(tokens[2])
+        elif tokens[0] == "$upscope":
+            scope.pop()
+        elif tokens[0] == "$var":
+            # $var <type> <size> <id> <name> [range] $end
+            variables[tokens[3]] = ("/".join(scope), " ".join(tokens[4:-1]),
+                                    tokens[1], int(tokens[2]))
+        elif tokens[0] == "$enddefinitions":
+            break
+    return lines, timescale, variables
+
+
+def iter_vcd(handle):
+    """
+    after the header: yields (time, None, None) on every time step and
+    (time, id, value) on every value change, values are '0'/'1'/'x'...
+    for scalars and the bits (or the real) of vectors
+    """
+    time = 0
+    for line in handle:
+        line = line.strip()
+        if not line:
+            continue
+        head = line[0]
+        if head == "#":
+            time = int(line[1:])
+            yield time, None, None
+        elif head in "bBrR":
+            value, ident = line[1:].split()
+            yield time, ident, value
+        elif head == "$":
+            continue        # $dumpvars/$end/$comment keywords, the values follow as lines
+        else:
+            yield time, line[1:], head
+
+
+def trim_vcd(src, dst, start_fs, end_fs):
+    """
+    copy the changes in [start_fs, end_fs] of a VCD stream; the values at
+    start_fs are dumped first, memory is one value per variable
+    """
+    header, timescale, variables = read_vcd_header(src)
+    dst.writelines(header)
+    start, end = start_fs // timescale, end_fs // timescale
+    prefix = {ident: "r" if kind == "real" else "b" if size > 1 else ""
+              for ident, (_, _, kind, size) in variables.items()}
+
+    def change(ident, value):
+        head = prefix.get(ident, "")
+        return "{}{} {}\n".format(head, value, ident) if head else value + ident + "\n"
+
+    state = {}
+    started = False
+    for time, ident, value in iter_vcd(src):
+        if time > end:
+            break
+        if not started and time >= start:
+            dst.write("#{}\n$dumpvars\n".format(start))
+            dst.writelines(change(k, v) for k, v in state.items())
+            dst.write("$end\n")
+            started = True
+            if time > start:
+                dst.write("#{}\n".format(time))
+            if ident is None:
+                continue
+        if ident is None:
+            if started:
+                dst.write("#{}\n".format(time))
+        elif started:
+            dst.write(change(ident, value))
+        else:
+            state[ident] = value
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Waveform capture policies")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_opt = sub.add_parser("opt", help="write the wave option file of a spec")
+    p_opt.add_argument("spec", help="mode, JSON spec or comma separated signals")
+    p_opt.add_argument("top", help="top unit, the testbench")
+    p_opt.add_argument("-o", "--output", default=None)
+
+    p_run = sub.add_parser("run", help="build (cached) and run a testbench with a policy")
+    p_run.add_argument("test_name")
+    p_run.add_argument("--spec", default="none", help="mode or JSON spec")
+    p_run.add_argument("-g", "--generic", action="append", default=[],
+                       metavar="NAME=VALUE", help="top-level generic, repeat")
+    p_run.add_argument("--stop-time", type=stop_time_arg, default="1000ns")
+    p_run.add_argument("--cache", default=".ghdl_cache")
+    p_run.add_argument("--log", default=None, help="default <test_name>.log")
+
+    p_trim = sub.add_parser("trim", help="cut a time window out of a VCD")
+    p_trim.add_argument("src")
+    p_trim.add_argument("dst")
+    p_trim.add_argument("--start", required=True, help="e.g. 1200ns")
+    p_trim.add_argument("--end", required=True)
+    args = parser.parse_args()
+
+    if args.cmd == "opt":
+        spec = args.spec
+        if spec not in MODES and not os.path.exists(spec):
+            spec = {"mode": "signals", "signals": spec.split(",")}
+        text = WavePolicy.from_spec(spec).opt_text(args.top)
+        if args.output:
+            with open(args.output, "w") as handle:
+                handle.write(text)
+        else:
+            print(text, end="")
+        sys.exit(0)
+
+    if args.cmd == "trim":
+        with open(args.src, "r") as src, open(args.dst, "w") as dst:
+            trim_vcd(src, dst, to_fs(args.start), to_fs(args.end))
+        sys.exit(0)
+
+    policy = WavePolicy.from_spec(args.spec)
+    cache = BuildCache(args.cache)
+    build_dir, hit, ret = cache.build(args.test_name)
+    print("build", build_dir, "hit" if hit else "miss")
+    if ret:
+        sys.exit(ret)
+    cmd = cache.run_cmd(build_dir, args.test_name, args.stop_time, False,
+                        dict(x.split("=", 1) for x in args.generic))
+    log = args.log or args.test_name + ".log"
+    ret, wave = run_with_policy(cmd, args.test_name, policy, ".", log)
+    print("log", log)
+    print("wave", wave or "-")
+    sys.exit(ret)
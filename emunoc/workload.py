@@ -0,0 +1,331 @@
+"""
+COPYRIGHT(c) 2022
+INSTITUTE FOR COMMUNICATION TECHNOLOGIES AND EMBEDDED SYSTEMS
+RWTH AACHEN
+GERMANY
+
+This confidential and proprietary software may be used, copied,
+modified, merged, published or distributed according to the
+permissions and/or limitations granted by an authorizing license
+agreement.
+
+The above copyright notice and this permission notice shall be
+included in all copies or substantial portions of the Software.
+
+Author: 1. Tan Yee Yang (tan@ice.rwth-aachen.de)
+        2. Jan Moritz Joseph (joseph@ice.rwth-aachen.de)
+
+Bulk-transfer workloads: payloads sent over several (src, dst) flows.
+
+Every payload (file or bytes) is fragmented into packets of one header
+flit and up to pkt_len - 1 data flits, the lengths drawn per packet:
+    max        full packets, only the last fragment is shorter
+    uniform    uniform in pkt_len = (min, max)
+    geometric  geometric with the mean of pkt_len, clipped to it
+Each flow injects its packets at load flits/cycle from its start cycle,
+flows of one source are serialized at one flit per cycle, and all flows
+are interleaved in time and merged into one injection trace for
+axis_sp_inject. The pe_inject FIFOs only hold num_pe packets: flows that
+converge on one destination back up in them, so lower load or stretch
+the start cycles with stagger when the TLM reports an overflow. The
+fragment table (flow, byte offset and size of every packet) is written
+next to the trace as fragments.csv; the ejected headers are matched
+back to it per flow. The NoC only carries headers, so check rebuilds the
+received bytes of the --flow payloads from the delivered fragments
+(flow<n>.bin and the missing byte ranges in missing.csv under --out-dir);
+random payloads are not kept:
+    python3 -m emunoc.workload build -o in --flow 0 5 a.bin --flow 3 12 b.bin
+    python3 -m emunoc.workload build -o in --random-flows 16 65536 --dist uniform --load 0.2 --stagger 500
+    python3 -m emunoc.tlm in -o recv_flit.txt
+    python3 -m emunoc.workload check in recv_flit.txt --flow 0 5 a.bin --flow 3 12 b.bin
+"""
+
+import os
+import sys
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from emunoc import analysis
+from emunoc.burst import burst_batches
+from emunoc.config import load_config
+from emunoc.flit_codec import FlitCodec, flit_size
+from emunoc.trace_file import join_batches, load_trace, read_flit_text
+from emunoc.trace_writer import TraceWriter
+from emunoc.traffic import run_to_inf
+
+DISTS = ["max", "uniform", "geometric"]
+
+FLIT_BYTES = flit_size // 8
+
+FRAGMENTS = "fragments.csv"
+
+LOAD = 0.5
+
+
+def fragments_path(trace_path):
+    """ fragments.csv in a text trace directory, <file>.fragments.csv for a binary one """
+    if os.path.isdir(trace_path):
+        return os.path.join(trace_path, FRAGMENTS)
+    return trace_path + "." + FRAGMENTS
+
+
+def _payload(payload):
+    """ path, bytes or array -> uint8 array """
+    if isinstance(payload, str):
+        return np.fromfile(payload, dtype=np.uint8)
+    if isinstance(payload, (bytes, bytearray, memoryview)):
+        return np.frombuffer(payload, dtype=np.uint8)
+    return np.asarray(payload).view(np.uint8).ravel()
+
+
+class FileTransferWorkload:
+    def __init__(self, codec: FlitCodec, pkt_len=None, dist="max", load=LOAD,
+                 stagger=0, seed=None, start_id=0):
+        """
+        pkt_len: fixed length or (min, max) in flits, header included;
+        load:    flits/cycle injected by every flow;
+        stagger: flows without a start cycle start at random in [0, stagger)
+        """
+        assert dist in DISTS, "unknown length distribution {}".format(dist)
+        if pkt_len is None:
+            pkt_len = codec.max_pkt_len
+        if np.isscalar(pkt_len):
+            pkt_len = (pkt_len, pkt_len)
+        assert 2 <= pkt_len[0] <= pkt_len[1] <= codec.max_pkt_len, \
+            "pkt_len must be within 2..{}".format(codec.max_pkt_len)
+        assert 0 < load <= 1, "a flow injects at most one flit per cycle"
+
+        self.codec = codec
+        self.pkt_len = pkt_len
+        self.dist = dist
+        self.load = load
+        self.stagger = stagger
+        self.rng = np.random.default_rng(seed)
+        self.start_id = start_id
+        self.flows = []        # (src, dst, start)
+        self.payloads = []
+
+    def add_flow(self, src, dst, payload, start=None):
+        """ one payload from src to dst, returns the flow index """
+        assert 0 <= src < self.codec.num_pe and 0 <= dst < self.codec.num_pe, \
+            "flow {} -> {} outside of the mesh".format(src, dst)
+        assert src != dst, "flow {} -> {} is self-addressed".format(src, dst)
+        data = _payload(payload)
+        assert data.size > 0, "empty payload"
+        if start is None:
+            start = int(self.rng.integers(0, self.stagger)) if self.stagger else 0
+        self.flows.append((int(src), int(dst), int(start)))
+        self.payloads.append(data)
+        return len(self.flows) - 1
+
+    def add_random_flows(self, count, size):
+        """ count flows of size random bytes between random distinct nodes """
+        num_pe = self.codec.num_pe
+        for _ in range(count):
+            src = int(self.rng.integers(0, num_pe))
+            dst = int(self.rng.integers(0, num_pe - 1))
+            self.add_flow(src, dst + (dst >= src),
+                          self.rng.integers(0, 256, size, dtype=np.uint8))
+
+    # ------------------------------------------
+    # Fragmentation
+
+    def _data_flits(self, count):
+        """ data flits per packet covering count flits, the last one cut """
+        low, high = self.pkt_len[0] - 1, self.pkt_len[1] - 1
+        draws = count // low + 1
+        if self.dist == "max":
+            lengths = np.full(draws, high, dtype=np.int64)
+        elif self.dist == "uniform":
+            lengths = self.rng.integers(low, high + 1, draws)
+        else:
+            lengths = np.clip(self.rng.geometric(2 / (low + high), draws), low, high)
+        ends = np.cumsum(lengths)
+        num = int(np.searchsorted(ends, count)) + 1
+        lengths = lengths[:num]
+        lengths[-1] = count - (ends[num - 2] if num > 1 else 0)
+        return lengths
+
+    def fragments(self):
+        """ DataFrame of all packets in injection order, ids assigned """
+        parts = []
+        for flow, ((src, dst, start), data) in enumerate(zip(self.flows, self.payloads)):
+            data_flits = self._data_flits(-(-data.size // FLIT_BYTES))
+            pkt_len = data_flits + 1
+            sent = np.cumsum(pkt_len) - pkt_len
+            offset = (np.cumsum(data_flits) - data_flits) * FLIT_BYTES
+            parts.append(pd.DataFrame({
+                "flow": flow,
+                "seq": np.arange(pkt_len.size),
+                "src": src,
+                "dst": dst,
+                "len": pkt_len,
+                "inj_cycle": start + (sent / self.load).astype(np.int64),
+                "offset": offset,
+                "nbytes": np.minimum(data_flits * FLIT_BYTES, data.size - offset),
+            }))
+        df = pd.concat(parts, ignore_index=True)
+
+        # flows of one source share its port: one flit per cycle, in order
+        df = df.sort_values(["src", "inj_cycle", "flow"], kind="stable", ignore_index=True)
+        sent = df.groupby("src")["len"].cumsum() - df["len"]
+        df["inj_cycle"] = sent + (df["inj_cycle"] - sent).groupby(df["src"]).cummax()
+        df = df.sort_values(["inj_cycle", "flow", "seq"], kind="stable", ignore_index=True)
+        df.insert(0, "id", (self.start_id + np.arange(len(df))) % 2**self.codec.flit_id_width)
+        return df
+
+    def batches(self, df=None):
+        """ one multi-batch dict of the fragments, a batch per injection cycle """
+        if df is None:
+            df = self.fragments()
+        hdrs = self.codec.pack_hdr(df["id"], df["src"], df["dst"], df["len"])
+        yield join_batches(df["inj_cycle"].to_numpy(), hdrs)
+
+
+# ----------------------------------------------
+# Reassembly
+
+
+def reassemble(codec: FlitCodec, fragments, recv_flits):
+    """
+    ejected headers (axis_ps_eject stream) matched to the fragment table,
+    ej_cycle and latency NaN for lost packets
+    """
+    ej = analysis.ejected_packets(codec, recv_flits)
+    inj = fragments.assign(id=fragments["id"] & (2**codec.hw_id_width - 1))
+    return analysis.join_latency(inj, ej)
+
+
+def flow_report(df):
+    """ per flow: packets and bytes delivered, completion cycle and goodput """
+    recv = df.assign(delivered=df["nbytes"].where(df["ej_cycle"].notna(), 0))
+    ret = recv.groupby("flow").agg(
+        src=("src", "first"),
+        dst=("dst", "first"),
+        packets=("seq", "count"),
+        received=("ej_cycle", "count"),
+        bytes=("nbytes", "sum"),
+        delivered=("delivered", "sum"),
+        start=("inj_cycle", "min"),
+        done=("ej_cycle", "max"),
+        latency=("latency", "mean"),
+    )
+    ret["complete"] = ret["received"] == ret["packets"]
+    ret["fct"] = ret["done"] - ret["start"]
+    ret["goodput"] = ret["delivered"] / (ret["fct"] + 1)
+    return ret
+
+
+def flow_payloads(df, payloads):
+    """
+    received bytes of every flow, {flow: (bytearray, received mask)}; the
+    bytes of a fragment are those of the payload it was cut from
+    """
+    ret = {}
+    for flow, part in df.groupby("flow"):
+        data = _payload(payloads[flow])
+        out = bytearray(data.size)
+        buf = np.frombuffer(out, dtype=np.uint8)
+        mask = np.zeros(data.size, dtype=bool)
+        recv = part[part["ej_cycle"].notna()]
+        for offset, nbytes in zip(recv["offset"].tolist(), recv["nbytes"].tolist()):
+            buf[offset:offset + nbytes] = data[offset:offset + nbytes]
+            mask[offset:offset + nbytes] = True
+        ret[flow] = (out, mask)
+    return ret
+
+
+def missing_ranges(mask):
+    """ received mask -> [(start, end)] byte ranges that did not arrive """
+    edges = np.flatnonzero(np.diff(np.concatenate([[1], mask.astype(np.int8), [1]])))
+    return list(zip(edges[::2].tolist(), edges[1::2].tolist()))
+
+
+def write_flow_payloads(df, payloads, out_dir):
+    """
+    flow<n>.bin with the received bytes of every flow with a payload
+    (missing bytes zero) and missing.csv with the byte ranges that did
+    not arrive; returns the missing table
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rows = []
+    for flow, (data, mask) in flow_payloads(df, payloads).items():
+        with open(os.path.join(out_dir, "flow{}.bin".format(flow)), "wb") as handle:
+            handle.write(data)
+        rows += [{"flow": flow, "start": start, "end": end}
+                 for start, end in missing_ranges(mask)]
+    missing = pd.DataFrame(rows, columns=["flow", "start", "end"])
+    missing.to_csv(os.path.join(out_dir, "missing.csv"), index=False)
+    return missing
+
+
+if __name__ == "__main__":
+    cfg = load_config()
+    parser = argparse.ArgumentParser(description="Bulk-transfer workloads over several flows")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_build = sub.add_parser("build", help="fragment payloads into an injection trace")
+    p_build.add_argument("-o", "--output", default="in")
+    p_build.add_argument("--format", choices=["txt", "bin"], default="txt")
+    p_build.add_argument("--flow", nargs=3, action="append", default=[],
+                         metavar=("SRC", "DST", "FILE"), help="payload file from PE SRC to PE DST")
+    p_build.add_argument("--random-flows", type=int, nargs=2, default=None,
+                         metavar=("COUNT", "BYTES"), help="random payloads between random nodes")
+    p_build.add_argument("--pkt-len", type=int, nargs=2, default=None, metavar=("MIN", "MAX"))
+    p_build.add_argument("--dist", choices=DISTS, default="max")
+    p_build.add_argument("--load", type=float, default=LOAD,
+                         help="flits/cycle per flow, lower it if pe_inject overflows")
+    p_build.add_argument("--stagger", type=int, default=0, help="random flow start in [0, STAGGER)")
+    p_build.add_argument("--seed", type=int, default=None)
+    p_build.add_argument("--burst", type=int, default=None, metavar="GROUPS",
+                         help="burst framing, up to GROUPS injection cycles per transfer")
+
+    p_check = sub.add_parser("check", help="per flow delivery of a run")
+    p_check.add_argument("inj", help="injected trace, text directory or binary file")
+    p_check.add_argument("recv", help="axis_ps_eject output, e.g. out/recv_flit.txt")
+    p_check.add_argument("--flow", nargs=3, action="append", default=[],
+                         metavar=("SRC", "DST", "FILE"), help="the --flow payloads of build, in order")
+    p_check.add_argument("--out-dir", default="flows",
+                         help="received bytes and missing ranges of the --flow payloads")
+    p_check.add_argument("--csv", help="write the per-packet table")
+    args = parser.parse_args()
+
+    codec = cfg.codec()
+    if args.cmd == "build":
+        work = FileTransferWorkload(codec, args.pkt_len and tuple(args.pkt_len), args.dist,
+                                    args.load, args.stagger, args.seed)
+        for src, dst, path in args.flow:
+            work.add_flow(int(src), int(dst), path)
+        if args.random_flows:
+            work.add_random_flows(*args.random_flows)
+        assert work.flows, "no flows given"
+
+        df = work.fragments()
+        with TraceWriter(args.output, args.format, cfg.geometry()) as td:
+            batches = work.batches(df)
+            td.extend(burst_batches(batches, args.burst) if args.burst else batches)
+            td.add(run_to_inf())
+        df.to_csv(fragments_path(args.output), index=False)
+        print("flows:", len(work.flows), "packets:", len(df), "batches:", td.n_batch,
+              "flits:", td.n_flit, "cycles:", int(df["inj_cycle"].max()) + 1)
+        sys.exit(0)
+
+    trace = load_trace(args.inj)
+    cfg.check_geometry(trace.geometry)
+    df = reassemble(codec, pd.read_csv(fragments_path(args.inj)), read_flit_text(args.recv))
+    report = flow_report(df)
+    print(report.to_string())
+    if args.flow:
+        # build adds the --flow payloads first, they are flows 0..n-1
+        for flow, (src, dst, _) in enumerate(args.flow):
+            assert flow in report.index and \
+                (report.at[flow, "src"], report.at[flow, "dst"]) == (int(src), int(dst)), \
+                "--flow {} {} is not flow {} of the trace".format(src, dst, flow)
+        payloads = [path for _, _, path in args.flow]
+        missing = write_flow_payloads(df[df["flow"] < len(payloads)], payloads, args.out_dir)
+        print("missing byte ranges:", len(missing), "written to", args.out_dir)
+    if args.csv:
+        df.to_csv(args.csv, index=False)
+    sys.exit(int(not report["complete"].all()))
@@ -29,7 +29,10 @@ entity axis_homo_full_noc is
         NUM_ROUTER    : Integer := max_x_dim * max_y_dim * max_z_dim;
         NUM_IO        : Integer := max_x_dim * max_y_dim * max_z_dim * max_vc_num;
 
-        C_AXIS_TDATA_WIDTH : Integer := flit_size
+        C_AXIS_TDATA_WIDTH : Integer := flit_size;
+
+        -- noc_perf_counters, 4 words per router
+        PERF_EN : Boolean := false
     );
     port (
         clk : in Std_logic;
@@ -45,8 +48,10 @@ entity axis_homo_full_noc is
         s_axis_tdata_vec  : in flit_vector(NUM_ROUTER - 1 downto 0);
         s_axis_tstrb_vec  : in Std_logic_vector((C_AXIS_TDATA_WIDTH/8) * NUM_ROUTER - 1 downto 0);
         s_axis_tlast_vec  : in Std_logic_vector(NUM_ROUTER - 1 downto 0);
-        s_axis_tvalid_vec : in Std_logic_vector(NUM_ROUTER - 1 downto 0)
+        s_axis_tvalid_vec : in Std_logic_vector(NUM_ROUTER - 1 downto 0);
 
+        i_perf_addr : in Natural := 0;
+        o_perf_data : out Std_logic_vector(C_AXIS_TDATA_WIDTH - 1 downto 0)
     );
 end entity;
 
@@ -57,7 +62,13 @@ architecture behave of axis_homo_full_noc is
     signal local_vc_write_tx : Std_logic_vector(NUM_IO - 1 downto 0);
     signal local_incr_rx_vec : Std_logic_vector(NUM_IO - 1 downto 0);
     signal local_incr_tx_vec : Std_logic_vector(NUM_IO - 1 downto 0);
+
+    signal m_axis_tvalid : Std_logic_vector(NUM_ROUTER - 1 downto 0);
+    signal s_axis_tready : Std_logic_vector(NUM_ROUTER - 1 downto 0);
 begin
+    -- I/O
+    m_axis_tvalid_vec <= m_axis_tvalid;
+    s_axis_tready_vec <= s_axis_tready;
 
     -- NoC
     full_noc_comp : entity work.full_noc
@@ -92,7 +103,7 @@ begin
                 S_AXIS_ACLK    => clk,
                 S_AXIS_ARESETN => rst,
 
-                S_AXIS_TREADY => s_axis_tready_vec(i),
+                S_AXIS_TREADY => s_axis_tready(i),
                 S_AXIS_TDATA  => s_axis_tdata_vec(i),
                 S_AXIS_TSTRB  => s_axis_tstrb_vec((C_AXIS_TDATA_WIDTH/8) * (i + 1) - 1 downto (C_AXIS_TDATA_WIDTH/8) * i),
                 S_AXIS_TLAST  => s_axis_tlast_vec(i),
@@ -120,7 +131,7 @@ begin
                 M_AXIS_ACLK    => clk,
                 M_AXIS_ARESETN => rst,
 
-                M_AXIS_TVALID => m_axis_tvalid_vec(i),
+                M_AXIS_TVALID => m_axis_tvalid(i),
                 M_AXIS_TDATA  => m_axis_tdata_vec(i),
                 M_AXIS_TSTRB  => m_axis_tstrb_vec((C_AXIS_TDATA_WIDTH/8) * (i + 1) - 1 downto (C_AXIS_TDATA_WIDTH/8) * i),
                 M_AXIS_TLAST  => m_axis_tlast_vec(i),
@@ -128,4 +139,33 @@ begin
             );
     end generate;
 
+    -- performance counters
+    gen_perf : if PERF_EN generate
+        inst_noc_perf_counters : entity work.noc_perf_counters
+            generic map(
+                NUM_ROUTER => NUM_ROUTER,
+                VC_NUM     => max_vc_num,
+                CNT_WIDTH  => C_AXIS_TDATA_WIDTH
+            )
+            port map(
+                clk => clk,
+                rst => rst,
+
+                i_vc_write_rx => local_vc_write_rx,
+                i_vc_write_tx => local_vc_write_tx,
+
+                i_s_axis_tvalid => s_axis_tvalid_vec,
+                i_s_axis_tready => s_axis_tready,
+                i_m_axis_tvalid => m_axis_tvalid,
+                i_m_axis_tready => m_axis_tready_vec,
+
+                i_addr => i_perf_addr,
+                o_data => o_perf_data
+            );
+    end generate;
+
+    gen_no_perf : if not PERF_EN generate
+        o_perf_data <= (others => '0');
+    end generate;
+
 end architecture;
\ No newline at end of file
@@ -0,0 +1,98 @@
+------------------------------------------------------------------
+-- COPYRIGHT(c) 2022
+-- INSTITUTE FOR COMMUNICATION TECHNOLOGIES AND EMBEDDED SYSTEMS
+-- RWTH AACHEN
+-- GERMANY
+--
+-- This confidential and proprietary software may be used, copied,
+-- modified, merged, published or distributed according to the
+-- permissions and/or limitations granted by an authorizing license
+-- agreement.
+--
+-- The above copyright notice and this permission notice shall be
+-- included in all copies or substantial portions of the Software.
+--
+-- Author: 1. Tan Yee Yang (tan@ice.rwth-aachen.de)
+--         2. Jan Moritz Joseph (joseph@ice.rwth-aachen.de)
+------------------------------------------------------------------
+
+-- Performance counters of the router local ports, counted on the NoC
+-- clock. Per router 4 free running (wrapping) counters:
+--   0 inj_flits  flits written into the router local input (all VCs)
+--   1 ej_flits   flits written by the router to the local output
+--   2 inj_stall  cycles the NI holds a flit without credit (s_axis tvalid, not tready)
+--   3 ej_stall   cycles the PE side does not take an ejected flit (m_axis tvalid, not tready)
+-- Word i_addr = router * 4 + counter is read on o_data.
+
+library ieee;
+use ieee.std_logic_1164.all;
+use ieee.numeric_std.all;
+
+use work.NOC_3D_PACKAGE.all;
+
+entity noc_perf_counters is
+    generic (
+        NUM_ROUTER : Integer   := max_x_dim * max_y_dim * max_z_dim;
+        VC_NUM     : Integer   := max_vc_num;
+        CNT_WIDTH  : Integer   := flit_size;
+        RST_LVL    : Std_logic := RST_LVL
+    );
+    port (
+        clk : in Std_logic;
+        rst : in Std_logic;
+
+        i_vc_write_rx : in Std_logic_vector(NUM_ROUTER * VC_NUM - 1 downto 0);
+        i_vc_write_tx : in Std_logic_vector(NUM_ROUTER * VC_NUM - 1 downto 0);
+
+        i_s_axis_tvalid : in Std_logic_vector(NUM_ROUTER - 1 downto 0);
+        i_s_axis_tready : in Std_logic_vector(NUM_ROUTER - 1 downto 0);
+        i_m_axis_tvalid : in Std_logic_vector(NUM_ROUTER - 1 downto 0);
+        i_m_axis_tready : in Std_logic_vector(NUM_ROUTER - 1 downto 0);
+
+        i_addr : in Natural;
+        o_data : out Std_logic_vector(CNT_WIDTH - 1 downto 0)
+    );
+end entity;
+
+architecture rtl of noc_perf_counters is
+    constant NUM_CNT : Integer := 4;
+
+    type t_Counters is array (NUM_ROUTER * NUM_CNT - 1 downto 0) of unsigned(CNT_WIDTH - 1 downto 0);
+    signal counters : t_Counters;
+
+    function popcount(vec : Std_logic_vector) return Natural is
+        variable ret : Natural := 0;
+    begin
+        for i in vec'range loop
+            if vec(i) = '1' then
+                ret := ret + 1;
+            end if;
+        end loop;
+        return ret;
+    end function;
+
+begin
+    o_data <= Std_logic_vector(counters(i_addr)) when i_addr < NUM_ROUTER * NUM_CNT else
+        (others => '0');
+
+    gen_router : for i in 0 to NUM_ROUTER - 1 generate
+        process (clk, rst)
+        begin
+            if rst = RST_LVL then
+                counters(NUM_CNT * (i + 1) - 1 downto NUM_CNT * i) <= (others => (others => '0'));
+            elsif rising_edge(clk) then
+                counters(NUM_CNT * i + 0) <= counters(NUM_CNT * i + 0) + popcount(i_vc_write_rx(VC_NUM * (i + 1) - 1 downto VC_NUM * i));
+                counters(NUM_CNT * i + 1) <= counters(NUM_CNT * i + 1) + popcount(i_vc_write_tx(VC_NUM * (i + 1) - 1 downto VC_NUM * i));
+
+                if i_s_axis_tvalid(i) = '1' and i_s_axis_tready(i) = '0' then
+                    counters(NUM_CNT * i + 2) <= counters(NUM_CNT * i + 2) + 1;
+                end if;
+
+                if i_m_axis_tvalid(i) = '1' and i_m_axis_tready(i) = '0' then
+                    counters(NUM_CNT * i + 3) <= counters(NUM_CNT * i + 3) + 1;
+                end if;
+            end if;
+        end process;
+    end generate;
+
+end architecture;
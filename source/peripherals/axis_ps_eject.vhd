@@ -38,6 +38,11 @@ entity axis_ps_eject is
         Y_ADDR_WIDTH     : Integer := y_addr_width;
         Z_ADDR_WIDTH     : Integer := z_addr_width;
 
+        -- counter words of a performance window, 0 disables
+        PERF_NUM : Integer := 0;
+        -- clock_halter halt counters sent ahead of every ejection window, 0 disables
+        HALT_NUM : Integer := 0;
+
         RST_LVL : Std_logic := RST_LVL
     );
     port (
@@ -56,7 +61,16 @@ entity axis_ps_eject is
 
         i_halt      : in Std_logic;
         o_halt      : out Std_logic;
-        i_noc_count : in Std_logic_vector(CNT_WIDTH - 1 downto 0)
+        i_noc_count : in Std_logic_vector(CNT_WIDTH - 1 downto 0);
+
+        -- performance window: | PERF_MARK | cycle | PERF_NUM | counters (tlast) |
+        i_perf_req  : in Std_logic                                         := '0';
+        o_perf_ack  : out Std_logic;
+        o_perf_addr : out Natural;
+        i_perf_data : in Std_logic_vector(C_AXIS_TDATA_WIDTH - 1 downto 0) := (others => '0');
+
+        -- halt window: | HALT_MARK | cycle | HALT_NUM | counters (tlast) |
+        i_halt_cnt : in Std_logic_vector(HALT_NUM * C_AXIS_TDATA_WIDTH - 1 downto 0) := (others => '0')
     );
 end entity;
 
@@ -109,11 +123,25 @@ architecture implementation of axis_ps_eject is
         s_CYC,
         s_ADDR,
         s_TRAN,
-        s_ZERO
+        s_ZERO,
+        s_PMARK,
+        s_PCYC,
+        s_PNUM,
+        s_PDATA
     );
     signal state : t_STATE;
     signal halt  : Std_logic;
 
+    -- the cycle word of a window stays below the upper bound (all ones)
+    constant PERF_MARK : Std_logic_vector(C_AXIS_TDATA_WIDTH - 1 downto 0) := (others => '1');
+    constant HALT_MARK : Std_logic_vector(C_AXIS_TDATA_WIDTH - 1 downto 0) := (0 => '0', others => '1');
+
+    signal perf      : Std_logic;
+    signal perf_addr : Natural range 0 to PERF_NUM + HALT_NUM;
+    signal stats     : Boolean; -- halt window instead of performance window
+    signal win_num   : Natural;
+    signal win_data  : Std_logic_vector(C_AXIS_TDATA_WIDTH - 1 downto 0);
+
     signal fifo_addr   : Integer range 0 to PE_NUM - 1;
     signal shift_fifo  : Std_logic_vector(PE_NUM - 1 downto 0);
     signal rotate_fifo : Std_logic_vector(PE_NUM - 1 downto 0);
@@ -124,20 +152,36 @@ architecture implementation of axis_ps_eject is
 begin
     -- I/O
     m_axis_tstrb <= (others => '1');
-    m_axis_tlast <= '1' when state = s_ZERO else
+    m_axis_tlast <= '1' when state = s_ZERO or (state = s_PDATA and perf_addr = win_num - 1) else
         '0';
-    m_axis_tvalid <= '1' when state = s_CYC or state = s_TRAN or state = s_ZERO else
+    m_axis_tvalid <= '1' when state = s_CYC or state = s_TRAN or state = s_ZERO or perf = '1' else
         '0';
     m_axis_tdata <= iconv_hdr(i_fifos_rdata(fifo_addr)) when state = s_TRAN else
-        i_noc_count when state = s_CYC else
+        i_noc_count when state = s_CYC or state = s_PCYC else
+        HALT_MARK when state = s_PMARK and stats else
+        PERF_MARK when state = s_PMARK else
+        Std_logic_vector(to_unsigned(win_num, C_AXIS_TDATA_WIDTH)) when state = s_PNUM else
+        win_data when state = s_PDATA else
         (others => '0');
 
     o_fifos_ren <= shift_fifo when state = s_TRAN and m_axis_tready = '1' else
         (others => '0');
-    o_halt <= halt;
+    -- the NoC stands still while the counters are read
+    o_halt <= halt or perf;
+
+    o_perf_ack <= '1' when state = s_PMARK and m_axis_tready = '1' and not stats else
+        '0';
+    o_perf_addr <= perf_addr;
 
     -- Internal wire
     halt        <= or_reduce(i_fifos_rvalid);
+    perf        <= '1' when state = s_PMARK or state = s_PCYC or state = s_PNUM or state = s_PDATA else
+        '0';
+    win_num     <= HALT_NUM when stats else
+        PERF_NUM;
+    win_data    <= i_perf_data when not stats else
+        i_halt_cnt(C_AXIS_TDATA_WIDTH * (perf_addr + 1) - 1 downto C_AXIS_TDATA_WIDTH * perf_addr) when perf_addr < HALT_NUM else
+        (others => '0');
     shift_fifo  <= Std_logic_vector(shift_left(to_unsigned(1, shift_fifo'length), fifo_addr));
     rotate_fifo <= Std_logic_vector(rotate_right(unsigned(i_fifos_rvalid), fifo_addr));
     gen_swap_endian : for i in 0 to PE_NUM - 1 generate
@@ -162,6 +206,26 @@ begin
         end if;
     end process;
 
+    process (clk, rst)
+    begin
+        if rst = RST_LVL then
+            perf_addr <= 0;
+            stats     <= false;
+        elsif rising_edge(clk) then
+
+            if state = s_PDATA and m_axis_tready = '1' then
+                perf_addr <= perf_addr + 1;
+            elsif state = s_PMARK then
+                perf_addr <= 0;
+            end if;
+
+            if state = s_IDLE then
+                stats <= HALT_NUM > 0 and halt = '1' and i_halt = '1';
+            end if;
+
+        end if;
+    end process;
+
     -- fsm
     process (clk, rst)
     begin
@@ -170,8 +234,12 @@ begin
         elsif rising_edge(clk) then
             case state is
                 when s_IDLE =>
-                    if halt = '1' and i_halt = '1' then
+                    if halt = '1' and i_halt = '1' and HALT_NUM > 0 then
+                        state <= s_PMARK;
+                    elsif halt = '1' and i_halt = '1' then
                         state <= s_CYC;
+                    elsif PERF_NUM > 0 and i_perf_req = '1' then
+                        state <= s_PMARK;
                     end if;
 
                 when s_CYC =>
@@ -196,6 +264,28 @@ begin
                         state <= s_IDLE;
                     end if;
 
+                when s_PMARK =>
+                    if m_axis_tready = '1' then
+                        state <= s_PCYC;
+                    end if;
+
+                when s_PCYC =>
+                    if m_axis_tready = '1' then
+                        state <= s_PNUM;
+                    end if;
+
+                when s_PNUM =>
+                    if m_axis_tready = '1' then
+                        state <= s_PDATA;
+                    end if;
+
+                when s_PDATA =>
+                    if m_axis_tready = '1' and perf_addr = win_num - 1 and stats then
+                        state <= s_CYC;
+                    elsif m_axis_tready = '1' and perf_addr = win_num - 1 then
+                        state <= s_IDLE;
+                    end if;
+
             end case;
         end if;
     end process;
@@ -39,6 +39,9 @@ entity axis_sp_inject is
         Y_ADDR_WIDTH     : Integer := y_addr_width;
         Z_ADDR_WIDTH     : Integer := z_addr_width;
 
+        -- burst: | time | count | count x header | time | count | ... (tlast)
+        BURST_MODE : Boolean := false;
+
         RST_LVL : Std_logic := RST_LVL
     );
     port (
@@ -59,7 +62,10 @@ entity axis_sp_inject is
         o_ub_count     : out Std_logic_vector(CNT_WIDTH - 1 downto 0);
 
         i_run     : in Std_logic;
-        i_ps_halt : in Std_logic
+        i_ps_halt : in Std_logic;
+
+        -- a header waits for a full pe_inject FIFO
+        o_inj_blocked : out Std_logic
     );
 end entity;
 
@@ -109,6 +115,7 @@ architecture implementation of axis_sp_inject is
         s_IDLE,
         s_RUN,
         s_RDONE,
+        s_COUNT,
         s_INJECT,
         s_IDONE
     );
@@ -117,6 +124,7 @@ architecture implementation of axis_sp_inject is
     signal state       : t_STATE;
     signal run_flag    : Std_logic;
     signal axis_tready : Std_logic;
+    signal burst_cnt   : unsigned(C_AXIS_TDATA_WIDTH - 1 downto 0);
 
     -- wire
     signal fifos_wen : Std_logic_vector(PE_NUM - 1 downto 0);
@@ -135,6 +143,8 @@ begin
         (others => '0');
     o_fifos_wen <= fifos_wen when state = s_INJECT and axis_tready = '1' else
         (others => '0');
+    o_inj_blocked <= '1' when state = s_INJECT and s_axis_tvalid = '1' and i_fifos_wvalid(src_id) = '0' else
+        '0';
 
     -- Internal wire
     src_id    <= to_integer(unsigned(s_axis_tdata(PACKET_LEN_WIDTH + PE_ADDR_WIDTH * 2 - 1 downto PACKET_LEN_WIDTH + PE_ADDR_WIDTH))) mod PE_NUM;
@@ -146,7 +156,7 @@ begin
         if rst = RST_LVL then
             axis_tready <= '0';
         elsif rising_edge(clk) then
-            if state = s_RDONE and axis_tready = '0' and s_axis_tvalid = '1' then
+            if (state = s_RDONE or state = s_COUNT) and axis_tready = '0' and s_axis_tvalid = '1' then
                 axis_tready <= '1';
             elsif state = s_INJECT and axis_tready = '0' and s_axis_tvalid = '1' and i_fifos_wvalid(src_id) = '1' then
                 axis_tready <= '1';
@@ -171,6 +181,21 @@ begin
         end if;
     end process;
 
+    process (clk, rst)
+    begin
+        if rst = RST_LVL then
+            burst_cnt <= (others => '0');
+        elsif rising_edge(clk) then
+
+            if state = s_COUNT and s_axis_tvalid = '1' and axis_tready = '1' then
+                burst_cnt <= unsigned(s_axis_tdata);
+            elsif state = s_INJECT and s_axis_tvalid = '1' and axis_tready = '1' and burst_cnt > 0 then
+                burst_cnt <= burst_cnt - 1;
+            end if;
+
+        end if;
+    end process;
+
     -- FSM
     process (clk, rst)
     begin
@@ -192,6 +217,17 @@ begin
                 when s_RDONE =>
                     if s_axis_tvalid = '1' and s_axis_tlast = '1' and axis_tready = '1' then
                         state <= s_IDONE;
+                    elsif s_axis_tvalid = '1' and axis_tready = '1' and BURST_MODE then
+                        state <= s_COUNT;
+                    elsif s_axis_tvalid = '1' and axis_tready = '1' then
+                        state <= s_INJECT;
+                    end if;
+
+                when s_COUNT =>
+                    if s_axis_tvalid = '1' and s_axis_tlast = '1' and axis_tready = '1' then
+                        state <= s_IDONE;
+                    elsif s_axis_tvalid = '1' and axis_tready = '1' and unsigned(s_axis_tdata) = 0 then
+                        state <= s_IDLE; -- empty group, next time word
                     elsif s_axis_tvalid = '1' and axis_tready = '1' then
                         state <= s_INJECT;
                     end if;
@@ -199,6 +235,8 @@ begin
                 when s_INJECT =>
                     if s_axis_tvalid = '1' and s_axis_tlast = '1' and axis_tready = '1' then
                         state <= s_IDONE;
+                    elsif s_axis_tvalid = '1' and axis_tready = '1' and BURST_MODE and burst_cnt = 1 then
+                        state <= s_IDLE; -- group done, run to the next time word
                     end if;
 
                 when s_IDONE =>
@@ -16,6 +16,14 @@
 --         2. Jan Moritz Joseph (joseph@ice.rwth-aachen.de)
 ------------------------------------------------------------------
 
+-- Halts the NoC clock clkh while i_halt is set or the NoC reached the
+-- upper bound i_ub_count. Every clk cycle is counted in o_halt_cnt
+-- (CNT_WIDTH bits each, word 0 in the low bits) by what the NoC is doing:
+--   0 run       clkh enabled
+--   1 eject     i_halt, axis_ps_eject drains the ejection FIFOs
+--   2 inj_full  upper bound reached, axis_sp_inject waits on a full pe_inject FIFO
+--   3 host      upper bound reached, waiting for the next window of the host
+
 library ieee;
 use ieee.std_logic_1164.all;
 use ieee.std_logic_misc.all;
@@ -37,7 +45,10 @@ entity clock_halter is
 
         i_ub_count_wen : in Std_logic;
         i_ub_count     : in Std_logic_vector(CNT_WIDTH - 1 downto 0);
-        o_run_count    : out Std_logic_vector(CNT_WIDTH - 1 downto 0)
+        o_run_count    : out Std_logic_vector(CNT_WIDTH - 1 downto 0);
+
+        i_inj_blocked : in Std_logic := '0';
+        o_halt_cnt    : out Std_logic_vector(4 * CNT_WIDTH - 1 downto 0)
     );
 end entity;
 
@@ -50,6 +61,11 @@ architecture implementation of clock_halter is
     signal clk_count  : unsigned(0 downto 0);
     signal inner_clk  : Std_logic;
     signal halt_delay : Std_logic;
+
+    signal cnt_run      : unsigned(CNT_WIDTH - 1 downto 0);
+    signal cnt_eject    : unsigned(CNT_WIDTH - 1 downto 0);
+    signal cnt_inj_full : unsigned(CNT_WIDTH - 1 downto 0);
+    signal cnt_host     : unsigned(CNT_WIDTH - 1 downto 0);
 begin
     -- IO
     o_halt <= halt;
@@ -57,6 +73,7 @@ begin
         '0';
 
     o_run_count <= Std_logic_vector(run_count);
+    o_halt_cnt  <= Std_logic_vector(cnt_host & cnt_inj_full & cnt_eject & cnt_run);
     o_run       <= '1' when (run_count < ub_count or run_flag = '1') else
         '0';
 
@@ -114,4 +131,25 @@ begin
         end if;
     end process;
 
+    -- halt reasons
+    process (clk, rst)
+    begin
+        if rst = RST_LVL then
+            cnt_run      <= (others => '0');
+            cnt_eject    <= (others => '0');
+            cnt_inj_full <= (others => '0');
+            cnt_host     <= (others => '0');
+        elsif rising_edge(clk) then
+            if halt = '0' then
+                cnt_run <= cnt_run + 1;
+            elsif i_halt = '1' then
+                cnt_eject <= cnt_eject + 1;
+            elsif i_inj_blocked = '1' then
+                cnt_inj_full <= cnt_inj_full + 1;
+            else
+                cnt_host <= cnt_host + 1;
+            end if;
+        end if;
+    end process;
+
 end implementation;
\ No newline at end of file
@@ -27,7 +27,15 @@ entity top_axis_validation is
     generic (
         INJ_PE_BUFFER_DEPTH : Integer := max_x_dim * max_y_dim * max_z_dim;
         C_AXIS_TDATA_WIDTH  : Integer := flit_size;
-        PE_NUM              : Integer := max_x_dim * max_y_dim * max_z_dim
+        PE_NUM              : Integer := max_x_dim * max_y_dim * max_z_dim;
+        BURST_MODE          : Boolean := false;
+
+        -- NoC performance counters, a window every PERF_PERIOD NoC cycles
+        PERF_EN     : Boolean := false;
+        PERF_PERIOD : Natural := 10000;
+
+        -- clock_halter halt counters ahead of every ejection window
+        HALT_STATS : Boolean := false
     );
     port (
         clk : in Std_logic;
@@ -76,8 +84,38 @@ architecture implementation of top_axis_validation is
     signal ub_count     : Std_logic_vector(31 downto 0);
     signal noc_count    : Std_logic_vector(31 downto 0);
 
+    -- 4 noc_perf_counters words per router
+    constant PERF_NUM : Integer := 4 * PE_NUM;
+
+    signal perf_req  : Std_logic;
+    signal perf_ack  : Std_logic;
+    signal perf_addr : Natural;
+    signal perf_data : Std_logic_vector(C_AXIS_TDATA_WIDTH - 1 downto 0);
+    signal perf_next : unsigned(31 downto 0);
+
+    -- run, eject, inj_full, host cycles of clock_halter
+    constant HALT_NUM : Integer := 4;
+
+    signal inj_blocked : Std_logic;
+    signal halt_cnt    : Std_logic_vector(HALT_NUM * C_AXIS_TDATA_WIDTH - 1 downto 0);
+
 begin
 
+    -- PERF
+    perf_req <= '1' when PERF_EN and PERF_PERIOD > 0 and unsigned(noc_count) >= perf_next else
+        '0';
+
+    process (clk, rst)
+    begin
+        if rst = RST_LVL then
+            perf_next <= to_unsigned(PERF_PERIOD, perf_next'length);
+        elsif rising_edge(clk) then
+            if perf_ack = '1' then
+                perf_next <= unsigned(noc_count) + PERF_PERIOD;
+            end if;
+        end if;
+    end process;
+
     -- CLK CTRL
     -- inst_clock_halter : entity work.clock_halter_xilinx
     inst_clock_halter : entity work.clock_halter
@@ -96,11 +134,17 @@ begin
 
             i_ub_count_wen => ub_count_wen,
             i_ub_count     => ub_count,
-            o_run_count    => noc_count
+            o_run_count    => noc_count,
+
+            i_inj_blocked => inj_blocked,
+            o_halt_cnt    => halt_cnt
         );
 
     -- SP
     inst_axis_sp_inject : entity work.axis_sp_inject
+        generic map(
+            BURST_MODE => BURST_MODE
+        )
         port map(
             clk => clk,
             rst => rst,
@@ -108,6 +152,8 @@ begin
             i_run     => clkh_run,
             i_ps_halt => ps_halt,
 
+            o_inj_blocked => inj_blocked,
+
             s_axis_tvalid => s_axis_tvalid,
             s_axis_tdata  => s_axis_tdata,
             s_axis_tstrb  => s_axis_tstrb,
@@ -152,7 +198,8 @@ begin
         generic map(
             BUFFER_DEPTH       => max_packet_len,
             ROUTER_CREDIT      => 2,
-            C_AXIS_TDATA_WIDTH => C_AXIS_TDATA_WIDTH
+            C_AXIS_TDATA_WIDTH => C_AXIS_TDATA_WIDTH,
+            PERF_EN            => PERF_EN
         )
         port map(
             clk => clkh,
@@ -168,7 +215,10 @@ begin
             s_axis_tdata_vec  => injects_axis_tdata,
             s_axis_tstrb_vec  => injects_axis_tstrb,
             s_axis_tlast_vec  => injects_axis_tlast,
-            s_axis_tvalid_vec => injects_axis_tvalid
+            s_axis_tvalid_vec => injects_axis_tvalid,
+
+            i_perf_addr => perf_addr,
+            o_perf_data => perf_data
         );
 
     -- HALT PE
@@ -198,6 +248,10 @@ begin
 
     -- PS
     inst_axis_ps_eject : entity work.axis_ps_eject
+        generic map(
+            PERF_NUM => PERF_NUM * Boolean'pos(PERF_EN),
+            HALT_NUM => HALT_NUM * Boolean'pos(HALT_STATS)
+        )
         port map(
             clk => clk,
             rst => rst,
@@ -214,7 +268,14 @@ begin
 
             i_halt      => clk_halt,
             o_halt      => ps_halt,
-            i_noc_count => noc_count
+            i_noc_count => noc_count,
+
+            i_perf_req  => perf_req,
+            o_perf_ack  => perf_ack,
+            o_perf_addr => perf_addr,
+            i_perf_data => perf_data,
+
+            i_halt_cnt => halt_cnt((HALT_NUM * Boolean'pos(HALT_STATS)) * C_AXIS_TDATA_WIDTH - 1 downto 0)
         );
 
 end implementation;
\ No newline at end of file
@@ -1,46 +1,25 @@
 import os
-import sys
-print(sys.argv)
 
+from emunoc.config import load_config
+from emunoc.sweep import pair_jobs, run_sweep
 
 cwd = os.getcwd()
 print(cwd)
 
-combination = ["{} {} {}".format(z, x, y) for x in range(4)
-               for y in range(4) for z in range(1)]
+cfg = load_config()
+dims = (cfg.max_x_dim, cfg.max_y_dim, cfg.max_z_dim)
 
-combination = ["0 0 0", "0 3 3"]
+combination = [(z, y, x) for x in range(cfg.max_x_dim)
+               for y in range(cfg.max_y_dim) for z in range(cfg.max_z_dim)]
 
 sim_num = 1
 
-count = 0
-for i in combination:
-    for j in combination:
-        if i == j:
-            continue
+# every src -> dst pair runs in its own directory under sweep/, in parallel,
+# the routers are passed as generics so all pairs share one build
+jobs = pair_jobs(combination, "traffic_corr_tb",
+                 data_dir="testdata/pic",
+                 generate=["python3 file2data.py {src} {dst}"],
+                 limit=sim_num, dims=dims)
 
-        edit_src_pos = "(" + i.replace(" ", ",") + ")"
-        edit_dst_pos = "(" + j.replace(" ", ",") + ")"
-        print(edit_src_pos, "->", edit_dst_pos)
-        with open("bkp/TESTBENCH_PACKAGE.vhd", "r") as file:
-            data = file.read().replace("$src_pos", edit_src_pos).replace(
-                "$dst_pos", edit_dst_pos)
-            with open("testbench/utils/TESTBENCH_PACKAGE.vhd", "w") as out:
-                out.write(data)
-
-        os.chdir(os.path.join(cwd, "./data/pic"))
-        cmd = "python3 file2data.py {} {}".format(i, j)
-        # print(cmd)
-        os.system(cmd)
-        os.chdir(cwd)
-
-        os.system("make")
-
-        # print("\n\n\n")
-        count += 1
-
-        if count == sim_num:
-            break
-
-    if count == sim_num:
-        break
+summary = run_sweep(jobs, os.path.join(cwd, "sweep"))
+print(summary.to_string())
@@ -26,7 +26,17 @@ use work.NOC_3D_PACKAGE.all;
 use work.TESTBENCH_PACKAGE.all;
 
 entity axis_traffic_corr_tb is
-
+	generic (
+		-- runtime parameters, e.g. ghdl -r axis_traffic_corr_tb -gSRC_ROUTER=0 -gDST_ROUTER=15
+		SRC_ROUTER          : Integer := src_router;
+		DST_ROUTER          : Integer := dst_router;
+		REC_TIME_TEXT       : String  := "testdata/pic/out/receive_time_noc.txt";    -- w
+		REC_DATA_TEXT       : String  := "testdata/pic/out/receive_data_noc.txt";    -- w
+		INJ_TIME_TEXT       : String  := "testdata/pic/in/injection_time.txt";       -- r
+		PACKET_LENGTH_TEXT  : String  := "testdata/pic/in/packet_header_length.txt"; -- r
+		IMAGE_2_FLITS_TEXT  : String  := "testdata/pic/in/data_header.txt";          -- r
+		INJ_TIME_2_NOC_TEXT : String  := "testdata/pic/out/inj_time_2_noc.txt"       -- w
+	);
 end entity;
 
 architecture behave of axis_traffic_corr_tb is
@@ -34,12 +44,16 @@ architecture behave of axis_traffic_corr_tb is
 	constant cnt_flit_width          : Positive := flit_size;
 	constant cnt_router_credit       : Integer  := 2;
 	constant cnt_srl_fifo_depth      : Integer  := 16;
-	constant cnt_rec_time_text       : String   := "testdata/pic/out/receive_time_noc.txt";    -- w
-	constant cnt_rec_data_text       : String   := "testdata/pic/out/receive_data_noc.txt";    -- w
-	constant cnt_inj_time_text       : String   := "testdata/pic/in/injection_time.txt";       -- r
-	constant cnt_packet_length_text  : String   := "testdata/pic/in/packet_header_length.txt"; -- r
-	constant cnt_image_2_flits_text  : String   := "testdata/pic/in/data_header.txt";          -- r
-	constant cnt_inj_time_2_noc_text : String   := "testdata/pic/out/inj_time_2_noc.txt";      -- w
+	constant cnt_rec_time_text       : String   := REC_TIME_TEXT;
+	constant cnt_rec_data_text       : String   := REC_DATA_TEXT;
+	constant cnt_inj_time_text       : String   := INJ_TIME_TEXT;
+	constant cnt_packet_length_text  : String   := PACKET_LENGTH_TEXT;
+	constant cnt_image_2_flits_text  : String   := IMAGE_2_FLITS_TEXT;
+	constant cnt_inj_time_2_noc_text : String   := INJ_TIME_2_NOC_TEXT;
+
+	-- the generics hide the package src_router/dst_router, derive the vc here
+	constant cnt_src_vc : Integer := SRC_ROUTER * max_vc_num;
+	constant cnt_dst_vc : Integer := DST_ROUTER * max_vc_num;
 
 	-------------------------------------------------------------------
 
@@ -105,9 +119,9 @@ begin
 		)
 		port map(
 			-- port to router local input flit
-			o_local_rx          => local_rx(src_router),
-			o_local_vc_write_rx => local_vc_write_rx(src_vc + max_vc_num - 1 downto src_vc),
-			i_local_incr_tx_vec => local_incr_tx_vec(src_vc + max_vc_num - 1 downto src_vc),
+			o_local_rx          => local_rx(SRC_ROUTER),
+			o_local_vc_write_rx => local_vc_write_rx(cnt_src_vc + max_vc_num - 1 downto cnt_src_vc),
+			i_local_incr_tx_vec => local_incr_tx_vec(cnt_src_vc + max_vc_num - 1 downto cnt_src_vc),
 
 			-- External
 			S_AXIS_TADDR => gen_axis_taddr,
@@ -154,9 +168,9 @@ begin
 		)
 		port map(
 			-- NoC router local port
-			i_local_tx          => local_tx(dst_router),
-			i_local_vc_write_tx => local_vc_write_tx(dst_vc + max_vc_num - 1 downto dst_vc),
-			o_local_incr_rx_vec => local_incr_rx_vec(dst_vc + max_vc_num - 1 downto dst_vc),
+			i_local_tx          => local_tx(DST_ROUTER),
+			i_local_vc_write_tx => local_vc_write_tx(cnt_dst_vc + max_vc_num - 1 downto cnt_dst_vc),
+			o_local_incr_rx_vec => local_incr_rx_vec(cnt_dst_vc + max_vc_num - 1 downto cnt_dst_vc),
 
 			-- AXI Stream Master interface
 			M_AXIS_ACLK    => clk,
@@ -25,8 +25,13 @@ use work.NOC_3D_PACKAGE.all;
 
 entity noc_tb is
     generic (
-        RST_LVL    : Std_logic := '0';
-        CLK_PERIOD : Time      := 1 ns
+        RST_LVL      : Std_logic := '0';
+        CLK_PERIOD   : Time      := 1 ns;
+
+        -- stop once all flits are ejected and the streams were idle
+        -- that long, fail if nothing moves that long, 0 disables
+        IDLE_CYCLES  : Natural   := 100;
+        STALL_CYCLES : Natural   := 100000
     );
 end entity;
 
@@ -277,6 +282,32 @@ begin
             );
     end generate;
 
+    monitor : entity work.sim_monitor
+        generic map(
+            C_AXIS_TDATA_WIDTH => C_AXIS_TDATA_WIDTH,
+            EJ_NUM             => NUM_IO,
+            COUNT_FLITS        => true,
+            IDLE_CYCLES        => IDLE_CYCLES,
+            STALL_CYCLES       => STALL_CYCLES,
+            RST_LVL            => RST_LVL
+        )
+        port map(
+            clk => clk,
+            rst => rst,
+
+            s_axis_tvalid => gen_axis_tvalid,
+            s_axis_tdata  => gen_axis_tdata,
+            s_axis_tlast  => gen_axis_tlast,
+            s_axis_tready => gen_axis_tready,
+
+            ej_clk     => clkh,
+            i_ej_valid => local_vc_write_tx,
+
+            o_injected => open,
+            o_ejected  => open,
+            o_cycle    => open
+        );
+
     -- System
     clk <= not(clk) after CLK_PERIOD/2;
 
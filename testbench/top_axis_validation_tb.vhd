@@ -25,8 +25,20 @@ use work.NOC_3D_PACKAGE.all;
 
 entity top_axis_validation_tb is
     generic (
-        RST_LVL    : Std_logic := RST_LVL;
-        CLK_PERIOD : Time      := 1 ns
+        RST_LVL      : Std_logic := RST_LVL;
+        CLK_PERIOD   : Time      := 1 ns;
+        BURST_MODE   : Boolean   := false;
+
+        -- stop once all packets are ejected and the streams were idle
+        -- that long, fail if nothing moves that long, 0 disables
+        IDLE_CYCLES  : Natural   := 100;
+        STALL_CYCLES : Natural   := 100000;
+
+        -- NoC performance counter windows (emunoc.perf)
+        PERF_EN      : Boolean   := false;
+        PERF_PERIOD  : Natural   := 10000;
+        -- clock_halter halt counters (emunoc.halt_report)
+        HALT_STATS   : Boolean   := false
     );
 end entity;
 
@@ -72,6 +84,12 @@ begin
         );
 
     DUT : entity work.top_axis_validation
+        generic map(
+            BURST_MODE  => BURST_MODE,
+            PERF_EN     => PERF_EN,
+            PERF_PERIOD => PERF_PERIOD,
+            HALT_STATS  => HALT_STATS
+        )
         port map(
             clk => clk,
             rst => rst,
@@ -106,6 +124,33 @@ begin
             S_AXIS_TREADY => rec_axis_tready
         );
 
+    monitor : entity work.sim_monitor
+        generic map(
+            C_AXIS_TDATA_WIDTH => C_AXIS_TDATA_WIDTH,
+            BURST_MODE         => BURST_MODE,
+            IDLE_CYCLES        => IDLE_CYCLES,
+            STALL_CYCLES       => STALL_CYCLES,
+            RST_LVL            => RST_LVL
+        )
+        port map(
+            clk => clk,
+            rst => rst,
+
+            s_axis_tvalid => gen_axis_tvalid,
+            s_axis_tdata  => gen_axis_tdata,
+            s_axis_tlast  => gen_axis_tlast,
+            s_axis_tready => gen_axis_tready,
+
+            m_axis_tvalid => rec_axis_tvalid,
+            m_axis_tdata  => rec_axis_tdata,
+            m_axis_tlast  => rec_axis_tlast,
+            m_axis_tready => rec_axis_tready,
+
+            o_injected => open,
+            o_ejected  => open,
+            o_cycle    => open
+        );
+
     -- System
     clk <= not(clk) after CLK_PERIOD/2;
 
@@ -20,7 +20,17 @@ use work.NOC_3D_PACKAGE.all;
 use work.TESTBENCH_PACKAGE.all;
 
 entity traffic_corr_tb is
-
+	generic (
+		-- runtime parameters, e.g. ghdl -r traffic_corr_tb -gSRC_ROUTER=0 -gDST_ROUTER=15
+		SRC_ROUTER          : Integer := src_router;
+		DST_ROUTER          : Integer := dst_router;
+		REC_TIME_TEXT       : String  := "testdata/pic/out/receive_time_noc.txt";    -- w
+		REC_DATA_TEXT       : String  := "testdata/pic/out/receive_data_noc.txt";    -- w
+		INJ_TIME_TEXT       : String  := "testdata/pic/in/injection_time.txt";       -- r
+		PACKET_LENGTH_TEXT  : String  := "testdata/pic/in/packet_header_length.txt"; -- r
+		IMAGE_2_FLITS_TEXT  : String  := "testdata/pic/in/data_header.txt";          -- r
+		INJ_TIME_2_NOC_TEXT : String  := "testdata/pic/out/inj_time_2_noc.txt"       -- w
+	);
 end entity;
 
 architecture behave of traffic_corr_tb is
@@ -28,12 +38,16 @@ architecture behave of traffic_corr_tb is
 	constant cnt_flit_width          : Positive := flit_size;
 	constant cnt_router_credit       : Integer  := 2;
 	constant cnt_srl_fifo_depth      : Integer  := 200;
-	constant cnt_rec_time_text       : String   := "testdata/pic/out/receive_time_noc.txt";    -- w
-	constant cnt_rec_data_text       : String   := "testdata/pic/out/receive_data_noc.txt";    -- w
-	constant cnt_inj_time_text       : String   := "testdata/pic/in/injection_time.txt";       -- r
-	constant cnt_packet_length_text  : String   := "testdata/pic/in/packet_header_length.txt"; -- r
-	constant cnt_image_2_flits_text  : String   := "testdata/pic/in/data_header.txt";          -- r
-	constant cnt_inj_time_2_noc_text : String   := "testdata/pic/out/inj_time_2_noc.txt";      -- w
+	constant cnt_rec_time_text       : String   := REC_TIME_TEXT;
+	constant cnt_rec_data_text       : String   := REC_DATA_TEXT;
+	constant cnt_inj_time_text       : String   := INJ_TIME_TEXT;
+	constant cnt_packet_length_text  : String   := PACKET_LENGTH_TEXT;
+	constant cnt_image_2_flits_text  : String   := IMAGE_2_FLITS_TEXT;
+	constant cnt_inj_time_2_noc_text : String   := INJ_TIME_2_NOC_TEXT;
+
+	-- the generics hide the package src_router/dst_router, derive the vc here
+	constant cnt_src_vc : Integer := SRC_ROUTER * max_vc_num;
+	constant cnt_dst_vc : Integer := DST_ROUTER * max_vc_num;
 
 	-------------------------------------------------------------------
 
@@ -114,9 +128,9 @@ begin
 		port map(
 			clk      => clk,
 			rst      => rst,
-			valid    => local_vc_write_rx(src_vc),
-			incr     => local_incr_tx_vec(src_vc),
-			data_out => local_rx(src_router)
+			valid    => local_vc_write_rx(cnt_src_vc),
+			incr     => local_incr_tx_vec(cnt_src_vc),
+			data_out => local_rx(SRC_ROUTER)
 		);
 
 	full_noc_comp : entity work.full_noc
@@ -140,9 +154,9 @@ begin
 		port map(
 			clk     => clk,
 			rst     => rst,
-			valid   => local_vc_write_tx(dst_vc),
-			incr    => local_incr_rx_vec(dst_vc),
-			data_in => local_tx(dst_router)
+			valid   => local_vc_write_tx(cnt_dst_vc),
+			incr    => local_incr_rx_vec(cnt_dst_vc),
+			data_in => local_tx(DST_ROUTER)
 		);
 
 	-------------------------------------------------------------------
@@ -0,0 +1,262 @@
+------------------------------------------------------------------
+-- COPYRIGHT(c) 2022
+-- INSTITUTE FOR COMMUNICATION TECHNOLOGIES AND EMBEDDED SYSTEMS
+-- RWTH AACHEN
+-- GERMANY
+--
+-- This confidential and proprietary software may be used, copied,
+-- modified, merged, published or distributed according to the
+-- permissions and/or limitations granted by an authorizing license
+-- agreement.
+--
+-- The above copyright notice and this permission notice shall be
+-- included in all copies or substantial portions of the Software.
+--
+-- Author: 1. Tan Yee Yang (tan@ice.rwth-aachen.de)
+--         2. Jan Moritz Joseph (joseph@ice.rwth-aachen.de)
+------------------------------------------------------------------
+
+-- End of simulation detection.
+--
+-- Counts the packets written to axis_sp_inject (header flits with a
+-- non-zero length) and the packets read from axis_ps_eject (the words
+-- between the cycle word and the closing 0). With COUNT_FLITS the length
+-- fields are summed instead and every set bit of i_ej_valid on a rising
+-- edge of ej_clk is one ejected flit, for testbenches without
+-- axis_ps_eject.
+--
+-- Progress is a transfer on either stream or an ejected flit. IDLE_CYCLES
+-- cycles without progress and without a pending input word while nothing
+-- is outstanding end the simulation with std.env.stop, after a report:
+--   sim_monitor: done at cycle <clk cycles> (injected <n>, ejected <n>, last ejection at cycle <c>)
+-- The last ejection is the cycle word of the last axis_ps_eject transfer
+-- (NoC cycle), with COUNT_FLITS the clk cycle. Performance and halt
+-- windows (all ones or all ones but bit 0 first) are not counted. The
+-- run to inf time word (all ones) that ends every trace is never taken by
+-- axis_sp_inject and does not count as pending. STALL_CYCLES cycles
+-- without progress while packets are outstanding fail with "stalled at".
+-- 0 disables either check.
+
+library ieee;
+use ieee.std_logic_1164.all;
+use ieee.std_logic_misc.all;
+use ieee.numeric_std.all;
+
+use work.NOC_3D_PACKAGE.all;
+
+entity sim_monitor is
+    generic (
+        C_AXIS_TDATA_WIDTH : Integer   := flit_size;
+        PACKET_LEN_WIDTH   : Integer   := packet_len_width;
+        EJ_NUM             : Integer   := 1;
+        BURST_MODE         : Boolean   := false;
+        COUNT_FLITS        : Boolean   := false;
+        IDLE_CYCLES        : Natural   := 100;
+        STALL_CYCLES       : Natural   := 100000;
+        RST_LVL            : Std_logic := RST_LVL
+    );
+    port (
+        clk : in Std_logic;
+        rst : in Std_logic;
+
+        -- axis_sp_inject
+        s_axis_tvalid : in Std_logic;
+        s_axis_tdata  : in Std_logic_vector(C_AXIS_TDATA_WIDTH - 1 downto 0);
+        s_axis_tlast  : in Std_logic;
+        s_axis_tready : in Std_logic;
+
+        -- axis_ps_eject
+        m_axis_tvalid : in Std_logic                                         := '0';
+        m_axis_tdata  : in Std_logic_vector(C_AXIS_TDATA_WIDTH - 1 downto 0) := (others => '0');
+        m_axis_tlast  : in Std_logic                                         := '0';
+        m_axis_tready : in Std_logic                                         := '0';
+
+        -- COUNT_FLITS: one flit per set bit
+        ej_clk     : in Std_logic                             := '0';
+        i_ej_valid : in Std_logic_vector(EJ_NUM - 1 downto 0) := (others => '0');
+
+        o_injected : out Natural;
+        o_ejected  : out Natural;
+        o_cycle    : out Natural
+    );
+end entity;
+
+architecture behave of sim_monitor is
+    type t_STATE is (
+        s_TIME,
+        s_COUNT,
+        s_HDR
+    );
+
+    signal state     : t_STATE;
+    signal burst_cnt : Natural;
+    signal ej_first  : Boolean;
+    signal ej_perf   : Boolean;
+
+    signal cycle     : Natural;
+    signal injected  : Natural;
+    signal ej_axis   : Natural;
+    signal ej_flits  : Natural;
+    signal ejected   : Natural;
+    signal last_ej   : Natural;
+    signal ej_seen   : Natural;
+    signal idle_cnt  : Natural;
+    signal stall_cnt : Natural;
+
+begin
+    -- I/O
+    o_injected <= injected;
+    o_ejected  <= ejected;
+    o_cycle    <= cycle;
+
+    ejected <= ej_flits when COUNT_FLITS else
+        ej_axis;
+
+    -- injection: | time | header ... | or | time | count | header ... | ...
+    process (clk, rst)
+        variable len : Natural;
+    begin
+        if rst = RST_LVL then
+            state     <= s_TIME;
+            burst_cnt <= 0;
+            injected  <= 0;
+        elsif rising_edge(clk) then
+            if s_axis_tvalid = '1' and s_axis_tready = '1' then
+                len := to_integer(unsigned(s_axis_tdata(PACKET_LEN_WIDTH - 1 downto 0)));
+
+                case state is
+                    when s_TIME =>
+                        if BURST_MODE then
+                            state <= s_COUNT;
+                        else
+                            state <= s_HDR;
+                        end if;
+
+                    when s_COUNT =>
+                        burst_cnt <= to_integer(unsigned(s_axis_tdata));
+                        if unsigned(s_axis_tdata) = 0 then
+                            state <= s_TIME;
+                        else
+                            state <= s_HDR;
+                        end if;
+
+                    when s_HDR =>
+                        if COUNT_FLITS then
+                            injected <= injected + len;
+                        elsif len > 0 then
+                            injected <= injected + 1;
+                        end if;
+                        if BURST_MODE then
+                            burst_cnt <= burst_cnt - 1;
+                            if burst_cnt = 1 then
+                                state <= s_TIME;
+                            end if;
+                        end if;
+                end case;
+
+                if s_axis_tlast = '1' then
+                    state <= s_TIME;
+                end if;
+            end if;
+        end if;
+    end process;
+
+    -- ejection: | cycle | header ... | 0 (tlast) |
+    process (clk, rst)
+    begin
+        if rst = RST_LVL then
+            ej_first <= true;
+            ej_perf  <= false;
+            ej_axis  <= 0;
+            last_ej  <= 0;
+        elsif rising_edge(clk) then
+            if COUNT_FLITS then
+                if ej_flits /= ej_seen then
+                    last_ej <= cycle;
+                end if;
+            elsif m_axis_tvalid = '1' and m_axis_tready = '1' then
+                if ej_first then
+                    ej_perf <= and_reduce(m_axis_tdata(C_AXIS_TDATA_WIDTH - 1 downto 1)) = '1';
+                    if and_reduce(m_axis_tdata(C_AXIS_TDATA_WIDTH - 1 downto 1)) = '0' then
+                        last_ej <= to_integer(unsigned(m_axis_tdata));
+                    end if;
+                elsif m_axis_tlast = '0' and not ej_perf then
+                    ej_axis <= ej_axis + 1;
+                end if;
+                ej_first <= m_axis_tlast = '1';
+            end if;
+        end if;
+    end process;
+
+    gen_count_flits : if COUNT_FLITS generate
+        process (ej_clk, rst)
+            variable cnt : Natural;
+        begin
+            if rst = RST_LVL then
+                ej_flits <= 0;
+            elsif rising_edge(ej_clk) then
+                cnt := 0;
+                for i in 0 to EJ_NUM - 1 loop
+                    if i_ej_valid(i) = '1' then
+                        cnt := cnt + 1;
+                    end if;
+                end loop;
+                ej_flits <= ej_flits + cnt;
+            end if;
+        end process;
+    end generate;
+
+    gen_no_flits : if not COUNT_FLITS generate
+        ej_flits <= 0;
+    end generate;
+
+    -- end of simulation
+    process (clk, rst)
+        variable progress : Boolean;
+        variable pending  : Boolean;
+        variable busy     : Boolean;
+    begin
+        if rst = RST_LVL then
+            cycle     <= 0;
+            ej_seen   <= 0;
+            idle_cnt  <= 0;
+            stall_cnt <= 0;
+        elsif rising_edge(clk) then
+            cycle   <= cycle + 1;
+            ej_seen <= ej_flits;
+
+            progress := (s_axis_tvalid = '1' and s_axis_tready = '1') or
+                (m_axis_tvalid = '1' and m_axis_tready = '1') or ej_flits /= ej_seen;
+            pending := s_axis_tvalid = '1' and not (state = s_TIME and and_reduce(s_axis_tdata) = '1');
+            busy    := progress or pending;
+
+            if busy then
+                idle_cnt <= 0;
+            else
+                idle_cnt <= idle_cnt + 1;
+            end if;
+
+            if progress then
+                stall_cnt <= 0;
+            else
+                stall_cnt <= stall_cnt + 1;
+            end if;
+
+            if IDLE_CYCLES > 0 and not busy and idle_cnt + 1 >= IDLE_CYCLES and injected = ejected then
+                report "sim_monitor: done at cycle " & Integer'image(cycle) &
+                    " (injected " & Integer'image(injected) &
+                    ", ejected " & Integer'image(ejected) &
+                    ", last ejection at cycle " & Integer'image(last_ej) & ")";
+                std.env.stop;
+            end if;
+
+            assert STALL_CYCLES = 0 or progress or stall_cnt + 1 < STALL_CYCLES or injected = ejected
+            report "sim_monitor: stalled at cycle " & Integer'image(cycle) &
+                " (injected " & Integer'image(injected) &
+                ", ejected " & Integer'image(ejected) &
+                ", last ejection at cycle " & Integer'image(last_ej) & ")"
+                severity failure;
+        end if;
+    end process;
+
+end architecture;
@@ -17,25 +17,16 @@ Author: 1. Tan Yee Yang (tan@ice.rwth-aachen.de)
 """
 
 import os
-import math
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from emunoc.config import load_config  # noqa: E402
+from emunoc.flit_codec import int_to_bin  # noqa: E402
 
 # ----------------------------------------------
 # General function
 
 
-def bit_width(x: int):
-    if x > 1:
-        return math.ceil(math.log2(x))
-    elif x == 1:
-        return 1
-    else:
-        return 0
-
-
-def int_to_bin(val, len):
-    return bin(val)[2:].zfill(len)
-
-
 def to_file(path, str_obj):
     os.makedirs(os.path.dirname(path), exist_ok=True)
     with open(path, "w") as handle:
@@ -44,25 +35,23 @@ def to_file(path, str_obj):
 
 
 # ----------------------------------------------
-# NoC configuration
-max_x_dim = 2  # check noc pkg
-max_y_dim = 2  # check noc pkg
-max_z_dim = 1  # check noc pkg
-
-flit_size = 32  # const
-flit_pkt_width = 5  # check noc pkg
-flit_addr_x_width = bit_width(max_x_dim)
-flit_addr_y_width = bit_width(max_y_dim)
-flit_addr_z_width = bit_width(max_z_dim)
+# NoC configuration, parsed from the VHDL packages
+cfg = load_config()
+max_x_dim = cfg.max_x_dim
+max_y_dim = cfg.max_y_dim
+max_z_dim = cfg.max_z_dim
+
+flit_size = cfg.flit_size
+flit_pkt_width = cfg.flit_pkt_width
 flit_id_width = 8
-flit_pad_width = flit_size - flit_id_width - flit_pkt_width \
-    - 2 * (flit_addr_x_width + flit_addr_y_width + flit_addr_z_width)
+
+codec = cfg.codec(xyz_id_width=flit_id_width)
 
 # Router configuration
-port_num = 5  # check noc pkg
+port_num = cfg.port_num
 
 port_exist = [x for x in range(1, port_num)]
-max_pkt_len = 2**flit_pkt_width - 1
+max_pkt_len = codec.max_pkt_len
 
 # ----------------------------------------------
 # Generated files: same in vhdl
@@ -74,31 +63,9 @@ fname_flit_data = "flit_data.txt"
 # Functions
 
 
-def conv_id_to_coord(router_id):
-    z = router_id // (max_x_dim * max_y_dim)
-    y = router_id % (max_x_dim * max_y_dim) // max_x_dim
-    x = router_id % (max_x_dim * max_y_dim) % max_x_dim
-
-    return {"x": x, "y": y, "z": z}
-
-
 def create_flit_hdr(pad, id, src, dst, pkt_len):
-    src_coord = conv_id_to_coord(src)
-    dst_coord = conv_id_to_coord(dst)
-
-    hdr = ""
-    hdr += int_to_bin(pad, flit_pad_width)
-    hdr += int_to_bin(id, flit_id_width)
-    hdr += int_to_bin(src_coord["z"], flit_addr_z_width)
-    hdr += int_to_bin(src_coord["y"], flit_addr_y_width)
-    hdr += int_to_bin(src_coord["x"], flit_addr_x_width)
-    hdr += int_to_bin(dst_coord["z"], flit_addr_z_width)
-    hdr += int_to_bin(dst_coord["y"], flit_addr_y_width)
-    hdr += int_to_bin(dst_coord["x"], flit_addr_x_width)
-    hdr += int_to_bin(pkt_len, flit_pkt_width)
-
-    assert len(hdr) == flit_size
-    return hdr
+    hdr = codec.pack_xyz(id, src, dst, pkt_len, pad=pad)
+    return int_to_bin(int(hdr), flit_size)
 
 
 if __name__ == "__main__":
@@ -1,8 +1,10 @@
 # Project    : Traffic generator for a NoC
 # -----------------------------------------
 # Description: Convert back the recieved data from the NoC into the initial givnen
-# data for further analysis, line by line comparision of data and publish reports
-# Merge the input data and header flits. The system supports multiple header structure
+# data for further analysis and publish reports. The received flits are grouped by
+# packet id (packets of several VCs may arrive interleaved or out of order), the
+# padding is stripped by the header field and the payload is compared byte by byte
+# and by hash with the source file. The system supports multiple header structure
 # -----------------------------------------
 # File       : data2file.py
 # Author     : Seyed Nima Omidsajedi  <nima@omidsajedi.com>
@@ -19,8 +21,15 @@
 # |              |           |       |       |       |        |        |        |               |
 # -----------------------------------------------------------------------------------------------
 
-import math
 import os
+import sys
+import math
+import hashlib
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from emunoc.config import load_config  # noqa: E402
+from emunoc.flit_codec import bin_to_flits, flits_to_text  # noqa: E402
 
 # *********************************** Define functions
 
@@ -34,32 +43,142 @@ def bit_length(n):
         return math.ceil(math.log(n) / math.log(2))
 
 
-# Define bit conversion
-
-
-def int2binary(w, z):
-    return bin(w)[2:].zfill(z)
-
-
-# Define bit conversion
-
-def binary_str2int(str_input):
-    a = 0
-    for x in range(0, len(str_input)):
-        b = int(str_input[len(str_input) - x - 1]) * int(2 ** x)
-        a += b
-    return a
-
-
-# ****** Define bit to str conversion *******
-
-
-def bits2a(b):
-    return ''.join(chr(int(''.join(x), 2)) for x in zip(*[iter(b)]*8))
+# Define streamed reading
+
+def read_flits(file_name, chunk=1 << 16):
+    """ yields the flits of a text file as uint32 arrays of about chunk lines """
+    with open(file_name, "rb") as f:
+        while True:
+            lines = f.readlines(chunk * (flit_width + 1))
+            if not lines:
+                break
+            yield bin_to_flits(b"".join(lines))
+
+
+# ****** Define packet reassembly *******
+
+
+class Reassembler:
+    """
+    Streaming reassembly of the received flits. A header (equal to the
+    reference header if given, at most reorder_window ids ahead of the
+    highest one so far) opens its packet, data flits go to the open packet (the one whose next reference flits
+    match when several VCs interleave, else the oldest one) and are
+    written to the place of the packet in the preallocated data array.
+    """
+
+    def __init__(self, packet_length, reference=None, reference_header=None):
+        self.packet_length = packet_length
+        self.offset = np.cumsum(packet_length) - packet_length
+        self.data = np.zeros(packet_length.sum(), dtype=np.uint32)
+        self.received = np.zeros(packet_length.size, dtype=np.int64)
+        self.header = np.zeros(packet_length.size, dtype=np.uint64)
+        self.seen = np.zeros(packet_length.size, dtype=bool)
+        self.reference = reference
+        self.reference_header = reference_header
+        self.open = {}  # packet_id -> flits still to come, in arrival order
+        self.carry = np.zeros(0, dtype=np.uint32)
+        self.stray = 0
+        self.order = []
+        self.newest = -1  # highest packet id received
+
+    def headers(self, flits):
+        """ header value starting at every flit and whether it is a valid header """
+        value = np.zeros(flits.size, dtype=np.uint64)
+        for i in range(header_num):
+            value[:flits.size - i] |= flits[i:].astype(np.uint64) << np.uint64(flit_width * i)
+        packet_id = (value >> np.uint64(packet_id_lsb)) & np.uint64((1 << packet_id_width) - 1)
+        length = ((value & np.uint64((1 << packet_length_width) - 1)).astype(np.int64)
+                  - (header_num + int(header_included) - 1))
+        valid = (value & np.uint64(header_fill)) == np.uint64(header_fill)
+        valid &= packet_id < np.uint64(self.packet_length.size)
+        packet_id = np.where(valid, packet_id, 0).astype(np.int64)
+        valid &= length == self.packet_length[packet_id]
+        if self.reference_header is not None:
+            valid &= value == self.reference_header[packet_id]
+        valid[flits.size - header_num + 1:] = False
+        return value, packet_id, valid
+
+    def feed(self, flits, final=False):
+        flits = np.concatenate([self.carry, flits])
+        value, packet_id, valid = self.headers(flits)
+        header_pos = np.flatnonzero(valid)
+        end = flits.size if final else flits.size - header_num + 1
+        i = 0
+        while i < end:
+            pid = int(packet_id[i])
+            if valid[i] and not self.seen[pid] and pid <= self.newest + reorder_window:
+                self.seen[pid] = True
+                self.newest = max(self.newest, pid)
+                self.header[pid] = value[i]
+                self.open[pid] = int(self.packet_length[pid])
+                self.order.append(pid)
+                i += header_num
+            elif not self.open:
+                self.stray += 1
+                i += 1
+            elif len(self.open) == 1:
+                # a single packet in flight: take its flits up to the next header
+                (pid, left), = self.open.items()
+                stop = header_pos[np.searchsorted(header_pos, i, side="right"):]
+                take = min(left, (stop[0] if stop.size else end) - i, end - i)
+                take = max(take, 1)
+                self.put(pid, flits[i:i + take])
+                i += take
+            else:
+                self.put(self.pick(flits, valid, i), flits[i:i + 1])
+                i += 1
+        self.carry = flits[max(i, end):]
+
+    def pick(self, flits, valid, i):
+        """ open packet of flits[i]; equal flits of several packets are told apart by the next ones """
+        if self.reference is None:
+            return next(iter(self.open))
+        match = [pid for pid in self.open if self.expected(pid, 0) == int(flits[i])]
+        for pid in match:
+            if self.follows(flits, valid, i + 1, {pid: 1}, lookahead):
+                return pid
+        return match[0] if match else next(iter(self.open))
+
+    def expected(self, pid, ahead):
+        return int(self.reference[self.offset[pid] + self.received[pid] + ahead])
+
+    def follows(self, flits, valid, i, taken, depth):
+        """ whether the next depth flits fit the open packets after taken flits each """
+        if depth == 0 or i >= flits.size or valid[i]:
+            return True
+        for pid, left in self.open.items():
+            ahead = taken.get(pid, 0)
+            if ahead < left and self.expected(pid, ahead) == int(flits[i]):
+                if self.follows(flits, valid, i + 1, {**taken, pid: ahead + 1}, depth - 1):
+                    return True
+        return False
+
+    def put(self, pid, flits):
+        start = self.offset[pid] + self.received[pid]
+        self.data[start:start + flits.size] = flits
+        self.received[pid] += flits.size
+        self.open[pid] -= flits.size
+        if self.open[pid] == 0:
+            del self.open[pid]
+
+    def payload(self):
+        """ data flits -> bytes, the padding bytes of the last flit of a packet removed """
+        payload = bytearray(self.data.size * flit_bytes)
+        buf = np.frombuffer(payload, dtype=np.uint8)
+        buf[:] = self.data.astype(">u4").view(np.uint8)
+        padding = ((self.header >> np.uint64(flit_padding_lsb)) & np.uint64((1 << int(flit_padding_width)) - 1)).astype(np.int64)
+        padding[~self.seen] = 0
+        keep = np.ones(buf.size, dtype=bool)
+        for pid in np.flatnonzero(padding).tolist():
+            last = (self.offset[pid] + self.packet_length[pid] - 1) * flit_bytes
+            keep[last:last + padding[pid]] = False
+        return buf[keep].tobytes(), padding
 
 
 # *********************************** Generic variables
 
+input_file = "lena.jpg"  # Source file of file2data.py
 output_file = "lena_converted.png"  # Must be the same file type in both files
 output_file_binary = "data_flits_noc.txt"
 output_file_header = "report.txt"  # Header parsing report
@@ -68,41 +187,28 @@ input_data_file_noc = "out/receive_data_noc.txt"  # Received data+header from No
 input_data_file_python = "in/data_header.txt"  # Initial converted data+header from Python
 input_packet_length_file = "in/packet_length.txt"
 header_included = True  # header_included in the packet structure
-max_x_dim = 2  # starting from 1  //  Must be the same in both files
-max_y_dim = 2  # starting from 1  //  Must be the same in both files
-max_z_dim = 1  # starting from 1  //  Must be the same in both files
-flit_width = 32  # Must be the same in both files
-max_packet_len = 31  # (number of flits + header_included) in a packet  //  Must be the same in both files
+# NoC configuration, parsed from the VHDL packages like file2data.py
+cfg = load_config()
+max_x_dim = cfg.max_x_dim
+max_y_dim = cfg.max_y_dim
+max_z_dim = cfg.max_z_dim
+flit_width = cfg.flit_size
+max_packet_len = cfg.max_pkt_len  # (number of flits + header_included) in a packet
+max_mismatch_report = 100  # Mismatching flits and bytes listed in the report
+lookahead = 8  # Flits looked ahead to assign equal flits of interleaved packets
+reorder_window = 64  # Packet ids a header may be ahead of the highest one received
 
 # *********************************** Internal variables
 
 flit_padding_width = flit_width / 16  # Should not be changed
-packet_length_line_counter = 0  # Should not be changed
-f1_line_counter = 0  # Should not be changed
-f2_line_counter = 0  # Should not be changed
-line_counter = 0  # Should not be changed
-data_line_counter = 1  # Should not be changed
-total_packet_length = 0  # Should not be changed
-data2save = ""
-header2save = ""
-header = ""
-mismatch_report = ""
-data_reconversion = []
+flit_bytes = flit_width // 8  # Should not be changed
 
 
 # *******************************************************************************
 # ********************************************************************* Main body
 
-# ******************************************************************
-# *********************************** Header parsing and make report
-
-with open(input_data_file_noc) as f:
-    input_data = f.readlines()
-
-with open(input_packet_length_file) as f:
-    packet_length = f.readlines()
-
-line_num = sum(1 for line in open(input_packet_length_file))
+packet_length = np.loadtxt(input_packet_length_file, dtype=np.int64, ndmin=1)
+line_num = packet_length.size
 x_width = bit_length(max_x_dim)
 y_width = bit_length(max_y_dim)
 z_width = bit_length(max_z_dim)
@@ -111,110 +217,122 @@ packet_id_width = math.ceil(math.log(line_num) / math.log(2))
 
 header_total = int(flit_padding_width + packet_id_width + (2 * z_width) + (2 * y_width) + (2 * x_width) + packet_length_width)
 header_num = math.ceil(header_total / flit_width)
-
-flit_padding_lsb = (flit_width * header_num) - (packet_id_width + (2 * z_width) + (2 * y_width) + (2 * x_width) + packet_length_width)
-flit_padding_msb = (flit_width * header_num) - (int(flit_padding_width) + packet_id_width + (2 * z_width) + (2 * y_width) + (2 * x_width) + packet_length_width)
-
-packet_id_lsb = (flit_width * header_num) - ((2 * z_width) + (2 * y_width) + (2 * x_width) + packet_length_width)
-packet_id_msb = (flit_width * header_num) - (packet_id_width + (2 * z_width) + (2 * y_width) + (2 * x_width) + packet_length_width)
-
-source_add_lsb = (flit_width * header_num) - (z_width + y_width + x_width + packet_length_width)
-source_add_msb = (flit_width * header_num) - ((2 * z_width) + (2 * y_width) + (2 * x_width) + packet_length_width)
-
-dest_add_lsb = (flit_width * header_num) - packet_length_width
-dest_add_msb = (flit_width * header_num) - (z_width + y_width + x_width + packet_length_width)
-
-packet_length_lsb = (flit_width * header_num)
-packet_length_msb = (flit_width * header_num) - packet_length_width
-
-counter = 0
-for y in range(0, line_num):
-    packet_length_temp = packet_length[y]
-    for x in range(total_packet_length, (total_packet_length + int(packet_length_temp))):
-        if x == total_packet_length:
-            for z in range(header_num, 0, -1):
-                header += input_data[x+z-1]
-            header = header.replace("\n", "")
-            counter += 1
-            flit_padding = binary_str2int(header[flit_padding_msb: flit_padding_lsb])
-            packet_id = binary_str2int(header[packet_id_msb: packet_id_lsb])
-            source_add = header[source_add_msb: source_add_lsb]
-            dest_add = header[dest_add_msb: dest_add_lsb]
-            packet_length_header = binary_str2int(header[packet_length_msb: packet_length_lsb]) - (header_num + int(header_included) - 1)
-            header2save += "Flit Padding (Byte): " + str(flit_padding).ljust(10) + "| " + "Packet ID: " + \
-                           str(packet_id).ljust(10) + "| " + "Source add (ZYX): " + str(source_add).ljust(15) + "| " + \
-                           "Dest add (ZYX): " + str(dest_add).ljust(15) + "| " + "Packet length: " + \
-                           str(packet_length_header).ljust(10) + "| " + "Header: " + header + "\n"
-            header = ""
-        elif (x > total_packet_length + header_num - 1) and (x < ((total_packet_length + int(packet_length_temp)) - 1)):
-            data2save += str(input_data[x])
-        elif x == (total_packet_length + int(packet_length_temp)) - 1:
-            last_line = input_data[x]
-            data2save += str(last_line[(flit_padding * 8): len(last_line) - 1]) + "\n"
-
-    total_packet_length += int(packet_length_temp)
-
-if os.path.exists(output_file_header):
-    os.remove(output_file_header)
-
-f = open(output_file_header, 'w')
-f.write(header2save)
-f.close()
-
-if os.path.exists(output_file_binary):
-    os.remove(output_file_binary)
-
-f = open(output_file_binary, 'w')
-f.write(data2save)
-f.close()
+header_bits = header_total + (packet_id_width == 0)  # a single packet still has a 1-bit id
+header_span = flit_width * header_num if header_bits > flit_width else flit_width
+assert header_bits <= header_span <= 64, "header of {} bits is not supported".format(header_bits)
+
+# field positions from the LSB
+address_width = z_width + y_width + x_width
+dest_add_lsb = packet_length_width
+source_add_lsb = dest_add_lsb + address_width
+packet_id_lsb = source_add_lsb + address_width
+flit_padding_lsb = header_bits - int(flit_padding_width)
+packet_id_width = flit_padding_lsb - packet_id_lsb
+header_fill = ((1 << header_span) - 1) ^ ((1 << header_bits) - 1)  # rjust with '1'
+
+# reference flits of every packet, for interleaved packets and the flit comparison
+reference = None
+reference_header = None
+if os.path.exists(input_data_file_python):
+    python_flits = np.concatenate(list(read_flits(input_data_file_python)) or [np.zeros(0, np.uint32)])
+    is_data = np.ones(python_flits.size, dtype=bool)
+    packet_start = np.cumsum(packet_length + header_num) - (packet_length + header_num)
+    for i in range(header_num):
+        is_data[packet_start[packet_start + i < python_flits.size] + i] = False
+    reference = python_flits[is_data]
+    if reference.size == packet_length.sum():
+        reference_header = np.zeros(line_num, dtype=np.uint64)
+        for i in range(header_num):
+            reference_header |= python_flits[packet_start + i].astype(np.uint64) << np.uint64(flit_width * i)
+    else:
+        reference = None
 
 # ******************************************************************
-# ************************************************ Data Reconversion
+# *********************************** Header parsing and make report
+
+reassembler = Reassembler(packet_length, reference, reference_header)
+for flits in read_flits(input_data_file_noc):
+    reassembler.feed(flits)
+reassembler.feed(np.zeros(0, dtype=np.uint32), final=True)
 
-input_file_2 = open(output_file_binary, 'r')
-lines = input_file_2.read()
+header2save = []
+for pid in reassembler.order:
+    header = format(int(reassembler.header[pid]), "0{}b".format(header_span))
+    header2save.append(
+        "Flit Padding (Byte): " + str(int(header[-header_bits:][:int(flit_padding_width)], 2)).ljust(10) + "| " +
+        "Packet ID: " + str(pid).ljust(10) + "| " +
+        "Source add (ZYX): " + header[header_span - source_add_lsb - address_width: header_span - source_add_lsb].ljust(15) + "| " +
+        "Dest add (ZYX): " + header[header_span - dest_add_lsb - address_width: header_span - dest_add_lsb].ljust(15) + "| " +
+        "Packet length: " + str(int(packet_length[pid])).ljust(10) + "| " + "Header: " + header + "\n")
 
-myList = [item for item in lines.split('\n')]
-newString = ''.join(myList)
+with open(output_file_header, 'w') as f:
+    f.write("".join(header2save))
+
+# ******************************************************************
+# ************************************************ Data Reconversion
 
-for i in range(0, len(newString), 8):
-    a = binary_str2int(newString[i:i+8])
-    data_reconversion.extend([a])
-data_reconversion_bytes = bytes(data_reconversion)
+payload, padding = reassembler.payload()
 
-if os.path.exists(output_file):
-    os.remove(output_file)
+with open(output_file, 'wb') as f:
+    f.write(payload)
 
-f = open(output_file, 'wb')
-f.write(data_reconversion_bytes)
-f.close()
+data = np.frombuffer(payload, dtype=np.uint8)
+full = data.size // flit_bytes * flit_bytes
+with open(output_file_binary, 'w') as f:
+    if full:
+        f.write(flits_to_text(data[:full].view(">u4")) + "\n")
+    if data.size > full:
+        f.write("".join(np.unpackbits(data[full:]).astype(str)) + "\n")
 
 # ******************************************************************
-# *************************** Compare line by line - Mismatch report
-
-f1 = open(input_data_file_noc, "r")
-f2 = open(input_data_file_python, "r")
-for line1 in f1:
-    f1_line_counter += 1
-    for line2 in f2:
-        f2_line_counter += 1
-        if line1 != line2:
-            mismatch_report += "Data mismatch at flit: " + str(f1_line_counter) + "\n"
-            mismatch_report += "Input data flit from NoC:    " + str(line1)
-            mismatch_report += "Input data flit from Python: " + str(line2)
-            mismatch_report += "----------------------------------------------------------------------" + "\n"
-        break
-
-if mismatch_report == "":
-    mismatch_report = "No mismatch in data!"
-if f1_line_counter != f2_line_counter:
-    print("Data line counter mismatch!")
-f1.close()
-f2.close()
-
-if os.path.exists(output_file_mismatch_report):
-    os.remove(output_file_mismatch_report)
-
-f = open(output_file_mismatch_report, 'w')
-f.write(mismatch_report)
-f.close()
+# ******************************************* Compare - Mismatch report
+
+mismatch_report = []
+missing = np.flatnonzero(~reassembler.seen)
+incomplete = np.flatnonzero(reassembler.seen & (reassembler.received < packet_length))
+if missing.size:
+    mismatch_report.append("Missing packets: {} {}\n".format(missing.size, missing[:max_mismatch_report].tolist()))
+if incomplete.size:
+    mismatch_report.append("Incomplete packets: {} {}\n".format(incomplete.size, incomplete[:max_mismatch_report].tolist()))
+if reassembler.stray:
+    mismatch_report.append("Flits outside of a packet: {}\n".format(reassembler.stray))
+
+if reference is not None:
+    bad = np.flatnonzero(reassembler.data != reference)
+    packet_id = np.searchsorted(reassembler.offset, bad, side="right") - 1
+    for flit, pid in zip(bad[:max_mismatch_report].tolist(), packet_id.tolist()):
+        mismatch_report.append("Data mismatch at packet {} flit {}\n".format(pid, flit - reassembler.offset[pid]))
+        mismatch_report.append("Input data flit from NoC:    " + format(int(reassembler.data[flit]), "032b") + "\n")
+        mismatch_report.append("Input data flit from Python: " + format(int(reference[flit]), "032b") + "\n")
+        mismatch_report.append("----------------------------------------------------------------------" + "\n")
+    if bad.size:
+        mismatch_report.append("Mismatching data flits: {}\n".format(bad.size))
+
+if os.path.exists(input_file):
+    source = np.fromfile(input_file, dtype=np.uint8)
+    source_hash = hashlib.sha256(source.tobytes()).hexdigest()
+    payload_hash = hashlib.sha256(payload).hexdigest()
+    if source_hash != payload_hash:
+        common = min(source.size, data.size)
+        bad = np.flatnonzero(source[:common] != data[:common])
+        mismatch_report.append("Payload size: {} bytes, source size: {} bytes\n".format(data.size, source.size))
+        mismatch_report.append("Mismatching bytes: {} first at {}\n".format(bad.size, bad[:max_mismatch_report].tolist()))
+        mismatch_report.append("sha256 payload: {}\nsha256 source:  {}\n".format(payload_hash, source_hash))
+
+if not mismatch_report:
+    mismatch_report = ["No mismatch in data!"]
+
+with open(output_file_mismatch_report, 'w') as f:
+    f.write("".join(mismatch_report))
+
+# Reports
+
+print("******************************")
+print("Number of packets: %i / %i" % (reassembler.seen.sum(), line_num))
+print("******************************")
+print("Number of data flits: %i / %i" % (reassembler.received.sum(), packet_length.sum()))
+print("******************************")
+print("Payload bytes: %i" % len(payload))
+print("******************************")
+print(mismatch_report[0].rstrip())
+sys.exit(mismatch_report[0] != "No mismatch in data!")
@@ -23,18 +23,14 @@
 import os
 import sys
 import math
-import random
 import numpy as np
-from PIL import Image
+# from PIL import Image  # Enable when Greyscale image is needed
 
-# *********************************** Define functions
-
-
-# Define flit division
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from emunoc.config import load_config  # noqa: E402
+from emunoc.flit_codec import flits_to_text  # noqa: E402
 
-def data2flit(s, n):
-    for start in range(0, len(s), n):
-        yield s[start:start+n]
+# *********************************** Define functions
 
 
 # Define bit conversion
@@ -47,11 +43,22 @@ def bit_length(n):
         return math.ceil(math.log(n) / math.log(2))
 
 
-# Define bit conversion
+# Define flit packing
 
+def bytes2flits(data, flit_width):
+    """ uint8 buffer -> (full flits as uint32, bits of the short last line) """
+    flit_bytes = flit_width // 8
+    full = data.size // flit_bytes * flit_bytes
+    flits = data[:full].view(">u{}".format(flit_bytes)).astype(np.uint32)
+    tail = "".join(np.unpackbits(data[full:]).astype(str))
+    return flits, tail
 
-def int2binary(w, z):
-    return bin(w)[2:].zfill(z)
+
+# Define streamed writing
+
+def write_flits(handle, flits, chunk=1 << 16):
+    for start in range(0, flits.size, chunk):
+        handle.write(flits_to_text(flits[start:start + chunk]) + "\n")
 
 
 # *********************************** Generic variables
@@ -64,18 +71,23 @@ output_inj_time_file = "in/injection_time.txt"  # Injection time in C.C
 output_data_header_file = "in/data_header.txt"
 output_packet_header_length = "in/packet_header_length.txt"
 header_included = True  # header_included in the packet structure
-max_x_dim = 2  # starting from 1 //  Must be the same in both files + VHDL files
-max_y_dim = 1  # starting from 1 //  Must be the same in both files + VHDL files
-max_z_dim = 1  # starting from 1 //  Must be the same in both files + VHDL files
-flit_width = 32  # Must be the same in both files + VHDL files
-# (number of flits + header_included) in a packet //  Must be the same in both files + VHDL files
-max_packet_len = 31
-# src_address = (int(sys.argv[1]), int(sys.argv[2]), int(
-#     sys.argv[3]))  # Z Y X  //   starting from 0
-# dest_address = (int(sys.argv[4]), int(sys.argv[5]), int(
-#     sys.argv[6]))  # Z Y X   //  starting from 0
-src_address = (0, 0, 0)
-dest_address = (0, 0, 1)
+# NoC configuration, parsed from the VHDL packages like data2file.py
+cfg = load_config()
+max_x_dim = cfg.max_x_dim
+max_y_dim = cfg.max_y_dim
+max_z_dim = cfg.max_z_dim
+flit_width = cfg.flit_size
+# (number of flits + header_included) in a packet
+max_packet_len = cfg.max_pkt_len
+# python3 file2data.py [Z Y X Z Y X], src then dest position, as emunoc.sweep passes them
+if len(sys.argv) == 7:
+    src_address = tuple(int(x) for x in sys.argv[1:4])  # Z Y X  //   starting from 0
+    dest_address = tuple(int(x) for x in sys.argv[4:7])  # Z Y X   //  starting from 0
+elif len(sys.argv) == 1:
+    src_address = cfg.src_pos
+    dest_address = cfg.dst_pos
+else:
+    sys.exit('usage: file2data.py [SRC_Z SRC_Y SRC_X DST_Z DST_Y DST_X]')
 lower_range_packet_length = 1  # Lower range of packet_length for random function
 upper_range_packet_length = 30  # Upper range of packet_length for random function
 mu, sigma = 0, 0  # Mean and Standard deviation for the injection time
@@ -86,23 +98,7 @@ print("dimension", max_x_dim, max_y_dim, max_z_dim)
 
 # *********************************** Internal variables
 
-data_flits = ""
-data_save = ""
-packet_num = 0  # Should not be changed
-packet_line_counter = 0  # Should not be changed
-final_inj_time = 0  # Should not be changed
-data_packet_length = ""
-data_inj_time = ""
 flit_padding_width = flit_width / 16  # Should not be changed
-packet_length_line_counter = 0  # Should not be changed
-packet_header_length = 0  # Should not be changed
-packet_id = 0  # Should not be changed
-data_line_counter = 0  # Should not be changed
-header = []
-header_temp = ""
-data2save = ""
-packet_header2save = ""
-flit_padding_bin = ""
 
 # *******************************************************************************
 # ********************************************************************* Main body
@@ -124,77 +120,54 @@ rmv_list = [
     output_packet_header_length,
 ]
 [os.remove(x) for x in rmv_list if os.path.exists(x)]
+os.makedirs(os.path.dirname(output_file), exist_ok=True)
 
 
 # ******************************************************************
 # ************************************************** Data Conversion
 """ generate data_flits.txt, which convert the whole img into binaries flits """
 
-# input_data = open(output_greyscale_file, 'rb')  # Enable when Greyscale image is needed
-input_data = open(input_file, 'rb')  # Disable when Greyscale image is used
-my_data = list(input_data.read())
-final_Data = np.array(my_data).astype('uint8')
-data_bin = [np.binary_repr(np.array(final_Data)[i], 8)
-            for i in range(len(final_Data))]
-
-print(len(my_data), my_data[:5])
-print(len(final_Data), final_Data)
-print(len(data_bin), data_bin[:5], len(data_bin[0]))
-
-for i in range(len(data_bin)):
-    data_flits += str(data_bin[i])
-
-for j in data2flit(data_flits, flit_width):
-    data_save += str(j) + "\n"
+# final_Data = np.fromfile(output_greyscale_file, dtype=np.uint8)  # Enable when Greyscale image is needed
+final_Data = np.fromfile(input_file, dtype=np.uint8)  # Disable when Greyscale image is used
+if final_Data.size == 0:
+    sys.exit('Fatal error: the input file is empty!')
+flits, tail = bytes2flits(final_Data, flit_width)
 
+print(len(final_Data), final_Data[:5])
 
 with open(output_file, "w") as handle:
-    handle.write(data_save)
-    handle.close()
+    write_flits(handle, flits)
+    if tail:
+        handle.write(tail + "\n")
 
 
 # ******************************************************************
 # ******************************************************** Data info
 
 # Determine packet length
-line_num = sum(1 for line in open(output_file))
+line_num = flits.size + bool(tail)
 print("line_num", line_num)
 
+# draw enough lengths to cover every line, the first one reaching line_num is cut
+draws = np.random.randint(lower_range_packet_length, upper_range_packet_length + 1,
+                          line_num // lower_range_packet_length + 1)
+packet_line_counter = int(np.searchsorted(np.cumsum(draws), line_num)) + 1
+packet_length = draws[:packet_line_counter].astype(np.int64)
+packet_length[-1] = line_num - packet_length[:-1].sum()
 
-while packet_num <= line_num:
-    packet_length_temp = random.randint(
-        lower_range_packet_length, upper_range_packet_length)
-
-    if packet_num + packet_length_temp < line_num:
-        packet_num = packet_length_temp + packet_num
-        packet_line_counter += 1
-        data_packet_length += str(packet_length_temp) + "\n"
-    else:
-        packet_length_temp = line_num - packet_num
-        data_packet_length += str(packet_length_temp)
-        packet_line_counter += 1
-        break
-
-
-f = open(output_packet_length_file, 'w')
-f.write(data_packet_length)
-f.close()
+with open(output_packet_length_file, 'w') as f:
+    f.write("\n".join(packet_length.astype(str)))
 
 
 ################################################################
 # Data injection time
 
-for inj_time in range(packet_line_counter):
-    random_inj_time = abs(round(np.random.normal(mu, sigma)))
-    if random_inj_time < lower_range_packet_length:
-        random_inj_time = random_inj_time + lower_range_packet_length + 1
-    final_inj_time = final_inj_time + random_inj_time
-    data_inj_time += str(final_inj_time) + "\n"
+random_inj_time = np.abs(np.round(np.random.normal(mu, sigma, packet_line_counter))).astype(np.int64)
+random_inj_time[random_inj_time < lower_range_packet_length] += lower_range_packet_length + 1
+final_inj_time = np.cumsum(random_inj_time)
 
-
-g = open(output_inj_time_file, 'w')
-g.write(str(data_inj_time))
-g.close()
+with open(output_inj_time_file, 'w') as g:
+    g.write("".join(s + "\n" for s in final_inj_time.astype(str)))
 
 # ******************************************************************
 # ************************************************* Data_header_info
@@ -224,92 +197,62 @@ print("header_num", header_num)
 ######################
 
 if (src_address[2] >= max_x_dim) | (dest_address[2] >= max_x_dim):
-    sys.exit('Fatal error: the router address exceeded the maximum router number (z)!')
+    sys.exit('Fatal error: the router address exceeded the maximum router number (x)!')
 if (src_address[1] >= max_y_dim) | (dest_address[1] >= max_y_dim):
     sys.exit('Fatal error: the router address exceeded the maximum router number (y)!')
 if (src_address[0] >= max_z_dim) | (dest_address[0] >= max_z_dim):
-    sys.exit('Fatal error: the router address exceeded the maximum router number (x)!')
+    sys.exit('Fatal error: the router address exceeded the maximum router number (z)!')
 if upper_range_packet_length + header_num > max_packet_len:
     sys.exit(
         'Fatal error: the entered packet length exceeded the maximum "packet + header" number!')
+if packet_length.max() > max_packet_len:
+    sys.exit('Fatal error: the packet_length exceeded the maximum legal number!')
 
 #######################
 
-with open(output_file) as f:
-    input_data = f.readlines()
-
-input_data_line_num = sum(1 for line in open(output_file))
-last_line_data = input_data[input_data_line_num - 1]
-
-with open(output_packet_length_file) as f:
-    packet_length = f.readlines()
-
-for x in range(0, len(packet_length)):
-
-    if x < len(packet_length) - 1:
-        flit_padding = 0
-    elif x == len(packet_length) - 1:
-        flit_padding_bit = flit_width - len(last_line_data) + 1
-        flit_padding = flit_padding_bit / 8
-
-    header_flit = int2binary(int(flit_padding), int(flit_padding_width)) + \
-        int2binary(packet_id, packet_id_width) + \
-        int2binary(src_address[0], z_width) + \
-        int2binary(src_address[1], y_width) + \
-        int2binary(src_address[2], x_width) + \
-        int2binary(dest_address[0], z_width) + \
-        int2binary(dest_address[1], y_width) + \
-        int2binary(dest_address[2], x_width) + \
-        int2binary(int(packet_length[packet_length_line_counter]) +
-                   int(header_included) + header_num - 1, packet_length_width)
-
-    packet_id = packet_id + 1
-    packet_length_line_counter = packet_length_line_counter + 1
-    packet_header_length = int(packet_length[x]) + header_num
-    packet_header2save += str(packet_header_length) + "\n"
-
-    if len(header_flit) > flit_width:
-        header_flit = header_flit.rjust(flit_width*header_num, '1')
-        header_temp = header_flit[(header_num - 1)
-                                  * flit_width: len(header_flit)]
-        data2save += header_temp + "\n"
-        for i in range(header_num-1, 0, -1):
-            header_temp = header_flit[flit_width * (i-1): flit_width * i]
-            data2save += header_temp + "\n"
-    else:
-        header_flit = header_flit.rjust(flit_width, '1')
-        data2save += header_flit + "\n"
-
-    if int(packet_length[x]) > max_packet_len:
-        sys.exit('Fatal error: the packet_length exceeded the maximum legal number!')
-
-    for y in range(0, int(packet_length[x])):
-        if y % int(packet_length[x]) == (int(packet_length[x]) - 1):
-            data2save += str(input_data[data_line_counter].rjust(flit_width + 1, '1'))
-        else:
-            data2save += str(input_data[data_line_counter])
-        data_line_counter = data_line_counter + 1
-
-    # print(packet_id, packet_id_width)
-    # print(src_address)
-    # print(dest_address)
-    # print(packet_length[packet_length_line_counter])
-    # print(int2binary(int(packet_length[packet_length_line_counter]) +
-    #                  int(header_included) + header_num - 1, packet_length_width))
-    # print(header_flit)
-
-    # if x == 4:
-    #     exit(0)
-
-
-f = open(output_data_header_file, 'w')
-f.write(data2save)
-f.close()
-
-
-f = open(output_packet_header_length, 'w')
-f.write(packet_header2save)
-f.close()
+# all headers at once, fields MSB first; a single packet still gets a 1-bit id
+flit_padding = np.zeros(packet_line_counter, dtype=np.uint64)
+flit_padding[-1] = (flit_width - len(tail)) // 8 if tail else 0
+fields = [
+    (flit_padding, int(flit_padding_width)),
+    (np.arange(packet_line_counter, dtype=np.uint64), max(packet_id_width, 1)),
+    (src_address[0], z_width),
+    (src_address[1], y_width),
+    (src_address[2], x_width),
+    (dest_address[0], z_width),
+    (dest_address[1], y_width),
+    (dest_address[2], x_width),
+    (packet_length + int(header_included) + header_num - 1, packet_length_width),
+]
+header_bits = sum(width for _, width in fields)
+header_span = flit_width * header_num if header_bits > flit_width else flit_width
+assert header_bits <= header_span <= 64, "header of {} bits is not supported".format(header_bits)
+
+header_flit = np.zeros(packet_line_counter, dtype=np.uint64)
+for value, width in fields:
+    header_flit = (header_flit << np.uint64(width)) | np.asarray(value, dtype=np.uint64)
+header_flit |= np.uint64(((1 << header_span) - 1) ^ ((1 << header_bits) - 1))  # rjust with '1'
+
+# least significant header flit first, then the data flits of the packet
+packet_header_length = packet_length + header_num
+packet_start = np.cumsum(packet_header_length) - packet_header_length
+data_header = np.empty(packet_header_length.sum(), dtype=np.uint32)
+is_data = np.ones(data_header.size, dtype=bool)
+for i in range(header_num):
+    data_header[packet_start + i] = (header_flit >> np.uint64(flit_width * i)) & np.uint64(0xFFFFFFFF)
+    is_data[packet_start + i] = False
+data_flits = flits
+if tail:
+    # the short last line is padded with '1' like a header
+    last = (0xFFFFFFFF << len(tail) & 0xFFFFFFFF) | int(tail, 2)
+    data_flits = np.append(flits, np.uint32(last))
+data_header[is_data] = data_flits
+
+with open(output_data_header_file, 'w') as f:
+    write_flits(f, data_header)
+
+with open(output_packet_header_length, 'w') as f:
+    f.write("".join(s + "\n" for s in packet_header_length.astype(str)))
 
 
 # Reports
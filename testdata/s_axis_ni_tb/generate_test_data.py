@@ -17,24 +17,17 @@ Author: 1. Tan Yee Yang (tan@ice.rwth-aachen.de)
 """
 
 import os
-import math
-
-# ----------------------------------------------
-# General function
+import sys
 
+import numpy as np
 
-def bit_width(val: int):
-    if val > 1:
-        return math.ceil(math.log2(val))
-    elif val == 1:
-        return 1
-    else:
-        return 0
-    return len(bin(val))-2
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from emunoc.config import load_config  # noqa: E402
+from emunoc.flit_codec import int_to_bin, flits_to_bin  # noqa: E402
+from emunoc.trace_writer import TraceWriter  # noqa: E402
 
-
-def int_to_bin(val, len):
-    return bin(val)[2:].zfill(len)
+# ----------------------------------------------
+# General function
 
 
 def to_file(path, str_obj):
@@ -45,25 +38,23 @@ def to_file(path, str_obj):
 
 
 # ----------------------------------------------
-# NoC configuration
-max_x_dim = 2  # check noc pkg
-max_y_dim = 2  # check noc pkg
-max_z_dim = 1  # check noc pkg
-
-flit_size = 32  # const
-flit_pkt_width = 5  # check noc pkg
-flit_addr_x_width = bit_width(max_x_dim)
-flit_addr_y_width = bit_width(max_y_dim)
-flit_addr_z_width = bit_width(max_z_dim)
+# NoC configuration, parsed from the VHDL packages
+cfg = load_config()
+max_x_dim = cfg.max_x_dim
+max_y_dim = cfg.max_y_dim
+max_z_dim = cfg.max_z_dim
+
+flit_size = cfg.flit_size
+flit_pkt_width = cfg.flit_pkt_width
 flit_id_width = 8
-flit_pad_width = flit_size - flit_id_width - flit_pkt_width \
-    - 2 * (flit_addr_x_width + flit_addr_y_width + flit_addr_z_width)
+
+codec = cfg.codec(xyz_id_width=flit_id_width)
 
 # Router configuration
-port_num = 5  # check noc pkg
+port_num = cfg.port_num
 
 port_exist = [x for x in range(1, port_num)]
-max_pkt_len = 2**flit_pkt_width - 1
+max_pkt_len = codec.max_pkt_len
 
 # ----------------------------------------------
 # Generated files: same in vhdl
@@ -75,74 +66,24 @@ fname_flit_data = "flit_data.txt"
 # Functions
 
 
-def conv_id_to_coord(router_id: int):
-    z = router_id // (max_x_dim * max_y_dim)
-    y = router_id % (max_x_dim * max_y_dim) // max_x_dim
-    x = router_id % (max_x_dim * max_y_dim) % max_x_dim
-
-    return {"x": x, "y": y, "z": z}
-
-
 def create_flit_hdr(pad, id, src, dst, pkt_len):
-    src_coord = conv_id_to_coord(src)
-    dst_coord = conv_id_to_coord(dst)
-
-    hdr = ""
-    hdr += int_to_bin(pad, flit_pad_width)
-    hdr += int_to_bin(id, flit_id_width)
-    hdr += int_to_bin(src_coord["z"], flit_addr_z_width)
-    hdr += int_to_bin(src_coord["y"], flit_addr_y_width)
-    hdr += int_to_bin(src_coord["x"], flit_addr_x_width)
-    hdr += int_to_bin(dst_coord["z"], flit_addr_z_width)
-    hdr += int_to_bin(dst_coord["y"], flit_addr_y_width)
-    hdr += int_to_bin(dst_coord["x"], flit_addr_x_width)
-    hdr += int_to_bin(pkt_len, flit_pkt_width)
-
-    assert len(hdr) == flit_size
-    return hdr
+    hdr = codec.pack_xyz(id, src, dst, pkt_len, pad=pad)
+    return int_to_bin(int(hdr), flit_size)
 
 
 def create_sim_data(start_time: int, pkt_len: int, src: int, dst: int, pad=0):
     ret = {}
-    ret["flit_data"] = [create_flit_hdr(pad, id=itr,
-                                        src=src, dst=dst,
-                                        pkt_len=pkt_len) for itr in range(pkt_len)]
+    ret["flit_data"] = flits_to_bin(codec.pack_xyz(
+        np.arange(pkt_len), src, dst, pkt_len, pad=pad))
     ret["inj_time"] = [start_time]
     ret["pkt_len"] = [pkt_len]
 
     return ret
 
 
-class TestData(dict):
-    def __init__(self):
-        self["flit_data"] = []
-        self["inj_time"] = []
-        self["pkt_len"] = []
-
-    def add(self, data: dict):
-        self["flit_data"].extend(data["flit_data"])
-        self["inj_time"].extend(data["inj_time"])
-        self["pkt_len"].extend(data["pkt_len"])
-
-    def to_txt(self, path="."):
-        path_flit_data = os.path.join(path, "flit_data.txt")
-        path_inj_time = os.path.join(path, "inj_time.txt")
-        path_pkt_len = os.path.join(path, "pkt_len.txt")
-
-        with open(path_flit_data, "w") as handle:
-            handle.write("\n".join(self["flit_data"]))
-            handle.close()
-        with open(path_inj_time, "w") as handle:
-            handle.write("\n".join(map(str, self["inj_time"])))
-            handle.close()
-        with open(path_pkt_len, "w") as handle:
-            handle.write("\n".join(map(str, self["pkt_len"])))
-            handle.close()
-
-
 if __name__ == "__main__":
 
-    td = TestData()
+    td = TraceWriter("in")
 
     # single test for long packet
     td.add(create_sim_data(start_time=0,
@@ -161,4 +102,4 @@ if __name__ == "__main__":
         td.add(create_sim_data(start_time=400,
                                pkt_len=1, src=0, dst=1))
 
-    td.to_txt("in")
+    td.close()
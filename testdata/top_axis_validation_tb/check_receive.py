@@ -16,31 +16,19 @@ Author: 1. Tan Yee Yang (tan@ice.rwth-aachen.de)
         2. Jan Moritz Joseph (joseph@ice.rwth-aachen.de)
 """
 
-from os import terminal_size
 import os
-import math
-import pandas as pd
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from emunoc import analysis  # noqa: E402
+from emunoc.config import load_config  # noqa: E402
+from emunoc.flit_codec import int_to_bin  # noqa: E402
+from emunoc.trace_file import load_trace  # noqa: E402
 
 # ----------------------------------------------
 # General function
 
 
-def bit_width(val: int):
-    if val > 1:
-        return math.ceil(math.log2(val))
-    elif val == 1:
-        return 1
-    else:
-        return 0
-    return len(bin(val))-2
-
-
-def int_to_bin(val, length):
-    ret = bin(val)[2:].zfill(length)
-    assert length == len(ret), "length={} len(ret)={}".format(length, len(ret))
-    return ret
-
-
 def to_file(path, str_obj):
     os.makedirs(os.path.dirname(path), exist_ok=True)
     with open(path, "w") as handle:
@@ -55,72 +43,40 @@ def read_file(fname):
 
 
 # ----------------------------------------------
-# NoC configuration
-max_x_dim = 4  # check noc pkg
-max_y_dim = 4  # check noc pkg
-max_z_dim = 1  # check noc pkg
-
-num_pe = max_x_dim * max_y_dim * max_z_dim
+# NoC configuration, parsed from the VHDL packages
+cfg = load_config()
+max_x_dim = cfg.max_x_dim
+max_y_dim = cfg.max_y_dim
+max_z_dim = cfg.max_z_dim
 
-flit_size = 32  # const
-flit_pkt_width = 5  # check noc pkg
-pe_bit_width = bit_width(num_pe)
-flit_id_bit_width = flit_size - flit_pkt_width - 2*pe_bit_width
+flit_size = cfg.flit_size
+flit_pkt_width = cfg.flit_pkt_width
 
-max_pkt_len = 2**flit_pkt_width - 1
+codec = cfg.codec()
+num_pe = codec.num_pe
 # ----------------------------------------------
 
 
-def bin_to_info(binaries):
-    assert (len(binaries) == flit_size), len(binaries)
-    offset = 0
-    pkt_id = int(binaries[:flit_id_bit_width], 2)
-    offset = offset + flit_id_bit_width
-    src = int(binaries[offset:offset+pe_bit_width], 2)
-    offset = offset + pe_bit_width
-    dst = int(binaries[offset:offset+pe_bit_width], 2)
-    offset = offset+pe_bit_width
-    dlen = int(binaries[offset:], 2)
-
-    return {"id": pkt_id, "src": src, "dst": dst, "len": dlen}
-
-
 if __name__ == "__main__":
 
-    inj_pkts = [x for x in read_file(
-        "in/flit_data.txt").split()]
-    ej_time_data = [x for x in read_file(
-        "out/recv_flit.txt").split()]
-
-    inj_pkts = set(inj_pkts) - set(["1"*flit_size, "0"*flit_size])
-
-    ej_pkts = set()
-    ej_time_pkts = {}
-    time = 0
-    prev = "0"*flit_size
-    for elem in ej_time_data:
-        if prev == "0"*flit_size:
-            time = int(elem, 2)
-            ej_time_pkts[time] = []
-        elif elem != "0"*flit_size:
-            ej_pkts.add(elem)
-            ej_time_pkts[time].append(elem)
+    # injected trace: "in" text directory or a binary trace file
+    inj_path = sys.argv[1] if len(sys.argv) > 1 else "in"
+    cfg.check_geometry(load_trace(inj_path).geometry)
+    df = analysis.analyze(codec, inj_path, "out/recv_flit.txt")
 
-        prev = elem
-
-    for time, pkts in ej_time_pkts.items():
-        for pkt in pkts:
-            print("cyc:", time, pkt, bin_to_info(pkt))
+    recv = df.dropna(subset=["latency"]).sort_values("ej_cycle", kind="stable")
+    for row in recv.itertuples():
+        print("cyc:", int(row.ej_cycle),
+              int_to_bin(int(codec.pack_hdr(row.id, row.src, row.dst, row.len))),
+              {"id": row.id, "src": row.src, "dst": row.dst, "len": row.len},
+              "latency:", int(row.latency))
 
     # lost packets
-    lost_pkts = inj_pkts - ej_pkts
+    lost = df[df["ej_cycle"].isna()]
     # print("lost packets:")
-    # for itr, pkt in enumerate(lost_pkts):
-    #     print(itr, pkt, bin_to_info(pkt))
-    print("lost packet len:", len(lost_pkts))
-
-    lost_pkts = [bin_to_info(x) for x in lost_pkts]
-
-    df = pd.DataFrame(lost_pkts)
+    # print(lost[lost["src"] == lost["src"].min()])
+    print("lost packet len:", len(lost))
 
-    # print(df[df["src"] == df["src"].min()])
+    for key, val in analysis.summary(df, num_pe).items():
+        print("{:<14}{}".format(key, val))
+    print(analysis.pair_stats(df).to_string())
@@ -17,50 +17,26 @@ Author: 1. Tan Yee Yang (tan@ice.rwth-aachen.de)
 """
 
 import os
-import math
-from random import randint, shuffle
-
-# ----------------------------------------------
-# General function
-
-
-def bit_width(val: int):
-    if val > 1:
-        return math.ceil(math.log2(val))
-    elif val == 1:
-        return 1
-    else:
-        return 0
-    return len(bin(val))-2
-
-
-def int_to_bin(val, length):
-    ret = bin(val)[2:].zfill(length)
-    assert length == len(ret), "length={} len(ret)={}".format(length, len(ret))
-    return ret
-
-
-def to_file(path, str_obj):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w") as handle:
-        handle.write(str_obj)
-        handle.close()
+import sys
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from emunoc.config import load_config  # noqa: E402
+from emunoc.flit_codec import int_to_bin  # noqa: E402
+from emunoc.trace_writer import TraceWriter  # noqa: E402
 
 # ----------------------------------------------
-# NoC configuration
-max_x_dim = 4  # check noc pkg
-max_y_dim = 4  # check noc pkg
-max_z_dim = 1  # check noc pkg
-
-num_pe = max_x_dim * max_y_dim * max_z_dim
+# NoC configuration, parsed from the VHDL packages
+cfg = load_config()
+max_x_dim = cfg.max_x_dim
+max_y_dim = cfg.max_y_dim
+max_z_dim = cfg.max_z_dim
 
-flit_size = 32  # const
-flit_pkt_width = 5  # check noc pkg
-pe_bit_width = bit_width(num_pe)
-flit_id_bit_width = flit_size - flit_pkt_width - 2*pe_bit_width
+flit_size = cfg.flit_size
+flit_pkt_width = cfg.flit_pkt_width
 
-max_pkt_len = 2**flit_pkt_width - 1
+codec = cfg.codec()
+num_pe = codec.num_pe
+max_pkt_len = codec.max_pkt_len
 
 # ----------------------------------------------
 # Generated files: same in vhdl
@@ -90,64 +66,16 @@ for z in range(max_z_dim):
 
 def create_packet(src, dst, pkt_len):
     global pkt_id
-    pkt_data = ""
-    pkt_data += int_to_bin(pkt_id, flit_id_bit_width)
-    pkt_data += int_to_bin(src, pe_bit_width)
-    pkt_data += int_to_bin(dst, pe_bit_width)
-    pkt_data += int_to_bin(pkt_len, flit_pkt_width)
-
-    assert len(pkt_data) == flit_size, "len(pkt_data)={}, pkt_len:{}".format(
-        len(pkt_data), pkt_len)
+    pkt_data = int_to_bin(int(codec.pack_hdr(pkt_id, src, dst, pkt_len)), flit_size)
 
     pkt_id += 1
     return pkt_data
 
 
-class TestData(dict):
-    def __init__(self):
-        self["flit_data"] = []
-        self["inj_time"] = []
-        self["pkt_len"] = []
-
-    def add(self, data: dict):
-        self["flit_data"].extend(data["flit_data"])
-        self["inj_time"].extend(data["inj_time"])
-        self["pkt_len"].extend(data["pkt_len"])
-
-    def to_txt(self, path="."):
-        path_flit_data = os.path.join(path, "flit_data.txt")
-        path_inj_time = os.path.join(path, "inj_time.txt")
-        path_pkt_len = os.path.join(path, "pkt_len.txt")
-
-        with open(path_flit_data, "w") as handle:
-            handle.write("\n".join(self["flit_data"]))
-            handle.close()
-        with open(path_inj_time, "w") as handle:
-            handle.write("\n".join(map(str, self["inj_time"])))
-            handle.close()
-        with open(path_pkt_len, "w") as handle:
-            handle.write("\n".join(map(str, self["pkt_len"])))
-            handle.close()
-
-
-def bin_to_info(binaries):
-    assert (len(binaries) == flit_size), len(binaries)
-    offset = 0
-    tmp_id = int(binaries[:flit_id_bit_width], 2)
-    offset = offset + flit_id_bit_width
-    tmp_src = int(binaries[offset:offset+pe_bit_width], 2)
-    offset = offset + pe_bit_width
-    tmp_dst = int(binaries[offset:offset+pe_bit_width], 2)
-    offset = offset+pe_bit_width
-    tmp_len = int(binaries[offset:], 2)
-
-    return {"id": tmp_id, "src": tmp_src, "dst": tmp_dst, "len": tmp_len}
-
-
 if __name__ == "__main__":
 
     """ Pressure test """
-    td = TestData()
+    td = TraceWriter("in")
 
     ########################################################################
     # data injection all to all
@@ -206,7 +134,7 @@ if __name__ == "__main__":
     # data["pkt_len"] = [1]
     # td.add(data)
 
-    # td.to_txt("in")
+    # td.close()
 
     ##########################################################################
     # run to inf
@@ -216,4 +144,4 @@ if __name__ == "__main__":
     data["pkt_len"] = [1]
     td.add(data)
 
-    td.to_txt("in")
+    td.close()